@@ -0,0 +1,55 @@
+"""stats_delta_encoding
+
+Revision ID: 0004
+Revises: 
+Create Date: 1970-01-01 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    conn.execute("""
+alter table stats
+    add column keyframe_id integer;
+
+comment on column stats.keyframe_id is
+    'if set, stats holds a delta against the full snapshot stored in the row with this id';
+""")
+
+
+def downgrade():
+    conn = op.get_bind()
+    conn.execute("""
+update stats
+    set stats = case jsonb_typeof(keyframes.stats)
+        when 'object' then (keyframes.stats - array(
+            select jsonb_array_elements_text(stats.stats -> 'removed')
+        )) || (stats.stats -> 'changed')
+        else (
+            select coalesce(jsonb_agg(entries.entry), '[]'::jsonb)
+            from (
+                select entry
+                from jsonb_array_elements(keyframes.stats) entry
+                where not (stats.stats -> 'removed') ? (entry ->> 'noderef_id')
+                  and not (stats.stats -> 'changed') ? (entry ->> 'noderef_id')
+                union all
+                select value
+                from jsonb_each(stats.stats -> 'changed')
+            ) entries
+        )
+    end
+    from stats keyframes
+    where stats.keyframe_id = keyframes.id;
+
+alter table stats
+    drop column keyframe_id;
+""")
@@ -0,0 +1,175 @@
+"""partition_stats_by_month
+
+Revision ID: 0005
+Revises: 
+Create Date: 1970-01-01 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    conn.execute("""
+alter table stats
+    rename to stats_heap;
+
+alter table stats_heap
+    rename constraint stats_pkey to stats_heap_pkey;
+
+alter index idx_stats_noderef_id_derived_at
+    rename to idx_stats_heap_noderef_id_derived_at;
+
+create table stats
+(
+    id          integer   not null default nextval('stats_id_seq'),
+    noderef_id  uuid      not null,
+    stat_type   stat_type not null,
+    stats       jsonb     not null,
+    derived_at  timestamp not null,
+    created_at  timestamp not null default now(),
+    keyframe_id integer,
+    primary key (id, derived_at)
+) partition by range (derived_at);
+
+comment on column stats.keyframe_id is
+    'if set, stats holds a delta against the full snapshot stored in the row with this id';
+
+create index idx_stats_derived_at_brin
+    on stats using brin (derived_at);
+
+create index idx_stats_noderef_id_stat_type_derived_at
+    on stats (noderef_id, stat_type, derived_at desc) include (id, keyframe_id);
+
+create index idx_stats_keyframe_id
+    on stats (keyframe_id) where keyframe_id is not null;
+
+create function stats_create_partition(month timestamp)
+    returns text as
+$$
+declare
+    partition_start timestamp := date_trunc('month', month);
+    partition_name  text      := 'stats_' || to_char(partition_start, 'YYYY_MM');
+begin
+    execute 'create table if not exists ' || quote_ident(partition_name)
+        || ' partition of stats for values from (' || quote_literal(partition_start)
+        || ') to (' || quote_literal(partition_start + interval '1 month') || ')';
+    return partition_name;
+end;
+$$ language 'plpgsql';
+
+create function stats_ensure_partitions(since timestamp, until timestamp)
+    returns setof text as
+$$
+select stats_create_partition(month)
+from generate_series(
+    date_trunc('month', since),
+    date_trunc('month', until),
+    interval '1 month'
+) month;
+$$ language 'sql';
+
+-- partitions are visited newest first, so a month whose keyframes are only
+-- referenced by deltas of a month dropped in the same call is dropped as well.
+-- deltas in the months picked so far are skipped, which they are anyway once
+-- dropped, so that a dry run returns exactly what the real run drops
+create function stats_drop_partitions(before timestamp, dry_run boolean)
+    returns setof text as
+$$
+declare
+    partition_oid  oid;
+    partition_name text;
+    partition_end  timestamp;
+    referenced     boolean;
+    dropped        oid[] := '{}';
+begin
+    for partition_oid, partition_name, partition_end in
+        select child.oid,
+               child.relname,
+               to_date(substr(child.relname, 7), 'YYYY_MM')::timestamp + interval '1 month'
+        from pg_inherits
+                 join pg_class parent on parent.oid = pg_inherits.inhparent
+                 join pg_class child on child.oid = pg_inherits.inhrelid
+        where parent.relname = 'stats'
+          and child.relname ~ '^stats_[0-9]{4}_[0-9]{2}$'
+        order by child.relname desc
+    loop
+        continue when partition_end > before;
+
+        execute 'select exists (select 1 from stats deltas join ' || quote_ident(partition_name)
+            || ' keyframes on keyframes.id = deltas.keyframe_id where deltas.derived_at >= '
+            || quote_literal(partition_end) || ' and deltas.tableoid <> all ($1))'
+            into referenced using dropped;
+        continue when referenced;
+
+        dropped := dropped || partition_oid;
+        if not dry_run then
+            execute 'drop table ' || quote_ident(partition_name);
+        end if;
+        return next partition_name;
+    end loop;
+end;
+$$ language 'plpgsql';
+
+select stats_ensure_partitions(
+    coalesce((select min(derived_at) from stats_heap), now()::timestamp),
+    greatest((select max(derived_at) from stats_heap), now()::timestamp) + interval '3 months'
+);
+
+insert into stats (id, noderef_id, stat_type, stats, derived_at, created_at, keyframe_id)
+select id, noderef_id, stat_type, stats, derived_at, created_at, keyframe_id
+from stats_heap;
+
+alter sequence stats_id_seq
+    owned by stats.id;
+
+drop table stats_heap;
+""")
+
+
+def downgrade():
+    conn = op.get_bind()
+    conn.execute("""
+alter table stats
+    rename to stats_partitioned;
+
+alter table stats_partitioned
+    rename constraint stats_pkey to stats_partitioned_pkey;
+
+create table stats
+(
+    id          integer   not null default nextval('stats_id_seq') primary key,
+    noderef_id  uuid      not null,
+    stat_type   stat_type not null,
+    stats       jsonb     not null,
+    derived_at  timestamp not null,
+    created_at  timestamp not null default now(),
+    keyframe_id integer
+);
+
+comment on column stats.keyframe_id is
+    'if set, stats holds a delta against the full snapshot stored in the row with this id';
+
+create index idx_stats_noderef_id_derived_at
+    on stats (noderef_id, derived_at);
+
+insert into stats (id, noderef_id, stat_type, stats, derived_at, created_at, keyframe_id)
+select id, noderef_id, stat_type, stats, derived_at, created_at, keyframe_id
+from stats_partitioned;
+
+alter sequence stats_id_seq
+    owned by stats.id;
+
+drop table stats_partitioned;
+
+drop function stats_drop_partitions;
+drop function stats_ensure_partitions;
+drop function stats_create_partition;
+""")
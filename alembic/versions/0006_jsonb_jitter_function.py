@@ -0,0 +1,78 @@
+"""jsonb_jitter_function
+
+Revision ID: 0006
+Revises: 
+Create Date: 1970-01-01 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    conn.execute("""
+-- scales every number in a jsonb document by a random factor
+-- within [1 - amount, 1 + amount], rounded and clamped at zero. The numbers
+-- next to a "total" are counts out of it: they scale along with the total
+-- before their own factor and never exceed it, so no share passes 100%
+create function jsonb_jitter(doc jsonb, amount double precision)
+    returns jsonb as
+$$
+declare
+    total numeric;
+    jittered_total numeric;
+begin
+    case jsonb_typeof(doc)
+        when 'number' then
+            return to_jsonb(greatest(0, round(doc::text::numeric * (1 + amount * (2 * random() - 1))::numeric)));
+        when 'object' then
+            if jsonb_typeof(doc -> 'total') = 'number' then
+                total := (doc ->> 'total')::numeric;
+                jittered_total := jsonb_jitter(doc -> 'total', amount)::text::numeric;
+                return (
+                    select jsonb_object_agg(
+                        key,
+                        case
+                            when key = 'total' then to_jsonb(jittered_total)
+                            when jsonb_typeof(value) = 'number' then to_jsonb(
+                                least(jittered_total, jsonb_jitter(
+                                    to_jsonb(coalesce(value::text::numeric * jittered_total / nullif(total, 0), 0)),
+                                    amount
+                                )::text::numeric)
+                            )
+                            else jsonb_jitter(value, amount)
+                            end
+                    )
+                    from jsonb_each(doc)
+                );
+            end if;
+            return coalesce(
+                (select jsonb_object_agg(key, jsonb_jitter(value, amount)) from jsonb_each(doc)),
+                '{}'::jsonb
+            );
+        when 'array' then
+            return coalesce(
+                (select jsonb_agg(jsonb_jitter(value, amount) order by position)
+                 from jsonb_array_elements(doc) with ordinality as elements(value, position)),
+                '[]'::jsonb
+            );
+        else
+            return doc;
+    end case;
+end;
+$$ language 'plpgsql' volatile;
+""")
+
+
+def downgrade():
+    conn = op.get_bind()
+    conn.execute("""
+drop function jsonb_jitter;
+""")
@@ -0,0 +1,94 @@
+import json
+
+from fastapi import Query
+from fastapi.security.api_key import APIKeyHeader
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+from starlette_context import context
+
+from app.api.auth import authenticated
+from app.core.config import API_KEY_NAME
+from app.elastic.profile import profile_queries
+
+api_key_header_optional = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
+
+
+async def profiling(
+    request: Request,
+    profile: bool = Query(
+        False,
+        alias="_profile",
+        description="Profile the queries sent to elastic, needs the API key.",
+    ),
+):
+    if not profile:
+        return
+
+    await authenticated(await api_key_header_optional(request))
+    context["profile"] = True
+
+
+class ProfileMiddleware:
+    """
+    Wraps the response of a profiled request, see profiling, together with
+    the profiles of the elastic queries it took. Has to sit inside the
+    RawContextMiddleware to see the tracked queries.
+
+    Other requests pass straight through. The profiled response is sent as
+    soon as the endpoint has answered, its background tasks run afterwards
+    as usual.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or b"_profile" not in scope["query_string"]:
+            await self.app(scope, receive, send)
+            return
+
+        start = {}
+        body = []
+
+        async def send_profiled(message: Message):
+            if message["type"] == "http.response.start":
+                profiled = context.get("profile") and message["status"] < 400
+                if not profiled:
+                    await send(message)
+                    return
+                start.update(message)
+            elif not start:
+                await send(message)
+            else:
+                body.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await self.send_profile(start, b"".join(body), scope, receive, send)
+
+        await self.app(scope, receive, send_profiled)
+
+    @staticmethod
+    async def send_profile(
+        start: Message, body: bytes, scope: Scope, receive: Receive, send: Send
+    ):
+        profiles = await run_in_threadpool(
+            profile_queries, context.get("elastic_queries", [])
+        )
+
+        response = JSONResponse(
+            {"result": json.loads(body), "profile": profiles},
+            status_code=start["status"],
+        )
+        response.raw_headers = [
+            (name, value)
+            for name, value in start["headers"]
+            if name.lower() not in (b"content-length", b"content-type")
+        ] + response.raw_headers
+        await response(scope, receive, send)
@@ -10,7 +10,9 @@ from fastapi import (
     Query,
 )
 from pydantic import BaseModel
+from starlette.requests import Request
 from starlette.responses import Response
+from starlette_context import context
 
 import app.crud.collection as crud_collection
 from app.core.config import PORTAL_ROOT_ID
@@ -25,6 +27,11 @@ from app.crud import (
 )
 
 
+def track_route(request: Request):
+    # the searches sent while answering are counted by endpoint, see QueryLog
+    context["route"] = request.scope["endpoint"].__name__
+
+
 def portal_id_param(
     *, noderef_id: UUID = Path(..., examples=crud_collection.PORTALS),
 ) -> UUID:
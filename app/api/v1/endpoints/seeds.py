@@ -1,6 +1,7 @@
 from fastapi import (
     APIRouter,
     BackgroundTasks,
+    Query,
     Security,
 )
 from starlette.status import (
@@ -8,7 +9,6 @@ from starlette.status import (
     HTTP_204_NO_CONTENT,
 )
 
-import app.crud.collection as crud_collection
 import app.crud.seeds as crud_seeds
 from app.api.auth import authenticated
 
@@ -31,7 +31,10 @@ async def clear_stats():
     status_code=HTTP_202_ACCEPTED,
     tags=["Statistics", "Authenticated"],
 )
-async def seed_stats(*, background_tasks: BackgroundTasks):
-    portals = await crud_collection.get_portals()
-    for portal_id in portals.keys():
-        background_tasks.add_task(crud_seeds.seed_stats, noderef_id=portal_id)
+async def seed_stats(
+    *,
+    days: int = Query(10, ge=1),
+    jitter: float = Query(0.0, ge=0.0, le=1.0),
+    background_tasks: BackgroundTasks,
+):
+    background_tasks.add_task(crud_seeds.seed_stats, days=days, jitter=jitter)
@@ -1,15 +1,18 @@
-import json
+import asyncio
 from datetime import datetime
 from typing import (
     List,
     Optional,
+    Union,
 )
 from uuid import UUID
 
+import numpy as np
 from fastapi import (
     APIRouter,
     BackgroundTasks,
     Depends,
+    HTTPException,
     Query,
     Response,
     Security,
@@ -18,6 +21,7 @@ from starlette.status import (
     HTTP_200_OK,
     HTTP_202_ACCEPTED,
     HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_ENTITY,
 )
 from starlette_context import context
 
@@ -28,28 +32,49 @@ from app.api.util import (
     portal_id_param,
     portal_id_with_root_param,
 )
-from app.crud.elastic import ResourceType
-from app.crud.util import StatsNotFoundException
+from app.core.config import (
+    STATS_RETENTION_DAILY_DAYS,
+    STATS_RETENTION_FULL_DAYS,
+    STATS_RETENTION_MAX_DAYS,
+)
+from app.crud.elastic import (
+    ResourceType,
+    aggs_material_validation,
+)
+from app.crud.util import (
+    OrderByDirection,
+    StatsNotFoundException,
+)
 from app.models.collection import (
     CollectionAttribute,
     CollectionMaterialsCount,
+    CollectionScore,
     PortalTreeNode,
 )
 from app.models.oeh_validation import MaterialFieldValidation
 from app.models.stats import (
     CollectionValidationStats,
     MaterialValidationStats,
+    RetentionPolicy,
+    RetentionReport,
+    ScoreTimelinePoint,
+    ScoreWeightsRequest,
     StatType,
     StatsResponse,
     ValidationStatsResponse,
 )
+from app.pg import codecs
 from app.pg.pg_utils import get_postgres
 from app.pg.postgres import Postgres
 from app.score import (
     ScoreModulator,
     ScoreWeights,
+    calc_score_timeline,
     calc_scores,
+    calc_scores_vectorized,
     calc_weighted_score,
+    calc_weighted_score_vectorized,
+    rank_scores,
 )
 
 router = APIRouter()
@@ -99,16 +124,101 @@ async def score(
     if not score_weights:
         score_weights = ScoreWeights.UNIFORM
 
-    collection_stats = await crud_stats.run_stats_score(
-        noderef_id=noderef_id, resource_type=ResourceType.COLLECTION
+    counts = await crud_stats.read_score_counts_cached(noderef_id=noderef_id)
+
+    response.headers["X-Query-Count"] = str(len(context.get("elastic_queries", [])))
+    return _score(
+        counts["collections"], counts["materials"], score_modulator, score_weights
     )
 
-    collection_scores = calc_scores(
-        stats=collection_stats, score_modulator=score_modulator
+
+@router.post(
+    "/collections/{noderef_id}/stats/score",
+    response_model=dict,
+    status_code=HTTP_200_OK,
+    responses={HTTP_404_NOT_FOUND: {"description": "Collection not found"}},
+    tags=["Statistics"],
+)
+async def score_custom_weights(
+    *,
+    noderef_id: UUID = Depends(portal_id_param),
+    score_modulator: ScoreModulator = Depends(score_modulator_param),
+    score_weights: ScoreWeightsRequest,
+    response: Response,
+):
+    if not score_modulator:
+        score_modulator = ScoreModulator.LINEAR
+
+    counts = await crud_stats.read_score_counts_cached(noderef_id=noderef_id)
+
+    unknown = [
+        f"{resource}.{k}"
+        for resource, weights in score_weights.weights.items()
+        for k in weights.keys()
+        if k not in counts[resource] or k == "total"
+    ]
+    if unknown:
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown score weights: {', '.join(unknown)}",
+        )
+
+    response.headers["X-Query-Count"] = str(len(context.get("elastic_queries", [])))
+    return _score(
+        counts["collections"], counts["materials"], score_modulator, score_weights
     )
 
-    material_stats = await crud_stats.run_stats_score(
-        noderef_id=noderef_id, resource_type=ResourceType.MATERIAL
+
+@router.get(
+    "/stats/score", response_model=dict, status_code=HTTP_200_OK, tags=["Statistics"],
+)
+async def score_portals(
+    *,
+    score_modulator: ScoreModulator = Depends(score_modulator_param),
+    score_weights: ScoreWeights = Depends(score_weights_param),
+    response: Response,
+):
+    if not score_modulator:
+        score_modulator = ScoreModulator.LINEAR
+    if not score_weights:
+        score_weights = ScoreWeights.UNIFORM
+
+    portals = await crud_collection.get_portals()
+    portal_ids = list(portals.keys())
+
+    collection_stats, material_stats = await asyncio.gather(
+        crud_stats.run_stats_score_by_portal(
+            resource_type=ResourceType.COLLECTION, portal_ids=portal_ids
+        ),
+        crud_stats.run_stats_score_by_portal(
+            resource_type=ResourceType.MATERIAL, portal_ids=portal_ids
+        ),
+    )
+
+    response.headers["X-Total-Count"] = str(len(portals))
+    response.headers["X-Query-Count"] = str(len(context.get("elastic_queries", [])))
+    return {
+        str(noderef_id): {
+            "title": title,
+            **_score(
+                collection_stats[str(noderef_id)],
+                material_stats[str(noderef_id)],
+                score_modulator,
+                score_weights,
+            ),
+        }
+        for noderef_id, title in portals.items()
+    }
+
+
+def _score(
+    collection_stats: dict,
+    material_stats: dict,
+    score_modulator: ScoreModulator,
+    score_weights: Union[ScoreWeights, ScoreWeightsRequest],
+) -> dict:
+    collection_scores = calc_scores(
+        stats=collection_stats, score_modulator=score_modulator
     )
 
     material_scores = calc_scores(stats=material_stats, score_modulator=score_modulator)
@@ -119,7 +229,6 @@ async def score(
         score_weights=score_weights,
     )
 
-    response.headers["X-Query-Count"] = str(len(context.get("elastic_queries", [])))
     return {
         "score": score_,
         "collections": {"total": collection_stats["total"], **collection_scores},
@@ -127,6 +236,71 @@ async def score(
     }
 
 
+@router.get(
+    "/collections/{noderef_id}/stats/descendant-collections-scores",
+    response_model=List[CollectionScore],
+    status_code=HTTP_200_OK,
+    responses={HTTP_404_NOT_FOUND: {"description": "Collection not found"}},
+    tags=["Statistics"],
+)
+async def descendant_collections_scores(
+    *,
+    noderef_id: UUID = Depends(portal_id_param),
+    score_modulator: ScoreModulator = Depends(score_modulator_param),
+    score_weights: ScoreWeights = Depends(score_weights_param),
+    order: OrderByDirection = Query(
+        OrderByDirection.ASC, description="ASC lists the worst collections first"
+    ),
+    limit: Optional[int] = Query(None, gt=0),
+    response: Response,
+):
+    if not score_modulator:
+        score_modulator = ScoreModulator.LINEAR
+    if not score_weights:
+        score_weights = ScoreWeights.UNIFORM
+
+    descendant_collections = {
+        str(collection.noderef_id): collection.title
+        for collection in await crud_collection.get_many_sorted(
+            root_noderef_id=noderef_id
+        )
+    }
+    material_stats = await crud_stats.run_stats_score_by_collection(
+        noderef_id=noderef_id
+    )
+
+    # collections without materials score like an empty portal
+    noderef_ids = list(descendant_collections.keys())
+    keys = list(aggs_material_validation.keys())
+    empty = {"total": 0, **{k: 0 for k in keys}}
+    stats = [material_stats.get(noderef_id, empty) for noderef_id in noderef_ids]
+
+    totals = np.array([stat["total"] for stat in stats], dtype=float)
+    counts = np.array([[stat[k] for k in keys] for stat in stats], dtype=float)
+    counts = counts.reshape(len(stats), len(keys))
+    weights = np.array([score_weights.weights["materials"].get(k, 0) for k in keys])
+
+    scores = calc_scores_vectorized(counts, totals, score_modulator=score_modulator)
+    weighted_scores = calc_weighted_score_vectorized(scores, weights)
+
+    ranked = rank_scores(
+        weighted_scores, limit=limit, descending=order is OrderByDirection.DESC
+    )
+
+    response.headers["X-Total-Count"] = str(len(noderef_ids))
+    response.headers["X-Query-Count"] = str(len(context.get("elastic_queries", [])))
+    return [
+        CollectionScore(
+            noderef_id=noderef_ids[i],
+            title=descendant_collections[noderef_ids[i]],
+            score=weighted_scores[i],
+            materials_count=totals[i],
+            materials={k: scores[i, j] for j, k in enumerate(keys)},
+        )
+        for i in ranked
+    ]
+
+
 @router.get(
     "/stats/search/material-type",
     response_model=dict,
@@ -221,10 +395,9 @@ async def material_counts_tree(
 async def _read_stats(
     postgres: Postgres, stat_type: StatType, noderef_id: UUID, at: datetime = None
 ) -> dict:
-    async with postgres.pool.acquire() as conn:
-        row = await crud_stats.read_stats(
-            conn=conn, stat_type=stat_type, noderef_id=noderef_id, at=at
-        )
+    row = await crud_stats.read_stats_cached(
+        postgres, stat_type=stat_type, noderef_id=noderef_id, at=at
+    )
 
     # if not row:
     #     row = await crud_stats.read_stats_file(
@@ -255,7 +428,7 @@ async def read_stats(
         raise StatsNotFoundException
 
     if not isinstance(row["stats"], dict):
-        row["stats"] = json.loads(row["stats"])
+        row["stats"] = codecs.loads(row["stats"])
 
     return StatsResponse(derived_at=row["derived_at"], stats=row["stats"])
 
@@ -282,7 +455,7 @@ async def read_stats_validation(
         raise StatsNotFoundException
 
     if not isinstance(row["stats"], list):
-        row["stats"] = json.loads(row["stats"])
+        row["stats"] = codecs.loads(row["stats"])
 
     response = [
         ValidationStatsResponse[MaterialValidationStats](
@@ -338,7 +511,7 @@ async def read_stats_validation_collection(
         raise StatsNotFoundException
 
     if not isinstance(row["stats"], list):
-        row["stats"] = json.loads(row["stats"])
+        row["stats"] = codecs.loads(row["stats"])
 
     response = [
         ValidationStatsResponse[CollectionValidationStats](
@@ -377,7 +550,7 @@ async def read_stats_portal_tree(
         raise StatsNotFoundException
 
     if not isinstance(row["stats"], list):
-        row["stats"] = json.loads(row["stats"])
+        row["stats"] = codecs.loads(row["stats"])
 
     response = [PortalTreeNode.construct(**node) for node in row["stats"]]
 
@@ -396,8 +569,73 @@ async def read_stats_timeline(
     noderef_id: UUID = Depends(portal_id_param),
     postgres: Postgres = Depends(get_postgres),
 ):
-    async with postgres.pool.acquire() as conn:
-        return await crud_stats.read_stats_timeline(conn=conn, noderef_id=noderef_id)
+    return await crud_stats.read_stats_timeline_cached(postgres, noderef_id=noderef_id)
+
+
+@router.get(
+    "/read-stats/{noderef_id}/score-timeline",
+    description=(
+        "Scores of every stored stats run, newest first. The runs keep their "
+        "material counts per collection, so a material in several collections "
+        "counts once for each of them, while the live score of "
+        "/collections/{noderef_id}/stats/score counts it once. The material "
+        "scores of both differ for portals holding such materials."
+    ),
+    response_model=List[ScoreTimelinePoint],
+    status_code=HTTP_200_OK,
+    responses={HTTP_404_NOT_FOUND: {"description": "Collection not found"}},
+    tags=["Statistics"],
+)
+async def read_stats_score_timeline(
+    *,
+    noderef_id: UUID = Depends(portal_id_param),
+    score_modulator: ScoreModulator = Depends(score_modulator_param),
+    score_weights: ScoreWeights = Depends(score_weights_param),
+    postgres: Postgres = Depends(get_postgres),
+):
+    if not score_modulator:
+        score_modulator = ScoreModulator.LINEAR
+    if not score_weights:
+        score_weights = ScoreWeights.UNIFORM
+
+    history = await crud_stats.read_score_history_cached(
+        postgres, noderef_id=noderef_id
+    )
+
+    if not history["derived_at"]:
+        raise StatsNotFoundException
+
+    collection_keys = list(crud_stats.collection_validation_errors.keys())
+    material_keys = list(aggs_material_validation.keys())
+    collection_counts = np.array(history["collections"], dtype=float)
+    material_counts = np.array(history["materials"], dtype=float)
+
+    weighted_scores, collection_scores, material_scores = calc_score_timeline(
+        collection_counts[:, 1:],
+        collection_counts[:, 0],
+        material_counts[:, 1:],
+        material_counts[:, 0],
+        collection_keys=collection_keys,
+        material_keys=material_keys,
+        score_modulator=score_modulator,
+        score_weights=score_weights,
+    )
+
+    return [
+        ScoreTimelinePoint(
+            derived_at=derived_at,
+            score=weighted_scores[i],
+            collections={
+                "total": collection_counts[i, 0],
+                **{k: collection_scores[i, j] for j, k in enumerate(collection_keys)},
+            },
+            materials={
+                "total": material_counts[i, 0],
+                **{k: material_scores[i, j] for j, k in enumerate(material_keys)},
+            },
+        )
+        for i, derived_at in enumerate(history["derived_at"])
+    ]
 
 
 @router.post(
@@ -410,3 +648,32 @@ async def run_stats(*, background_tasks: BackgroundTasks):
     portals = await crud_collection.get_portals()
     for portal_id in portals.keys():
         background_tasks.add_task(crud_stats.run_stats, noderef_id=portal_id)
+
+
+def retention_policy_param(
+    *,
+    full_resolution_days: int = Query(STATS_RETENTION_FULL_DAYS, ge=0),
+    daily_days: int = Query(STATS_RETENTION_DAILY_DAYS, ge=0),
+    max_age_days: int = Query(STATS_RETENTION_MAX_DAYS, ge=0),
+) -> RetentionPolicy:
+    return RetentionPolicy(
+        full_resolution_days=full_resolution_days,
+        daily_days=max(daily_days, full_resolution_days),
+        max_age_days=max_age_days,
+    )
+
+
+@router.post(
+    "/compact-stats",
+    dependencies=[Security(authenticated)],
+    response_model=RetentionReport,
+    status_code=HTTP_200_OK,
+    tags=["Statistics", "Authenticated"],
+)
+async def compact_stats(
+    *,
+    policy: RetentionPolicy = Depends(retention_policy_param),
+    dry_run: bool = Query(True),
+    postgres: Postgres = Depends(get_postgres),
+):
+    return await crud_stats.compact_stats(postgres, policy=policy, dry_run=dry_run)
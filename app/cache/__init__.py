@@ -0,0 +1,11 @@
+from .backends import (
+    CacheBackend,
+    FakeRedis,
+    LRUCache,
+    RedisCache,
+)
+from .utils import (
+    close_cache_connection,
+    connect_to_cache,
+    get_cache,
+)
@@ -0,0 +1,207 @@
+import json
+import time
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import (
+    Any,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from app.core.config import (
+    CACHE_MAX_SIZE,
+    CACHE_TTL,
+)
+from app.core.logging import logger
+
+
+class CacheBackend(ABC):
+    """
+    Async key-value cache shared by the elastic and stats caches.
+
+    Values must be JSON-serializable, so every backend behaves the same
+    regardless of whether it keeps objects in-process or ships them to redis.
+    A ttl of 0 means the entry does not expire.
+    """
+
+    # whether every worker reads and invalidates the same entries
+    shared = False
+
+    def __init__(self, ttl: int = CACHE_TTL):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str):
+        ...
+
+    async def close(self):
+        pass
+
+
+class LRUCache(CacheBackend):
+    """
+    In-process cache; every gunicorn worker holds its own copy.
+
+    Values are kept JSON-encoded, so callers never share the cached objects
+    and get the same types back as from redis.
+    """
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE, ttl: int = CACHE_TTL):
+        super(LRUCache, self).__init__(ttl=ttl)
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            expires_at, value = self._entries[key]
+        except KeyError:
+            return None
+
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return json.loads(value)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        self._entries[key] = (expires_at, json.dumps(value))
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._entries.keys() if k.startswith(prefix)]:
+            del self._entries[key]
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache shared by all workers through an aioredis client.
+
+    The client raising one of `errors`, e.g. while redis restarts, is logged
+    and treated as a miss, so requests fall through to elastic and postgres.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        client,
+        namespace: str = "metaqs",
+        ttl: int = CACHE_TTL,
+        errors: Tuple[Type[Exception], ...] = (),
+    ):
+        super(RedisCache, self).__init__(ttl=ttl)
+        self.client = client
+        self.namespace = namespace
+        self.errors = (OSError, *errors)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self.client.get(self._key(key))
+        except self.errors as e:
+            logger.warning(f"Cache unavailable, reading {key} from origin: {e!r}")
+            return None
+
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            await self.client.set(self._key(key), json.dumps(value), ex=ttl or None)
+        except self.errors as e:
+            logger.warning(f"Cache unavailable, not storing {key}: {e!r}")
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self._key(key))
+        except self.errors as e:
+            logger.error(f"Cache unavailable, {key} not invalidated: {e!r}")
+
+    async def delete_prefix(self, prefix: str):
+        try:
+            keys = [
+                k async for k in self.client.scan_iter(match=f"{self._key(prefix)}*")
+            ]
+            if keys:
+                await self.client.delete(*keys)
+        except self.errors as e:
+            logger.error(f"Cache unavailable, {prefix}* not invalidated: {e!r}")
+
+    async def close(self):
+        await self.client.close()
+
+
+class FakeRedis:
+    """
+    Local stand-in for the subset of the aioredis client used by RedisCache.
+
+    Lets the redis code path, including JSON round-trips, run without a
+    redis server.
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    def _alive(self, key: str) -> bool:
+        try:
+            expires_at, _ = self._data[key]
+        except KeyError:
+            return False
+
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if not self._alive(key):
+            return None
+        return self._data[key][1]
+
+    async def set(self, key: str, value, ex: Optional[int] = None):
+        if isinstance(value, str):
+            value = value.encode()
+        self._data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    async def scan_iter(self, match: str = "*"):
+        for key in list(self._data.keys()):
+            if self._alive(key) and fnmatchcase(key, match):
+                yield key
+
+    async def close(self):
+        self._data.clear()
@@ -0,0 +1,49 @@
+from typing import Union
+
+from app.core.config import (
+    CACHE_BACKEND,
+    REDIS_TIMEOUT,
+    REDIS_URL,
+)
+from app.core.logging import logger
+from .backends import (
+    CacheBackend,
+    FakeRedis,
+    LRUCache,
+    RedisCache,
+)
+
+_cache: Union[CacheBackend, None] = None
+
+
+async def get_cache() -> CacheBackend:
+    if not _cache:
+        await connect_to_cache()
+    return _cache
+
+
+async def connect_to_cache():
+    global _cache
+
+    logger.debug(f"Attempt to open cache: {CACHE_BACKEND}")
+
+    if CACHE_BACKEND == "redis":
+        import aioredis
+
+        client = aioredis.from_url(
+            REDIS_URL,
+            socket_timeout=REDIS_TIMEOUT,
+            socket_connect_timeout=REDIS_TIMEOUT,
+        )
+        _cache = RedisCache(client, errors=(aioredis.RedisError,))
+    elif CACHE_BACKEND == "fake":
+        _cache = RedisCache(FakeRedis())
+    else:
+        _cache = LRUCache()
+
+
+async def close_cache_connection():
+    global _cache
+    if _cache:
+        await _cache.close()
+        _cache = None
@@ -46,8 +46,94 @@ if not DATABASE_URL:
 else:
     DATABASE_URL = DatabaseURL(DATABASE_URL)
 
+# per worker; the pool grows on demand and connections idle for longer than
+# MAX_INACTIVE_CONNECTION_LIFETIME seconds are closed down to the minimum
 MAX_CONNECTIONS_COUNT = int(os.getenv("MAX_CONNECTIONS_COUNT", 10))
-MIN_CONNECTIONS_COUNT = int(os.getenv("MIN_CONNECTIONS_COUNT", 10))
+MIN_CONNECTIONS_COUNT = int(os.getenv("MIN_CONNECTIONS_COUNT", 1))
+MAX_INACTIVE_CONNECTION_LIFETIME = float(
+    os.getenv("MAX_INACTIVE_CONNECTION_LIFETIME", 60)
+)
+# requests waiting longer for a connection fail with 503 and Retry-After
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("POOL_ACQUIRE_TIMEOUT", 5))
+POOL_RETRY_AFTER = int(os.getenv("POOL_RETRY_AFTER", 1))
+# jsonb is exchanged in binary format and parsed by orjson, json keeps the text
+# format parsed by the standard library
+PG_JSON_CODEC = os.getenv("PG_JSON_CODEC", "orjson").strip().lower()  # orjson | json
+
+# seconds between retries of a failed startup warm-up step, see app/warmup.py
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", 5))
 
 ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL")
 ELASTICSEARCH_TIMEOUT = int(os.getenv("ELASTICSEARCH_TIMEOUT", 20))
+# kept-alive connections per worker, searches run concurrently in the threadpool
+ELASTICSEARCH_MAXSIZE = int(os.getenv("ELASTICSEARCH_MAXSIZE", 32))
+ELASTICSEARCH_HTTP_COMPRESS = os.getenv(
+    "ELASTICSEARCH_HTTP_COMPRESS", "true"
+).strip().lower() in ("1", "true", "yes")
+# seconds before idle pooled connections send tcp keep-alive probes (0 disables)
+ELASTICSEARCH_TCP_KEEPALIVE = int(os.getenv("ELASTICSEARCH_TCP_KEEPALIVE", 60))
+ELASTICSEARCH_MAX_RETRIES = int(os.getenv("ELASTICSEARCH_MAX_RETRIES", 3))
+ELASTICSEARCH_RETRY_ON_TIMEOUT = os.getenv(
+    "ELASTICSEARCH_RETRY_ON_TIMEOUT", ""
+).strip().lower() in ("1", "true", "yes")
+# how the title, keyword and description lengths of the collection validation
+# are computed: inline: runtime fields with the scripts sent along every query;
+# stored: runtime fields referencing the scripts stored at startup; client:
+# from the _source of every collection, streamed by a scroll
+COLLECTION_VALIDATION_MODE = (
+    os.getenv("COLLECTION_VALIDATION_MODE", "inline").strip().lower()
+)
+# rewrite queries into cheaper equivalents before sending, see optimize_body
+ELASTIC_OPTIMIZE_QUERIES = os.getenv(
+    "ELASTIC_OPTIMIZE_QUERIES", "true"
+).strip().lower() in ("1", "true", "yes")
+# let the shards cache size 0 searches, the aggregations of the dashboards
+ELASTICSEARCH_REQUEST_CACHE = os.getenv(
+    "ELASTICSEARCH_REQUEST_CACHE", "true"
+).strip().lower() in ("1", "true", "yes")
+# searches taking longer are logged with their shape (0 disables), the
+# durations of the last ELASTIC_QUERY_STATS_WINDOW searches of every shape are
+# kept for the percentiles of /elastic-queries
+ELASTIC_SLOW_QUERY_MS = float(os.getenv("ELASTIC_SLOW_QUERY_MS", 1000))
+ELASTIC_QUERY_STATS_WINDOW = int(os.getenv("ELASTIC_QUERY_STATS_WINDOW", 1000))
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "lru").strip().lower()  # lru | redis | fake
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", 256))
+CACHE_TTL = int(os.getenv("CACHE_TTL", 300))
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# seconds before a redis command is given up and served from the origin
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", 1))
+# raw counts behind the score are dropped whenever stats are run; 0 keeps them
+# until then, but only in redis, where every worker sees the invalidation
+SCORE_COUNTS_TTL = int(os.getenv("SCORE_COUNTS_TTL", CACHE_TTL))
+
+# stats history keeps every run for STATS_RETENTION_FULL_DAYS,
+# one run per day up to STATS_RETENTION_DAILY_DAYS and one run per week beyond
+STATS_RETENTION_FULL_DAYS = int(os.getenv("STATS_RETENTION_FULL_DAYS", 7))
+STATS_RETENTION_DAILY_DAYS = int(os.getenv("STATS_RETENTION_DAILY_DAYS", 90))
+# monthly partitions entirely older than STATS_RETENTION_MAX_DAYS are dropped (0 keeps all)
+STATS_RETENTION_MAX_DAYS = int(os.getenv("STATS_RETENTION_MAX_DAYS", 0))
+
+# store VALIDATION_* and MATERIAL_TYPES snapshots as deltas against a full
+# keyframe, writing a new keyframe every STATS_KEYFRAME_INTERVAL snapshots
+STATS_DELTA_ENCODING = os.getenv("STATS_DELTA_ENCODING", "").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+)
+STATS_KEYFRAME_INTERVAL = int(os.getenv("STATS_KEYFRAME_INTERVAL", 24))
+
+# live: query ELASTICSEARCH_URL; record: additionally persist every response to
+# ELASTIC_RECORDINGS_DIR; replay: serve recorded responses without a cluster;
+# memory: evaluate queries over the bulk NDJSON corpus ELASTIC_MEMORY_CORPUS
+ELASTIC_MODE = os.getenv("ELASTIC_MODE", "live").strip().lower()
+ELASTIC_RECORDINGS_DIR = Path(
+    os.getenv("ELASTIC_RECORDINGS_DIR", DATA_DIR / "elastic-recordings")
+)
+ELASTIC_MEMORY_CORPUS = Path(
+    os.getenv("ELASTIC_MEMORY_CORPUS", DATA_DIR / "workspace.ndjson")
+)
+ELASTIC_REPLAY_LATENCY_MS = float(os.getenv("ELASTIC_REPLAY_LATENCY_MS", 0))
+ELASTIC_REPLAY_LATENCY_JITTER_MS = float(
+    os.getenv("ELASTIC_REPLAY_LATENCY_JITTER_MS", 0)
+)
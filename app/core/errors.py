@@ -12,7 +12,11 @@ from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
 
 async def http_error_handler(request: Request, exc: HTTPException) -> JSONResponse:
-    return JSONResponse({"errors": [exc.detail]}, status_code=exc.status_code)
+    return JSONResponse(
+        {"errors": [exc.detail]},
+        status_code=exc.status_code,
+        headers=getattr(exc, "headers", None),
+    )
 
 
 async def http_422_error_handler(request: Request, exc: HTTPException) -> JSONResponse:
@@ -19,6 +19,7 @@ from app.elastic import (
     abucketsort,
     qbool,
     qwildcard,
+    raw_success,
 )
 from app.models.elastic import (
     DescendantCollectionsMaterialsCounts,
@@ -99,14 +100,14 @@ class MissingAttributeFilter(BaseModel):
 async def get_portals():
     s = Search().query(query_collections(ancestor_id=PORTAL_ROOT_ID))
 
-    response: Response = s.source(
+    response: Response = await s.source(
         [
             ElasticResourceAttribute.NODEREF_ID,
             CollectionAttribute.TITLE,
             CollectionAttribute.PATH,
             CollectionAttribute.PARENT_ID,
         ]
-    )[:ELASTIC_MAX_SIZE].execute()
+    )[:ELASTIC_MAX_SIZE].execute_cached()
 
     if response.success():
         collections = [Collection.parse_elastic_hit(hit) for hit in response]
@@ -145,14 +146,14 @@ async def get_many_sorted(
 ) -> List[Collection]:
     s = Search().query(query_collections(root_noderef_id))
 
-    response: Response = s.source(
+    response: Response = await s.source(
         [
             ElasticResourceAttribute.NODEREF_ID,
             CollectionAttribute.TITLE,
             CollectionAttribute.PATH,
             CollectionAttribute.PARENT_ID,
         ]
-    ).sort(CollectionAttribute.FULLPATH)[:size].execute()
+    ).sort(CollectionAttribute.FULLPATH)[:size].execute_cached()
 
     if response.success():
         return [Collection.parse_elastic_hit(hit) for hit in response]
@@ -191,12 +192,19 @@ async def get_child_collections_with_missing_attributes(
 async def material_counts_by_descendant(
     ancestor_id: UUID,
 ) -> DescendantCollectionsMaterialsCounts:
-    s = Search().query(query_materials(ancestor_id=ancestor_id))
+    s = (
+        Search()
+        .query(query_materials(ancestor_id=ancestor_id))
+        .response_paths(
+            "aggregations.grouped_by_collection.buckets.key.noderef_id",
+            "aggregations.grouped_by_collection.buckets.doc_count",
+        )
+    )
     s.aggs.bucket("grouped_by_collection", agg_materials_by_collection()).pipeline(
         "sorted_by_count", abucketsort(sort=[{"_count": {"order": "asc"}}]),
     )
 
-    response: Response = s[:0].execute()
+    response = await s[:0].execute_raw_cached()
 
-    if response.success():
+    if raw_success(response):
         return DescendantCollectionsMaterialsCounts.parse_elastic_response(response)
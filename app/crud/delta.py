@@ -0,0 +1,43 @@
+from typing import Union
+
+from app.models.stats import StatType
+
+# snapshots keyed by collection, either as a dict or as a list of records
+# carrying a noderef_id; other stat types are always stored in full
+DELTA_STAT_TYPES = {
+    StatType.MATERIAL_TYPES,
+    StatType.VALIDATION_COLLECTIONS,
+    StatType.VALIDATION_MATERIALS,
+}
+
+
+def _entries(stats: Union[list, dict]) -> dict:
+    if isinstance(stats, dict):
+        return stats
+    return {str(entry["noderef_id"]): entry for entry in stats}
+
+
+def encode_delta(keyframe: Union[list, dict], stats: Union[list, dict]) -> dict:
+    base = _entries(keyframe)
+    current = _entries(stats)
+
+    return {
+        "changed": {k: v for k, v in current.items() if base.get(k) != v},
+        "removed": [k for k in base.keys() if k not in current],
+    }
+
+
+def delta_size(delta: dict) -> int:
+    return len(delta["changed"]) + len(delta["removed"])
+
+
+def apply_delta(keyframe: Union[list, dict], delta: dict) -> Union[list, dict]:
+    entries = dict(_entries(keyframe))
+
+    for k in delta["removed"]:
+        entries.pop(k, None)
+    entries.update(delta["changed"])
+
+    if isinstance(keyframe, list):
+        return list(entries.values())
+    return entries
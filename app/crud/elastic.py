@@ -1,5 +1,9 @@
 from enum import Enum
-from typing import Optional
+from typing import (
+    List,
+    Optional,
+    Union,
+)
 from uuid import UUID
 
 from elasticsearch_dsl.aggs import Agg
@@ -10,18 +14,23 @@ from app.core.config import ELASTIC_MAX_SIZE
 from app.elastic import (
     acomposite,
     afilter,
+    afilters,
     amissing,
     aterms,
     qbool,
     qboolor,
-    qmatch,
     qnotexists,
     qsimplequerystring,
     qterm,
     qterms,
     script,
+    stored_script,
+    stored_script_id,
+)
+from app.elastic.utils import (
+    handle_text_field,
+    keyword_values,
 )
-from app.elastic.utils import handle_text_field
 from app.models.collection import CollectionAttribute
 from app.models.elastic import ElasticResourceAttribute
 from app.models.learning_material import LearningMaterialAttribute
@@ -92,43 +101,54 @@ runtime_mappings_material_type = {
     }
 }
 
-# TODO: parameterize Attribute model
-runtime_mappings_collection_validation = {
-    "char_count_title": {
-        "type": "long",
-        "script": script(
-            """
+# painless of the collection validation runtime fields by name, registered as
+# stored scripts unless COLLECTION_VALIDATION_MODE is inline
+collection_validation_scripts = {
+    "char-count": """
             if (doc.containsKey(params.field) && !doc[params.field].empty) {
                 emit(doc[params.field].value.length());
             }
             """,
-            params={"field": handle_text_field(CollectionAttribute.TITLE)},
-        ),
-    },
-    "token_count_keywords": {
-        "type": "long",
-        "script": script(
-            """
+    "token-count": """
             if (doc.containsKey(params.field) && !doc[params.field].empty) {
                 emit(doc[params.field].length);
             }
             """,
-            params={"field": handle_text_field(CollectionAttribute.KEYWORDS)},
-        ),
-    },
-    "char_count_description": {
-        "type": "long",
-        "script": script(
-            """
-            if (doc.containsKey(params.field) && !doc[params.field].empty) {
-                emit(doc[params.field].value.length());
-            }
-            """,
-            params={"field": handle_text_field(CollectionAttribute.DESCRIPTION)},
-        ),
-    },
 }
 
+collection_validation_script_ids = {
+    name: stored_script_id(name, source)
+    for name, source in collection_validation_scripts.items()
+}
+
+# TODO: parameterize Attribute model
+# runtime field -> script name, field passed as parameter
+collection_validation_runtime_fields = {
+    "char_count_title": ("char-count", CollectionAttribute.TITLE),
+    "token_count_keywords": ("token-count", CollectionAttribute.KEYWORDS),
+    "char_count_description": ("char-count", CollectionAttribute.DESCRIPTION),
+}
+
+
+def _runtime_mappings_collection_validation(stored: bool) -> dict:
+    mappings = {}
+    for field, (name, qfield) in collection_validation_runtime_fields.items():
+        params = {"field": handle_text_field(qfield)}
+        if stored:
+            snippet = stored_script(collection_validation_script_ids[name], params)
+        else:
+            snippet = script(collection_validation_scripts[name], params)
+        mappings[field] = {"type": "long", "script": snippet}
+    return mappings
+
+
+runtime_mappings_collection_validation = _runtime_mappings_collection_validation(
+    stored=False
+)
+runtime_mappings_collection_validation_stored = _runtime_mappings_collection_validation(
+    stored=True
+)
+
 
 class ResourceType(str, Enum):
     COLLECTION = "COLLECTION"
@@ -151,6 +171,17 @@ type_filter = {
 }
 
 
+ancestor_path = {
+    ResourceType.COLLECTION: CollectionAttribute.PATH,
+    ResourceType.MATERIAL: LearningMaterialAttribute.COLLECTION_PATH,
+}
+
+ancestor_noderef_id = {
+    ResourceType.COLLECTION: ElasticResourceAttribute.NODEREF_ID,
+    ResourceType.MATERIAL: LearningMaterialAttribute.COLLECTION_NODEREF_ID,
+}
+
+
 # TODO: eliminate; use query_many instead
 def get_many_base_query(
     resource_type: ResourceType, ancestor_id: Optional[UUID] = None,
@@ -158,12 +189,15 @@ def get_many_base_query(
     query_dict = {"filter": [*base_filter, *type_filter[resource_type]]}
 
     if ancestor_id:
-        prefix = "collections." if resource_type == ResourceType.MATERIAL else ""
-        query_dict["should"] = [
-            qmatch(**{f"{prefix}path": ancestor_id}),
-            qmatch(**{f"{prefix}nodeRef.id": ancestor_id}),
-        ]
-        query_dict["minimum_should_match"] = 1
+        # the ancestor itself or any of its descendants, in filter context
+        query_dict["filter"].append(
+            qboolor(
+                [
+                    qterm(qfield=ancestor_path[resource_type], value=ancestor_id),
+                    qterm(qfield=ancestor_noderef_id[resource_type], value=ancestor_id),
+                ]
+            )
+        )
 
     return query_dict
 
@@ -171,18 +205,23 @@ def get_many_base_query(
 def query_many(resource_type: ResourceType, ancestor_id: UUID = None) -> Query:
     qfilter = [*base_filter, *type_filter[resource_type]]
     if ancestor_id:
-        if resource_type is ResourceType.COLLECTION:
-            qfilter.append(qterm(qfield=CollectionAttribute.PATH, value=ancestor_id))
-        elif resource_type is ResourceType.MATERIAL:
-            qfilter.append(
-                qterm(
-                    qfield=LearningMaterialAttribute.COLLECTION_PATH, value=ancestor_id
-                )
-            )
+        qfilter.append(qterm(qfield=ancestor_path[resource_type], value=ancestor_id))
 
     return qbool(filter=qfilter)
 
 
+def query_many_by_ancestors(
+    resource_type: ResourceType, ancestor_ids: List[UUID]
+) -> Query:
+    return qbool(
+        filter=[
+            *base_filter,
+            *type_filter[resource_type],
+            qterms(qfield=ancestor_path[resource_type], values=ancestor_ids),
+        ]
+    )
+
+
 def query_collections(ancestor_id: UUID = None) -> Query:
     return query_many(ResourceType.COLLECTION, ancestor_id=ancestor_id)
 
@@ -259,18 +298,61 @@ def agg_material_types_by_collection(size: int = ELASTIC_MAX_SIZE) -> Agg:
     )
 
 
+MIN_TITLE_LENGTH = 5
+MIN_KEYWORDS = 3
+MIN_DESCRIPTION_LENGTH = 30
+
 aggs_collection_validation = {
     "missing_title": amissing(qfield=CollectionAttribute.TITLE),
-    "short_title": afilter(Q("range", char_count_title={"gt": 0, "lt": 5})),
+    "short_title": afilter(
+        Q("range", char_count_title={"gt": 0, "lt": MIN_TITLE_LENGTH})
+    ),
     "missing_keywords": amissing(qfield=CollectionAttribute.KEYWORDS),
-    "few_keywords": afilter(Q("range", token_count_keywords={"gt": 0, "lt": 3})),
+    "few_keywords": afilter(
+        Q("range", token_count_keywords={"gt": 0, "lt": MIN_KEYWORDS})
+    ),
     "missing_description": amissing(qfield=CollectionAttribute.DESCRIPTION),
     "short_description": afilter(
-        Q("range", char_count_description={"gt": 0, "lt": 30})
+        Q("range", char_count_description={"gt": 0, "lt": MIN_DESCRIPTION_LENGTH})
     ),
     "missing_educontext": amissing(qfield=CollectionAttribute.EDUCONTEXT),
 }
 
+# the errors each of the collection validation aggregations stands for
+collection_validation_errors = {
+    "missing_title": ("title", OehValidationError.MISSING),
+    "short_title": ("title", OehValidationError.TOO_SHORT),
+    "missing_keywords": ("keywords", OehValidationError.MISSING),
+    "few_keywords": ("keywords", OehValidationError.TOO_FEW),
+    "missing_description": ("description", OehValidationError.MISSING),
+    "short_description": ("description", OehValidationError.TOO_SHORT),
+    "missing_educontext": ("educontext", OehValidationError.MISSING),
+}
+
+
+def collection_validation_bucket(source: dict) -> dict:
+    """
+    The sub-aggregations of agg_collection_validation for one collection,
+    evaluated on its _source instead of by elastic.
+    """
+    title = keyword_values(source, CollectionAttribute.TITLE)
+    keywords = keyword_values(source, CollectionAttribute.KEYWORDS)
+    description = keyword_values(source, CollectionAttribute.DESCRIPTION)
+    educontext = keyword_values(source, CollectionAttribute.EDUCONTEXT)
+
+    # painless .value is the smallest of the doc values
+    matched = {
+        "missing_title": not title,
+        "short_title": title and 0 < len(title[0]) < MIN_TITLE_LENGTH,
+        "missing_keywords": not keywords,
+        "few_keywords": 0 < len(keywords) < MIN_KEYWORDS,
+        "missing_description": not description,
+        "short_description": description
+        and 0 < len(description[0]) < MIN_DESCRIPTION_LENGTH,
+        "missing_educontext": not educontext,
+    }
+    return {name: {"doc_count": int(bool(m))} for name, m in matched.items()}
+
 
 def agg_collection_validation(size: int = ELASTIC_MAX_SIZE) -> Agg:
     agg = aterms(qfield=CollectionAttribute.NODEREF_ID, size=size)
@@ -281,55 +363,27 @@ def agg_collection_validation(size: int = ELASTIC_MAX_SIZE) -> Agg:
     return agg
 
 
-def parse_agg_collection_validation_response(agg_response: AggResponse):
-    return [
-        {
+def parse_agg_collection_validation_response(
+    agg_response: Union[AggResponse, dict]
+) -> List[dict]:
+    if isinstance(agg_response, AggResponse):
+        agg_response = agg_response.to_dict()
+
+    parsed = []
+    for bucket in agg_response["buckets"]:
+        entry = {
             "noderef_id": bucket["key"],
-            "title": list(
-                filter(
-                    None,
-                    [
-                        OehValidationError.MISSING
-                        if bucket["missing_title"]["doc_count"]
-                        else None,
-                        OehValidationError.TOO_SHORT
-                        if bucket["short_title"]["doc_count"]
-                        else None,
-                    ],
-                )
-            ),
-            "keywords": list(
-                filter(
-                    None,
-                    [
-                        OehValidationError.MISSING
-                        if bucket["missing_keywords"]["doc_count"]
-                        else None,
-                        OehValidationError.TOO_FEW
-                        if bucket["few_keywords"]["doc_count"]
-                        else None,
-                    ],
-                )
-            ),
-            "description": list(
-                filter(
-                    None,
-                    [
-                        OehValidationError.MISSING
-                        if bucket["missing_description"]["doc_count"]
-                        else None,
-                        OehValidationError.TOO_SHORT
-                        if bucket["short_description"]["doc_count"]
-                        else None,
-                    ],
-                )
-            ),
-            "educontext": [OehValidationError.MISSING]
-            if bucket["missing_educontext"]["doc_count"]
-            else [],
+            "title": [],
+            "keywords": [],
+            "description": [],
+            "educontext": [],
         }
-        for bucket in agg_response.to_dict()["buckets"]
-    ]
+        for name, (field, error) in collection_validation_errors.items():
+            if bucket[name]["doc_count"]:
+                entry[field].append(error)
+        parsed.append(entry)
+
+    return parsed
 
 
 aggs_material_validation = {
@@ -356,6 +410,24 @@ def agg_material_score(size: int = ELASTIC_MAX_SIZE) -> Agg:
     return agg
 
 
+def agg_by_ancestor(
+    resource_type: ResourceType, ancestor_ids: List[UUID], aggs: dict
+) -> Agg:
+    agg = afilters(
+        filters={
+            str(ancestor_id): qterm(
+                qfield=ancestor_path[resource_type], value=ancestor_id
+            )
+            for ancestor_id in ancestor_ids
+        }
+    )
+
+    for name, _agg in aggs.items():
+        agg.bucket(name, _agg)
+
+    return agg
+
+
 def agg_material_validation(size: int = ELASTIC_MAX_SIZE) -> Agg:
     agg = aterms(qfield=LearningMaterialAttribute.COLLECTION_NODEREF_ID, size=size)
 
@@ -365,16 +437,17 @@ def agg_material_validation(size: int = ELASTIC_MAX_SIZE) -> Agg:
     return agg
 
 
-def parse_agg_material_validation_response(agg_response: AggResponse):
-    # TODO: refactor algorithm
+def parse_agg_material_validation_response(
+    agg_response: Union[AggResponse, dict]
+) -> List[dict]:
+    if isinstance(agg_response, AggResponse):
+        agg_response = agg_response.to_dict()
+
     return [
         {
             "noderef_id": bucket["key"],
-            **{
-                k: v["doc_count"]
-                for k, v in bucket.items()
-                if k not in ("key", "doc_count")
-            },
+            "total": bucket["doc_count"],
+            **{name: bucket[name]["doc_count"] for name in aggs_material_validation},
         }
-        for bucket in agg_response.to_dict()["buckets"]
+        for bucket in agg_response["buckets"]
     ]
@@ -5,8 +5,8 @@ from typing import (
 )
 from uuid import UUID
 
-from elasticsearch_dsl.response import Response
 from glom import (
+    Coalesce,
     glom,
     Iter,
 )
@@ -26,6 +26,7 @@ from app.elastic import (
     Search,
     qbool,
     qwildcard,
+    raw_success,
 )
 from app.models.learning_material import (
     LearningMaterial,
@@ -85,26 +86,38 @@ async def get_many(
 
 
 async def material_count(ancestor_id: UUID) -> int:
-    s = Search().query(query_materials(ancestor_id=ancestor_id))
+    s = (
+        Search()
+        .query(query_materials(ancestor_id=ancestor_id))
+        .response_paths("hits.total.value")
+    )
 
-    response: Response = s[:0].execute()
+    response = await s[:0].execute_raw_cached()
 
-    if response.success():
-        return response.hits.total.value
+    if raw_success(response):
+        return response["hits"]["total"]["value"]
 
 
 async def material_types() -> List[str]:
-    s = Search().query(query_materials())
+    s = (
+        Search()
+        .query(query_materials())
+        .response_paths("aggregations.material_types.buckets.key")
+    )
     s.aggs.bucket("material_types", agg_material_types())
 
-    response: Response = s[:0].execute()
+    response = await s[:0].execute_raw_cached()
 
-    if response.success():
+    if raw_success(response):
         # TODO: refactor algorithm
+        # filter_path drops the aggregations entirely without any bucket
         return glom(
-            response.aggregations.material_types.buckets,
-            # (Iter("key").map(lambda k: {slugify(k): k}).all(), merge,),
-            Iter("key").all(),
+            response,
+            (
+                Coalesce("aggregations.material_types.buckets", default=[]),
+                # (Iter("key").map(lambda k: {slugify(k): k}).all(), merge,),
+                Iter("key").all(),
+            ),
         )
 
 
@@ -1,20 +1,46 @@
+from datetime import timedelta
+from typing import List
 from uuid import UUID
 
+from app.core.logging import logger
+from app.crud.stats import invalidate_stats_cache
 from app.pg.pg_utils import get_postgres
 from app.pg.queries import (
+    stats_anchor_range,
     stats_clear,
-    stats_duplicate_backwards,
+    stats_ensure_partitions,
+    stats_generate_history,
 )
 
 
 async def clear_stats():
     postgres = await get_postgres()
-    async with postgres.pool.acquire() as conn:
+    async with postgres.acquire() as conn:
         await stats_clear(conn)
 
+    await invalidate_stats_cache()
 
-async def seed_stats(noderef_id: UUID, size: int = 10):
+
+async def seed_stats(
+    days: int = 10, jitter: float = 0.0, noderef_ids: List[UUID] = None
+):
+    # runs in the background, so waits for a connection instead of failing
     postgres = await get_postgres()
-    async with postgres.pool.acquire() as conn:
-        for _ in range(size):
-            await stats_duplicate_backwards(conn, noderef_id=noderef_id)
+    async with postgres.acquire(timeout=None) as conn:
+        anchors = await stats_anchor_range(conn, noderef_ids=noderef_ids)
+        if not anchors["earliest"]:
+            return
+
+        async with conn.transaction():
+            await stats_ensure_partitions(
+                conn,
+                since=anchors["earliest"] - timedelta(days=days),
+                until=anchors["latest"],
+            )
+            status = await stats_generate_history(
+                conn, days=days, jitter=jitter, noderef_ids=noderef_ids
+            )
+
+    logger.info(f"Seeded {days} days of stats history: {status}")
+
+    await invalidate_stats_cache()
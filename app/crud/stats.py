@@ -1,54 +1,97 @@
-# import asyncio
+import asyncio
 import json
 from collections import defaultdict
-from datetime import datetime
+from datetime import (
+    datetime,
+    timedelta,
+)
 from pprint import pformat
-from typing import List, Union
+from typing import Callable, Dict, List, Union
 from uuid import UUID
 
+import numpy as np
 from aiofiles import open
 from aiofiles.os import mkdir
 from asyncpg import (
     Connection,
     Record,
 )
-from elasticsearch_dsl.response import Response
 from fastapi import HTTPException
-from glom import merge
+from glom import glom
+from starlette.concurrency import run_in_threadpool
 
 import app.crud.collection as crud_collection
+from app.cache import (
+    CacheBackend,
+    get_cache,
+)
 from app.core.config import (
+    CACHE_TTL,
+    COLLECTION_VALIDATION_MODE,
     DATA_DIR,
     DEBUG,
+    ELASTIC_MAX_SIZE,
+    SCORE_COUNTS_TTL,
+    STATS_DELTA_ENCODING,
+    STATS_KEYFRAME_INTERVAL,
 )
 
-from app.elastic import Search
+from app.elastic import (
+    Search,
+    raw_success,
+)
 from app.elastic.utils import (
     merge_agg_response,
     merge_composite_agg_response,
 )
-from app.models.stats import StatType
+from app.models.collection import CollectionAttribute
+from app.models.stats import (
+    RetentionPolicy,
+    RetentionReport,
+    RetentionReportEntry,
+    StatType,
+)
+from app.pg import codecs
 from app.pg.pg_utils import get_postgres
+from app.pg.postgres import Postgres
 from app.pg.queries import (
+    stats_compact,
+    stats_drop_partitions,
+    stats_ensure_partitions,
+    stats_history,
     stats_insert,
+    stats_keyframe,
     stats_latest,
+    stats_retention_report,
     stats_timeline,
 )
 from app.core.logging import logger
 from app.crud.elastic import ResourceType
+from .delta import (
+    DELTA_STAT_TYPES,
+    apply_delta,
+    delta_size,
+    encode_delta,
+)
 from .elastic import (
+    agg_by_ancestor,
     agg_collection_validation,
     agg_materials_by_collection,
+    agg_material_score,
     agg_material_types,
     agg_material_types_by_collection,
     agg_material_validation,
     aggs_collection_validation,
     aggs_material_validation,
+    collection_validation_bucket,
+    collection_validation_errors,
     parse_agg_collection_validation_response,
     parse_agg_material_validation_response,
     query_collections,
+    query_many_by_ancestors,
     query_materials,
     runtime_mappings_collection_validation,
+    runtime_mappings_collection_validation_stored,
     search_materials,
 )
 from .util import build_portal_tree
@@ -61,45 +104,139 @@ async def run_stats_score(noderef_id: UUID, resource_type: ResourceType) -> dict
     elif resource_type is ResourceType.MATERIAL:
         query, aggs = query_materials, aggs_material_validation
 
-    s = Search().query(query(ancestor_id=noderef_id))
+    # totals beyond 10000 hits are only counted exactly when asked for
+    s = (
+        Search()
+        .query(query(ancestor_id=noderef_id))
+        .extra(track_total_hits=True)
+        .response_paths("hits.total.value", "aggregations.*.doc_count")
+    )
     for name, _agg in aggs.items():
         s.aggs.bucket(name, _agg)
 
-    response: Response = s[:0].execute()
+    response = await s[:0].execute_raw_cached()
 
-    if response.success():
+    if raw_success(response):
         return {
-            "total": response.hits.total.value,
-            **{k: v["doc_count"] for k, v in response.aggregations.to_dict().items()},
+            "total": response["hits"]["total"]["value"],
+            **{k: v["doc_count"] for k, v in response["aggregations"].items()},
         }
 
 
-async def material_counts_by_type(root_noderef_id: UUID) -> dict:
-    s = Search().query(query_materials(ancestor_id=root_noderef_id))
-    s.aggs.bucket("material_types", agg_material_types_by_collection())
-    s.aggs.bucket("totals", agg_materials_by_collection())
+def _score_counts_ttl(cache: CacheBackend) -> int:
+    # a cache local to the worker misses the stats runs of the other workers
+    if cache.shared:
+        return SCORE_COUNTS_TTL
+    return SCORE_COUNTS_TTL or CACHE_TTL
+
+
+async def read_score_counts_cached(noderef_id: UUID) -> dict:
+    """
+    Raw counts of run_stats_score for collections and materials, kept until
+    the next stats run of the portal or SCORE_COUNTS_TTL, so scores with other
+    modulators or weights are computed without querying elastic.
+    """
+    cache = await get_cache()
+    key = _stats_cache_key(noderef_id, "score-counts")
+
+    counts = await cache.get(key)
+    if counts is None:
+        collection_stats, material_stats = await asyncio.gather(
+            run_stats_score(
+                noderef_id=noderef_id, resource_type=ResourceType.COLLECTION
+            ),
+            run_stats_score(noderef_id=noderef_id, resource_type=ResourceType.MATERIAL),
+        )
+        counts = {"collections": collection_stats, "materials": material_stats}
+        await cache.set(key, counts, ttl=_score_counts_ttl(cache))
+
+    return counts
+
+
+async def run_stats_score_by_portal(
+    resource_type: ResourceType, portal_ids: List[UUID]
+) -> Dict[str, dict]:
+    """run_stats_score for many portals at once, keyed by portal id."""
+    aggs = None
+    if resource_type is ResourceType.COLLECTION:
+        aggs = aggs_collection_validation
+    elif resource_type is ResourceType.MATERIAL:
+        aggs = aggs_material_validation
+
+    s = (
+        Search()
+        .query(query_many_by_ancestors(resource_type, portal_ids))
+        .response_paths("aggregations.grouped_by_portal.buckets.**.doc_count")
+    )
+    s.aggs.bucket("grouped_by_portal", agg_by_ancestor(resource_type, portal_ids, aggs))
 
-    response: Response = s[:0].execute()
+    response = await s[:0].execute_raw_cached()
 
-    if response.success():
+    if raw_success(response):
+        buckets = response["aggregations"]["grouped_by_portal"]["buckets"]
+        return {
+            noderef_id: {
+                "total": bucket["doc_count"],
+                **{name: bucket[name]["doc_count"] for name in aggs},
+            }
+            for noderef_id, bucket in buckets.items()
+        }
+
+
+async def run_stats_score_by_collection(noderef_id: UUID) -> Dict[str, dict]:
+    """Raw material score counts for every collection holding materials."""
+    s = (
+        Search()
+        .query(query_materials(ancestor_id=noderef_id))
+        .response_paths(
+            "aggregations.grouped_by_collection.buckets.key",
+            "aggregations.grouped_by_collection.buckets.**.doc_count",
+        )
+    )
+    s.aggs.bucket("grouped_by_collection", agg_material_score())
 
-        def fold_material_types(carry, bucket):
-            material_type = bucket["key"]["material_type"]
-            if not material_type:
-                material_type = "N/A"
-            count = bucket["doc_count"]
-            record = carry[bucket["key"]["noderef_id"]]
-            record[material_type] = count
+    response = await s[:0].execute_raw_cached()
 
-        # TODO: refactor algorithm
-        stats = merge(
-            response.aggregations.material_types.buckets,
-            op=fold_material_types,
-            init=lambda: defaultdict(dict),
+    if raw_success(response):
+        # filter_path drops the aggregations entirely without any bucket
+        buckets = glom(
+            response, "aggregations.grouped_by_collection.buckets", default=[]
         )
+        return {
+            bucket["key"]: {
+                "total": bucket["doc_count"],
+                **{
+                    name: bucket[name]["doc_count"] for name in aggs_material_validation
+                },
+            }
+            for bucket in buckets
+        }
+
+
+async def material_counts_by_type(root_noderef_id: UUID) -> dict:
+    s = (
+        Search()
+        .query(query_materials(ancestor_id=root_noderef_id))
+        .response_paths(
+            "aggregations.*.buckets.key", "aggregations.*.buckets.doc_count"
+        )
+    )
+    s.aggs.bucket("material_types", agg_material_types_by_collection())
+    s.aggs.bucket("totals", agg_materials_by_collection())
+
+    response = await s[:0].execute_raw_cached()
+
+    if raw_success(response):
+        # filter_path drops the aggregations entirely without any bucket
+        buckets = glom(response, "aggregations.material_types.buckets", default=[])
+        stats = defaultdict(dict)
+        for bucket in buckets:
+            material_type = bucket["key"]["material_type"] or "N/A"
+            stats[bucket["key"]["noderef_id"]][material_type] = bucket["doc_count"]
 
         totals = merge_composite_agg_response(
-            response.aggregations.totals, key="noderef_id"
+            glom(response, "aggregations.totals", default={"buckets": []}),
+            key="noderef_id",
         )
 
         for noderef_id, counts in stats.items():
@@ -109,13 +246,20 @@ async def material_counts_by_type(root_noderef_id: UUID) -> dict:
 
 
 async def search_hits_by_material_type(query_string: str) -> dict:
-    s = Search().query(query_materials()).query(search_materials(query_string))
+    s = (
+        Search()
+        .query(query_materials())
+        .filter(search_materials(query_string))
+        .response_paths("aggregations.material_types.buckets")
+    )
     s.aggs.bucket("material_types", agg_material_types())
 
-    response: Response = s[:0].execute()
+    response = await s[:0].execute_raw_cached()
 
-    if response.success():
-        stats = merge_agg_response(response.aggregations.material_types)
+    if raw_success(response):
+        stats = merge_agg_response(
+            glom(response, "aggregations.material_types", default={"buckets": []})
+        )
         stats["total"] = sum(stats.values())
         return stats
 
@@ -135,31 +279,103 @@ async def run_stats_material_types(root_noderef_id: UUID) -> dict:
     return stats
 
 
-async def run_stats_validation_collections(root_noderef_id: UUID) -> List[dict]:
+def scan_collection_validation(root_noderef_id: UUID) -> List[dict]:
+    """
+    Evaluates the collection validation on the _source of every collection
+    instead of runtime fields, see COLLECTION_VALIDATION_MODE.
+    """
     s = (
         Search()
         .query(query_collections(ancestor_id=root_noderef_id))
-        .extra(runtime_mappings=runtime_mappings_collection_validation)
+        .source(
+            [
+                CollectionAttribute.NODEREF_ID,
+                CollectionAttribute.TITLE,
+                CollectionAttribute.KEYWORDS,
+                CollectionAttribute.DESCRIPTION,
+                CollectionAttribute.EDUCONTEXT,
+            ]
+        )
+    )
+
+    buckets = {}
+    for hit in s.scan_raw():
+        source = hit["_source"]
+        noderef_id = glom(source, CollectionAttribute.NODEREF_ID.path, default=None)
+        if noderef_id is None:
+            continue
+
+        bucket = buckets.setdefault(
+            noderef_id,
+            {
+                "key": noderef_id,
+                "doc_count": 0,
+                **{name: {"doc_count": 0} for name in aggs_collection_validation},
+            },
+        )
+        bucket["doc_count"] += 1
+        for name, agg in collection_validation_bucket(source).items():
+            bucket[name]["doc_count"] += agg["doc_count"]
+
+    # in the order of the terms aggregation: by doc count, then by key
+    buckets = sorted(buckets.values(), key=lambda b: (-b["doc_count"], b["key"]))
+    return parse_agg_collection_validation_response(
+        {"buckets": buckets[:ELASTIC_MAX_SIZE]}
+    )
+
+
+async def run_stats_validation_collections(
+    root_noderef_id: UUID, mode: str = COLLECTION_VALIDATION_MODE
+) -> List[dict]:
+    if mode == "client":
+        return await run_in_threadpool(scan_collection_validation, root_noderef_id)
+
+    runtime_mappings = (
+        runtime_mappings_collection_validation_stored
+        if mode == "stored"
+        else runtime_mappings_collection_validation
+    )
+    s = (
+        Search()
+        .query(query_collections(ancestor_id=root_noderef_id))
+        .extra(runtime_mappings=runtime_mappings)
+        .response_paths(
+            "aggregations.grouped_by_collection.buckets.key",
+            "aggregations.grouped_by_collection.buckets.*.doc_count",
+        )
     )
     s.aggs.bucket("grouped_by_collection", agg_collection_validation())
 
-    response: Response = s[:0].execute()
+    response = s[:0].execute_raw()
 
-    if response.success():
+    if raw_success(response):
+        # filter_path drops the aggregation entirely without any bucket
         return parse_agg_collection_validation_response(
-            response.aggregations.grouped_by_collection
+            glom(
+                response, "aggregations.grouped_by_collection", default={"buckets": []},
+            )
         )
 
 
 async def run_stats_validation_materials(root_noderef_id: UUID) -> List[dict]:
-    s = Search().query(query_materials(ancestor_id=root_noderef_id))
+    s = (
+        Search()
+        .query(query_materials(ancestor_id=root_noderef_id))
+        .response_paths(
+            "aggregations.grouped_by_collection.buckets.key",
+            "aggregations.grouped_by_collection.buckets.doc_count",
+            "aggregations.grouped_by_collection.buckets.*.doc_count",
+        )
+    )
     s.aggs.bucket("grouped_by_collection", agg_material_validation())
 
-    response: Response = s[:0].execute()
+    response = s[:0].execute_raw()
 
-    if response.success():
+    if raw_success(response):
         return parse_agg_material_validation_response(
-            response.aggregations.grouped_by_collection
+            glom(
+                response, "aggregations.grouped_by_collection", default={"buckets": []},
+            )
         )
 
 
@@ -179,13 +395,20 @@ async def run_stats(noderef_id: UUID):
 
     derived_at = datetime.now()
 
+    # runs in the background, so waits for a connection instead of failing
+    postgres = await get_postgres()
+    async with postgres.acquire(timeout=None) as conn:
+        await stats_ensure_partitions(
+            conn, since=derived_at, until=derived_at + timedelta(days=31)
+        )
+
     async def store_stats(t):
         postgres = await get_postgres()
 
         stat_type, stats = t
 
-        async with postgres.pool.acquire() as conn:
-            row = await stats_insert(
+        async with postgres.acquire(timeout=None) as conn:
+            row = await insert_stats(
                 conn,
                 noderef_id=noderef_id,
                 stat_type=stat_type,
@@ -203,6 +426,8 @@ async def run_stats(noderef_id: UUID):
     await store_stats((StatType.VALIDATION_COLLECTIONS, validation_collections_stats))
     await store_stats((StatType.VALIDATION_MATERIALS, validation_materials_stats))
 
+    await invalidate_stats_cache(noderef_id=noderef_id)
+
     # results = await asyncio.gather([
     #     store_stats((StatType.PORTAL_TREE, tree)),
     #     store_stats((StatType.MATERIAL_TYPES, material_types_stats)),
@@ -211,16 +436,61 @@ async def run_stats(noderef_id: UUID):
     # ])
 
 
+async def insert_stats(
+    conn: Connection,
+    noderef_id: UUID,
+    stat_type: StatType,
+    stats: Union[list, dict],
+    derived_at: datetime,
+) -> Record:
+    keyframe_id = None
+
+    if STATS_DELTA_ENCODING and stat_type in DELTA_STAT_TYPES:
+        keyframe = await stats_keyframe(
+            conn, noderef_id=noderef_id, stat_type=stat_type
+        )
+
+        if keyframe and keyframe["delta_count"] < STATS_KEYFRAME_INTERVAL - 1:
+            delta = encode_delta(keyframe["stats"], stats)
+
+            # a delta touching most entries is not worth the reconstruction
+            if delta_size(delta) <= len(stats) // 2:
+                stats, keyframe_id = delta, keyframe["id"]
+
+    return await stats_insert(
+        conn,
+        noderef_id=noderef_id,
+        stat_type=stat_type,
+        stats=stats,
+        derived_at=derived_at,
+        keyframe_id=keyframe_id,
+    )
+
+
 async def read_stats(
-    conn: Connection, stat_type: StatType, noderef_id: UUID, at: datetime = None
+    conn: Connection,
+    stat_type: StatType,
+    noderef_id: UUID,
+    at: datetime = None,
+    raw: bool = False,
 ) -> Union[dict, None]:
-    row = await stats_latest(conn, stat_type, noderef_id, at=at)
+    """With raw, stats are returned as json bytes instead of decoded."""
+    row = await stats_latest(conn, stat_type, noderef_id, at=at, raw=raw)
 
     if row:
+        row = dict(row)
+        keyframe_stats = row.pop("keyframe_stats")
+        if row["keyframe_id"] and raw:
+            row["stats"] = codecs.dumps(
+                apply_delta(codecs.loads(keyframe_stats), codecs.loads(row["stats"]))
+            )
+        elif row["keyframe_id"]:
+            row["stats"] = apply_delta(keyframe_stats, row["stats"])
+
         if DEBUG:
-            logger.debug(f"Read from postgres:\n{pformat(dict(row))}")
+            logger.debug(f"Read from postgres:\n{pformat(row)}")
 
-        return dict(row)
+        return row
 
 
 async def read_stats_timeline(conn: Connection, noderef_id: UUID) -> List[datetime]:
@@ -230,6 +500,249 @@ async def read_stats_timeline(conn: Connection, noderef_id: UUID) -> List[dateti
         return [row["derived_at"] for row in rows]
 
 
+def _stats_cache_key(noderef_id: Union[UUID, str], *parts) -> str:
+    return ":".join(["stats", str(noderef_id), *[str(p) for p in parts]])
+
+
+async def read_stats_cached(
+    postgres: Postgres, stat_type: StatType, noderef_id: UUID, at: datetime = None
+) -> Union[dict, None]:
+    """
+    Cached variant of read_stats holding only derived_at and stats of a row.
+    The stats are read raw and handed over as json text, they are decoded
+    once by the caller instead of also for the cache.
+
+    Entries are invalidated whenever new stats are stored for the portal.
+    """
+    cache = await get_cache()
+    key = _stats_cache_key(
+        noderef_id, stat_type.value, at.isoformat() if at else "latest"
+    )
+
+    cached = await cache.get(key)
+    if cached is not None:
+        return {
+            "derived_at": datetime.fromisoformat(cached["derived_at"]),
+            "stats": cached["stats"],
+        }
+
+    async with postgres.acquire() as conn:
+        row = await read_stats(
+            conn=conn, stat_type=stat_type, noderef_id=noderef_id, at=at, raw=True
+        )
+
+    if row:
+        row["stats"] = row["stats"].decode()
+        await cache.set(
+            key, {"derived_at": row["derived_at"].isoformat(), "stats": row["stats"]}
+        )
+
+    return row
+
+
+async def read_stats_timeline_cached(
+    postgres: Postgres, noderef_id: UUID
+) -> List[datetime]:
+    cache = await get_cache()
+    key = _stats_cache_key(noderef_id, "timeline")
+
+    cached = await cache.get(key)
+    if cached is not None:
+        return [datetime.fromisoformat(derived_at) for derived_at in cached]
+
+    async with postgres.acquire() as conn:
+        timeline = await read_stats_timeline(conn=conn, noderef_id=noderef_id)
+
+    if timeline:
+        await cache.set(key, [derived_at.isoformat() for derived_at in timeline])
+
+    return timeline
+
+
+def _sum_snapshots(
+    snapshots: List[list], entry_counts: Callable[[dict], list], width: int
+) -> List[List[int]]:
+    """
+    Column sums of the counts of every entry, per snapshot. The entries of
+    all snapshots form one matrix, summed at the snapshot boundaries.
+    """
+    rows = [entry_counts(entry) for stats in snapshots for entry in stats]
+    ends = np.cumsum([len(stats) for stats in snapshots])
+
+    matrix = np.array(rows, dtype=np.int64).reshape(len(rows), width)
+    cumulative = np.vstack(
+        [np.zeros((1, width), dtype=np.int64), matrix.cumsum(axis=0)]
+    )
+    starts = np.concatenate([[0], ends[:-1]])
+    return (cumulative[ends] - cumulative[starts]).tolist()
+
+
+def _collection_history_counts(snapshots: List[list]) -> List[List[int]]:
+    return _sum_snapshots(
+        snapshots,
+        lambda entry: [
+            1,
+            *[
+                error.value in entry.get(field, [])
+                for field, error in collection_validation_errors.values()
+            ],
+        ],
+        width=1 + len(collection_validation_errors),
+    )
+
+
+def _material_history_counts(snapshots: List[list]) -> List[List[int]]:
+    return _sum_snapshots(
+        snapshots,
+        lambda entry: [
+            entry["total"],
+            *[entry.get(k, 0) for k in aggs_material_validation],
+        ],
+        width=1 + len(aggs_material_validation),
+    )
+
+
+def _empty_score_history() -> dict:
+    return {"derived_at": [], "collections": [], "materials": []}
+
+
+async def score_history(
+    conn: Connection, noderef_ids: List[UUID] = None
+) -> Dict[str, dict]:
+    """
+    Counts behind the score of every stored run, keyed by portal and ordered
+    newest first. Rows hold the total followed by the counts of each key.
+
+    The snapshots hold counts per collection, so materials are counted once
+    per collection they belong to. Unlike the live score, which counts each
+    material of the portal once, materials in several collections weigh more.
+    """
+    rows = await stats_history(
+        conn,
+        stat_types=[StatType.VALIDATION_COLLECTIONS, StatType.VALIDATION_MATERIALS],
+        noderef_ids=noderef_ids,
+    )
+
+    runs = defaultdict(dict)
+    for row in rows:
+        stats = row["stats"]
+        if row["keyframe_id"]:
+            stats = apply_delta(row["keyframe_stats"], stats)
+
+        runs[(str(row["noderef_id"]), row["derived_at"])][row["stat_type"]] = stats
+
+    snapshots = defaultdict(_empty_score_history)
+    for (noderef_id, derived_at), run in runs.items():
+        collection_stats = run.get(StatType.VALIDATION_COLLECTIONS.value)
+        material_stats = run.get(StatType.VALIDATION_MATERIALS.value)
+        if collection_stats is None or material_stats is None:
+            continue
+        # snapshots stored before the totals were added cannot be scored
+        if any("total" not in entry for entry in material_stats):
+            continue
+
+        snapshots[noderef_id]["derived_at"].append(derived_at)
+        snapshots[noderef_id]["collections"].append(collection_stats)
+        snapshots[noderef_id]["materials"].append(material_stats)
+
+    return {
+        noderef_id: {
+            "derived_at": portal["derived_at"],
+            "collections": _collection_history_counts(portal["collections"]),
+            "materials": _material_history_counts(portal["materials"]),
+        }
+        for noderef_id, portal in snapshots.items()
+    }
+
+
+async def read_score_history_cached(postgres: Postgres, noderef_id: UUID) -> dict:
+    cache = await get_cache()
+    key = _stats_cache_key(noderef_id, "score-history")
+
+    cached = await cache.get(key)
+    if cached is not None:
+        return {
+            **cached,
+            "derived_at": [
+                datetime.fromisoformat(derived_at)
+                for derived_at in cached["derived_at"]
+            ],
+        }
+
+    async with postgres.acquire() as conn:
+        history = await score_history(conn=conn, noderef_ids=[noderef_id])
+
+    history = history.get(str(noderef_id), _empty_score_history())
+
+    await cache.set(
+        key,
+        {
+            **history,
+            "derived_at": [
+                derived_at.isoformat() for derived_at in history["derived_at"]
+            ],
+        },
+    )
+
+    return history
+
+
+async def invalidate_stats_cache(noderef_id: UUID = None):
+    cache = await get_cache()
+    if noderef_id:
+        await cache.delete_prefix(_stats_cache_key(noderef_id, ""))
+    else:
+        await cache.delete_prefix("stats:")
+
+
+async def compact_stats(
+    postgres: Postgres, policy: RetentionPolicy, dry_run: bool = True
+) -> RetentionReport:
+    now = datetime.now()
+    full_resolution_since = now - timedelta(days=policy.full_resolution_days)
+    daily_since = now - timedelta(days=policy.daily_days)
+
+    dropped_partitions = []
+
+    async with postgres.acquire() as conn:
+        async with conn.transaction():
+            if policy.max_age_days:
+                dropped_partitions = await stats_drop_partitions(
+                    conn,
+                    before=now - timedelta(days=policy.max_age_days),
+                    dry_run=dry_run,
+                )
+
+            rows = await stats_retention_report(
+                conn,
+                full_resolution_since=full_resolution_since,
+                daily_since=daily_since,
+            )
+
+            if not dry_run:
+                status = await stats_compact(
+                    conn,
+                    full_resolution_since=full_resolution_since,
+                    daily_since=daily_since,
+                )
+                logger.info(f"Compacted stats history: {status}")
+
+    if not dry_run:
+        await invalidate_stats_cache()
+
+    entries = [RetentionReportEntry(**dict(row)) for row in rows]
+
+    return RetentionReport(
+        dry_run=dry_run,
+        policy=policy,
+        full_resolution_since=full_resolution_since,
+        daily_since=daily_since,
+        deleted=sum(entry.deleted for entry in entries),
+        entries=entries,
+        dropped_partitions=dropped_partitions,
+    )
+
+
 async def write_stats_file(row: Record, stat_type: StatType):
     try:
         await mkdir(DATA_DIR / stat_type.value)
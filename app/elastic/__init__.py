@@ -2,6 +2,7 @@ from .dsl import (
     abucketsort,
     acomposite,
     afilter,
+    afilters,
     amissing,
     aterms,
     qbool,
@@ -14,9 +15,14 @@ from .dsl import (
     qterms,
     qwildcard,
     script,
+    stored_script,
+    stored_script_id,
 )
 from .fields import (
     Field,
     FieldType,
 )
-from .search import Search
+from .search import (
+    Search,
+    raw_success,
+)
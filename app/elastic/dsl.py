@@ -1,5 +1,9 @@
+import hashlib
+import json
 from typing import (
+    Dict,
     List,
+    Tuple,
     Union,
 )
 
@@ -10,7 +14,10 @@ from elasticsearch_dsl import (
 from elasticsearch_dsl.aggs import Agg
 from elasticsearch_dsl.query import Query
 
-from .fields import Field
+from .fields import (
+    Field,
+    keyword_paths,
+)
 from .utils import handle_text_field
 
 
@@ -69,6 +76,10 @@ def afilter(query: Query) -> Agg:
     return A("filter", query)
 
 
+def afilters(filters: Dict[str, Query], **kwargs) -> Agg:
+    return A("filters", filters=filters, **kwargs)
+
+
 def amissing(qfield: Union[Field, str]) -> Agg:
     return A("missing", field=handle_text_field(qfield))
 
@@ -88,3 +99,181 @@ def script(source: str, params: dict = None) -> dict:
     if params:
         snippet["params"] = params
     return snippet
+
+
+def stored_script(id: str, params: dict = None) -> dict:
+    snippet = {
+        "id": id,
+    }
+    if params:
+        snippet["params"] = params
+    return snippet
+
+
+def stored_script_id(name: str, source: str) -> str:
+    """Versions the id of a stored script by its source."""
+    digest = hashlib.sha1(source.encode()).hexdigest()[:8]
+    return f"metaqs-{name}-{digest}"
+
+
+# queries left as they are at the top of a search not reading scores, a bool
+# is optimized itself and the others do not score
+_UNSCORED = {"bool", "constant_score", "match_all", "match_none"}
+
+
+def is_keyword(field: str) -> bool:
+    return field.endswith(".keyword") or field in keyword_paths
+
+
+def scores_used(body: dict) -> bool:
+    """Whether the hits of a search body are ordered or filtered by score."""
+    if body.get("min_score") is not None or body.get("track_scores"):
+        return True
+    if body.get("size") == 0:
+        return False
+
+    sort = body.get("sort")
+    if not sort:
+        return True
+    sort = sort if isinstance(sort, list) else [sort]
+    return any(
+        (spec if isinstance(spec, str) else next(iter(spec))) == "_score"
+        for spec in sort
+    )
+
+
+def _single(body: dict) -> Tuple[str, object]:
+    ((field, value),) = body.items()
+    return field, value
+
+
+def _rewrite_leaf(kind: str, body: dict, rewrites: List[str]) -> Union[dict, None]:
+    if kind == "wildcard" and len(body) == 1:
+        field, value = _single(body)
+        if isinstance(value, dict) and set(value) == {"value"}:
+            value = value["value"]
+        # analyzed values without any token, e.g. "", exist but match no
+        # wildcard, on keywords both match every indexed value
+        if value == "*" and is_keyword(field):
+            rewrites.append(f"wildcard * on {field} to exists")
+            return {"exists": {"field": field}}
+
+    if kind == "match" and len(body) == 1:
+        field, value = _single(body)
+        if isinstance(value, dict) and set(value) == {"query"}:
+            value = value["query"]
+        if is_keyword(field) and not isinstance(value, (dict, list)):
+            rewrites.append(f"match on keyword {field} to term")
+            return {"term": {field: value}}
+
+    return None
+
+
+def _dedupe(clauses: list, occur: str, rewrites: List[str]) -> list:
+    seen = set()
+    deduped = []
+    for clause in clauses:
+        key = json.dumps(clause, sort_keys=True, default=str)
+        if key in seen:
+            rewrites.append(f"duplicate {occur} clause dropped")
+            continue
+        seen.add(key)
+        deduped.append(clause)
+    return deduped
+
+
+def _optimize(query: dict, scoring: bool, rewrites: List[str]) -> dict:
+    if not isinstance(query, dict) or len(query) != 1:
+        return query
+
+    kind, body = _single(query)
+
+    if kind == "bool":
+        body = dict(body)
+        for occur in ("must", "filter", "should", "must_not"):
+            if occur not in body:
+                continue
+            clauses = body[occur] if isinstance(body[occur], list) else [body[occur]]
+            # only must and should clauses of a scoring bool are scored
+            clause_scoring = scoring and occur in ("must", "should")
+            clauses = [_optimize(c, clause_scoring, rewrites) for c in clauses]
+            if occur in ("filter", "must_not"):
+                clauses = _dedupe(clauses, occur, rewrites)
+            body[occur] = clauses
+
+        if not scoring and body.get("must"):
+            rewrites.append("must clauses moved to filter")
+            body["filter"] = [*body.get("filter", []), *body.pop("must")]
+
+        return {"bool": body}
+
+    if kind == "constant_score" and isinstance(body, dict) and "filter" in body:
+        return {
+            "constant_score": {
+                **body,
+                "filter": _optimize(body["filter"], False, rewrites),
+            }
+        }
+
+    if isinstance(body, dict):
+        leaf = _rewrite_leaf(kind, body, rewrites)
+        if leaf is not None:
+            return leaf
+
+    return query
+
+
+def _optimize_aggs(aggs: dict, rewrites: List[str]) -> dict:
+    optimized = {}
+    for name, agg in aggs.items():
+        agg = dict(agg)
+        # the queries of filter(s) aggregations run in filter context
+        if "filter" in agg:
+            agg["filter"] = _optimize(agg["filter"], False, rewrites)
+        if "filters" in agg and isinstance(agg["filters"].get("filters"), dict):
+            agg["filters"] = {
+                **agg["filters"],
+                "filters": {
+                    key: _optimize(q, False, rewrites)
+                    for key, q in agg["filters"]["filters"].items()
+                },
+            }
+        for sub in ("aggs", "aggregations"):
+            if sub in agg:
+                agg[sub] = _optimize_aggs(agg[sub], rewrites)
+        optimized[name] = agg
+    return optimized
+
+
+def optimize_body(body: dict, scoring: bool = None) -> Tuple[dict, List[str]]:
+    """
+    Rewrites constructs of a search body that elastic evaluates slowly into
+    equivalent cheaper ones:
+
+    - wildcard "*" on a keyword field to exists, instead of enumerating its terms
+    - match on a keyword field to term, keyword values are not analyzed
+    - duplicate filter and must_not clauses dropped
+    - must clauses moved to filter where no score is read, so they are
+      cacheable and skip scoring
+    - the same for a scoring leaf query, wrapped in a bool filter
+
+    Returns the rewritten body and a description of every rewrite applied.
+    """
+    rewrites = []
+    body = dict(body)
+
+    if "query" in body:
+        if scoring is None:
+            scoring = scores_used(body)
+        query = _optimize(body["query"], scoring, rewrites)
+        kind = next(iter(query)) if len(query) == 1 else None
+        if not scoring and kind and kind not in _UNSCORED:
+            rewrites.append(f"{kind} query moved to filter")
+            query = {"bool": {"filter": [query]}}
+        body["query"] = query
+
+    for key in ("aggs", "aggregations"):
+        if key in body:
+            body[key] = _optimize_aggs(body[key], rewrites)
+
+    return body, rewrites
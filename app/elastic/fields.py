@@ -3,6 +3,12 @@ from enum import (
     auto,
 )
 
+# keyword subfields of text fields leave out longer values (dynamic mapping)
+IGNORE_ABOVE = 256
+
+# paths of the keyword fields declared so far, besides the .keyword subfields
+keyword_paths = set()
+
 
 class FieldType(str, Enum):
     KEYWORD = auto()
@@ -15,4 +21,6 @@ class Field(str, Enum):
         obj._value_ = path
         obj.path = path
         obj.field_type = field_type
+        if field_type is FieldType.KEYWORD:
+            keyword_paths.add(path)
         return obj
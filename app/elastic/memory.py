@@ -0,0 +1,903 @@
+"""
+In-memory stand-in for the elasticsearch client.
+
+Evaluates the part of the query DSL built by app.elastic.dsl over a corpus
+held in memory, so the API and the stats pipeline run without a cluster.
+Documents are indexed column-wise: every field keeps a posting bitmap
+(a python int, bit i set for document i) per term, which makes bool logic,
+filters and bucket aggregations a matter of `&`, `|` and popcounts.
+
+Mapping semantics follow the dynamic mapping of the workspace index: string
+fields are analyzed text with a `.keyword` subfield (ignore_above 256),
+except for the fields in KEYWORD_FIELDS which are plain keywords. Scores are
+not computed; hits are returned in index order unless sorted.
+
+Runtime fields cannot execute Painless. The scripts of crud.elastic, inline
+or stored, are recognized by their shape instead and anything else is
+rejected. Scrolls hold the whole result and hand it out page by page.
+"""
+import json
+import re
+import time
+from collections import defaultdict
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from elasticsearch.exceptions import (
+    NotFoundError,
+    RequestError,
+)
+
+from app.core.config import ELASTIC_INDEX
+from app.core.logging import logger
+from .fields import IGNORE_ABOVE
+from .utils import filter_response
+
+KEYWORD_FIELDS = {
+    "nodeRef.id",
+    "nodeRef.storeRef.protocol",
+    "type",
+    "path",
+    "fullpath",
+    "parentRef.id",
+}
+MAX_RESULT_WINDOW = 10000
+TRACK_TOTAL_HITS = 10000
+
+_TOKEN = re.compile(r"\w+")
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def _count(bitmap: int) -> int:
+    return bin(bitmap).count("1")
+
+
+def _bitmap(ids: Iterable[int]) -> int:
+    ids = ids if isinstance(ids, list) else list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _ids(bitmap: int) -> Iterator[int]:
+    raw = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for offset, byte in enumerate(raw):
+        if byte:
+            base = offset << 3
+            for bit in _BITS[byte]:
+                yield base + bit
+
+
+@lru_cache(maxsize=1 << 16)
+def _analyze(value) -> Tuple[str, ...]:
+    # ids and paths repeat across many documents
+    return tuple(_TOKEN.findall(str(value).lower()))
+
+
+def _keyword(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _flatten(source: dict, prefix: str = "", fields: dict = None) -> Dict[str, list]:
+    fields = {} if fields is None else fields
+    for key, value in source.items():
+        path = f"{prefix}{key}"
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, dict):
+                _flatten(item, prefix=f"{path}.", fields=fields)
+            elif item is not None:
+                fields.setdefault(path, []).append(item)
+    return fields
+
+
+def _wildcard(pattern: str):
+    regex = "".join(
+        ".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern
+    )
+    return re.compile(regex, re.DOTALL)
+
+
+def _single(body: dict) -> Tuple[str, object]:
+    items = [(k, v) for k, v in body.items() if k not in ("boost", "_name")]
+    if len(items) != 1:
+        raise RequestError(400, "parsing_exception", {"query": body})
+    return items[0]
+
+
+def _filter_source(source, includes: List[str]):
+    if not includes:
+        return source
+
+    filtered = {}
+    for key, value in source.items():
+        nested = [
+            include[len(key) + 1 :]
+            for include in includes
+            if include.startswith(f"{key}.")
+        ]
+        if key in includes or "*" in includes:
+            filtered[key] = value
+        elif nested and isinstance(value, dict):
+            filtered[key] = _filter_source(value, nested)
+        elif nested and isinstance(value, list):
+            filtered[key] = [
+                _filter_source(item, nested) if isinstance(item, dict) else item
+                for item in value
+            ]
+    return filtered
+
+
+class MemoryIndex:
+    def __init__(self, keyword_fields: Iterable[str] = KEYWORD_FIELDS):
+        self.keyword_fields = set(keyword_fields)
+        self.size = 0
+        self.doc_ids: List[str] = []
+        self.sources: List[dict] = []
+        # field -> term -> bitmap, text fields hold their tokens here
+        self.terms: Dict[str, Dict[str, int]] = {}
+        self.exists: Dict[str, int] = {}
+        # field -> doc -> values, sparse
+        self.columns: Dict[str, Dict[int, list]] = {}
+        self.text_fields = set()
+
+    @property
+    def all(self) -> int:
+        return (1 << self.size) - 1
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Tuple[str, dict]], **kwargs) -> "MemoryIndex":
+        index = cls(**kwargs)
+        postings = defaultdict(lambda: defaultdict(list))
+        exists = defaultdict(list)
+        columns = defaultdict(dict)
+
+        for doc, (doc_id, source) in enumerate(docs):
+            index.doc_ids.append(doc_id)
+            index.sources.append(source)
+
+            for field, values in _flatten(source).items():
+                text = field not in index.keyword_fields and isinstance(values[0], str)
+                columns[field][doc] = values
+                exists[field].append(doc)
+
+                if text:
+                    index.text_fields.add(field)
+                    for value in values:
+                        for token in _analyze(value):
+                            postings[field][token].append(doc)
+
+                    field = f"{field}.keyword"
+                    values = [v for v in values if len(v) <= IGNORE_ABOVE]
+                    if not values:
+                        continue
+                    columns[field][doc] = values
+                    exists[field].append(doc)
+
+                for value in values:
+                    postings[field][_keyword(value)].append(doc)
+
+            index.size = doc + 1
+
+        index.terms = {
+            field: {term: _bitmap(ids) for term, ids in terms.items()}
+            for field, terms in postings.items()
+        }
+        index.exists = {field: _bitmap(ids) for field, ids in exists.items()}
+        index.columns = dict(columns)
+
+        return index
+
+    @classmethod
+    def from_bulk(cls, path: Path, **kwargs) -> "MemoryIndex":
+        """Loads an NDJSON file in bulk API format (index actions only)."""
+
+        def docs():
+            with open(path) as f:
+                for line in f:
+                    action = json.loads(line)["index"]
+                    yield action["_id"], json.loads(next(f))
+
+        return cls.from_docs(docs(), **kwargs)
+
+
+class _Request:
+    def __init__(
+        self, index: MemoryIndex, runtime_mappings: dict = None, scripts: dict = None
+    ):
+        self.index = index
+        self.runtime_mappings = runtime_mappings or {}
+        self.scripts = scripts or {}
+        self._runtime_columns = {}
+        # filter aggregations evaluate the same query for every bucket
+        self._queries = {}
+
+    # fields
+
+    def column(self, field: str) -> Dict[int, list]:
+        if field in self.runtime_mappings:
+            if field not in self._runtime_columns:
+                self._runtime_columns[field] = self._runtime_column(
+                    field, self.runtime_mappings[field]
+                )
+            return self._runtime_columns[field]
+        return self.index.columns.get(field, {})
+
+    def _doc_values(self, field: str) -> Dict[int, list]:
+        # doc values of keywords are deduplicated and sorted
+        return {
+            doc: sorted({_keyword(v) for v in values})
+            for doc, values in self.column(field).items()
+        }
+
+    def _runtime_column(self, name: str, definition: dict) -> Dict[int, list]:
+        script = definition.get("script", {})
+        if isinstance(script, str):
+            script = {"source": script}
+        if "id" in script:
+            if script["id"] not in self.scripts:
+                raise NotFoundError(
+                    404, "resource_not_found_exception", {"script": script["id"]}
+                )
+            script = {**self.scripts[script["id"]], **script}
+        source = script.get("source", "")
+        params = script.get("params", {})
+        values = self._doc_values(params.get("field", ""))
+
+        if "params.map" in source:
+            mapping = params["map"]
+            default = re.search(r'else\s*{\s*emit\("([^"]*)"\)', source)
+            column = {doc: [mapping.get(v[0], v[0])] for doc, v in values.items() if v}
+            if default:
+                for doc in range(self.index.size):
+                    column.setdefault(doc, [default.group(1)])
+            return column
+        if ".value.length()" in source:
+            return {doc: [len(v[0])] for doc, v in values.items() if v}
+        if re.search(r"doc\[params\.field\]\.length\b", source):
+            return {doc: [len(v)] for doc, v in values.items() if v}
+
+        raise RequestError(
+            400, "script_exception", {"runtime_field": name, "source": source}
+        )
+
+    def _scan(self, field: str, predicate) -> int:
+        return _bitmap(
+            doc
+            for doc, values in self.column(field).items()
+            if any(predicate(v) for v in values)
+        )
+
+    def _term(self, field: str, value) -> int:
+        if field in self.runtime_mappings:
+            return self._scan(field, lambda v: _keyword(v) == _keyword(value))
+        return self.index.terms.get(field, {}).get(_keyword(value), 0)
+
+    def _exists(self, field: str) -> int:
+        if field in self.runtime_mappings:
+            return _bitmap(self.column(field))
+        if field in self.index.exists:
+            return self.index.exists[field]
+
+        bitmap = 0
+        for name, exists in self.index.exists.items():
+            if name.startswith(f"{field}."):
+                bitmap |= exists
+        return bitmap
+
+    def _text(self, field: str, text: str, operator: str, prefix=False) -> int:
+        if field not in self.index.text_fields:
+            if prefix:
+                return self._matching_terms(field, lambda t: t.startswith(text))
+            return self._term(field, text)
+
+        tokens = _analyze(text)
+        if not tokens:
+            return 0
+
+        postings = self.index.terms.get(field, {})
+        bitmaps = [postings.get(token, 0) for token in tokens]
+        if prefix:
+            bitmaps[-1] = self._matching_terms(
+                field, lambda t: t.startswith(tokens[-1])
+            )
+
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap if operator == "and" else result | bitmap
+        return result
+
+    def _matching_terms(self, field: str, predicate) -> int:
+        bitmap = 0
+        for term, postings in self.index.terms.get(field, {}).items():
+            if predicate(term):
+                bitmap |= postings
+        return bitmap
+
+    # queries
+
+    def query(self, query: Optional[dict]) -> int:
+        if not query:
+            return self.index.all
+
+        key = json.dumps(query, sort_keys=True, default=str)
+        if key not in self._queries:
+            kind, body = _single(query)
+            handler = getattr(self, f"_q_{kind}", None)
+            if handler is None:
+                raise RequestError(
+                    400, "parsing_exception", {"unsupported_query": kind}
+                )
+            self._queries[key] = handler(body)
+        return self._queries[key]
+
+    def _q_match_all(self, body: dict) -> int:
+        return self.index.all
+
+    def _q_match_none(self, body: dict) -> int:
+        return 0
+
+    def _q_bool(self, body: dict) -> int:
+        def clauses(key: str) -> List[dict]:
+            value = body.get(key, [])
+            return value if isinstance(value, list) else [value]
+
+        must = clauses("must") + clauses("filter")
+        should = clauses("should")
+
+        result = self.index.all
+        for clause in must:
+            result &= self.query(clause)
+
+        if should:
+            minimum = int(body.get("minimum_should_match", 0 if must else 1))
+            if minimum == 1:
+                matched = 0
+                for clause in should:
+                    matched |= self.query(clause)
+                result &= matched
+            elif minimum > 1:
+                counts = defaultdict(int)
+                for clause in should:
+                    for doc in _ids(result & self.query(clause)):
+                        counts[doc] += 1
+                result = _bitmap(doc for doc, n in counts.items() if n >= minimum)
+
+        for clause in clauses("must_not"):
+            result &= ~self.query(clause)
+
+        return result
+
+    def _q_term(self, body: dict) -> int:
+        field, value = _single(body)
+        if isinstance(value, dict):
+            value = value["value"]
+        return self._term(field, value)
+
+    def _q_terms(self, body: dict) -> int:
+        field, values = _single(body)
+        bitmap = 0
+        for value in values:
+            bitmap |= self._term(field, value)
+        return bitmap
+
+    def _q_match(self, body: dict) -> int:
+        field, value = _single(body)
+        operator = "or"
+        if isinstance(value, dict):
+            operator = value.get("operator", operator).lower()
+            value = value["query"]
+        return self._text(field, _keyword(value), operator)
+
+    def _q_wildcard(self, body: dict) -> int:
+        field, value = _single(body)
+        if isinstance(value, dict):
+            value = value.get("value", value.get("wildcard"))
+        pattern = _wildcard(value)
+        if field in self.runtime_mappings:
+            return self._scan(field, lambda v: pattern.fullmatch(_keyword(v)))
+        return self._matching_terms(field, pattern.fullmatch)
+
+    def _q_exists(self, body: dict) -> int:
+        return self._exists(body["field"])
+
+    def _q_range(self, body: dict) -> int:
+        field, bounds = _single(body)
+        checks = {
+            "gt": lambda v, b: v > b,
+            "gte": lambda v, b: v >= b,
+            "lt": lambda v, b: v < b,
+            "lte": lambda v, b: v <= b,
+        }
+        bounds = [(checks[op], bound) for op, bound in bounds.items() if op in checks]
+
+        def predicate(value) -> bool:
+            try:
+                return all(check(value, bound) for check, bound in bounds)
+            except TypeError:
+                return False
+
+        return self._scan(field, predicate)
+
+    def _q_simple_query_string(self, body: dict) -> int:
+        fields = [field.split("^")[0] for field in body.get("fields", [])]
+        if not fields or "*" in fields:
+            fields = sorted(self.index.text_fields)
+        operator = body.get("default_operator", "or").lower()
+
+        positive, negative = [], []
+        for sign, term in re.findall(r'([+-]?)("[^"]*"|[^\s"]+)', body["query"]):
+            if term == "|":
+                operator = "or"
+                continue
+            phrase = term.startswith('"')
+            text = term.strip('"')
+            prefix = not phrase and text.endswith("*")
+            text = text.rstrip("*")
+
+            matched = 0
+            for field in fields:
+                matched |= self._text(field, text, "and", prefix=prefix)
+            (negative if sign == "-" else positive).append(matched)
+
+        result = self.index.all if operator == "and" or not positive else 0
+        for matched in positive:
+            result = result & matched if operator == "and" else result | matched
+        for matched in negative:
+            result &= ~matched
+        return result
+
+    # aggregations
+
+    def aggs(self, aggs: dict, bitmap: int) -> dict:
+        results = {}
+        for name, agg in aggs.items():
+            kind, body = _single(
+                {k: v for k, v in agg.items() if k not in ("aggs", "aggregations")}
+            )
+            if kind == "bucket_sort":
+                continue
+            handler = getattr(self, f"_a_{kind}", None)
+            if handler is None:
+                raise RequestError(
+                    400, "parsing_exception", {"unsupported_aggregation": kind}
+                )
+            sub = agg.get("aggs", agg.get("aggregations", {}))
+            results[name] = handler(body, sub, bitmap)
+        return results
+
+    def _bucket(self, key, bitmap: int, sub: dict) -> dict:
+        return {"key": key, "doc_count": _count(bitmap), **self.aggs(sub, bitmap)}
+
+    def _bucket_sort(self, sub: dict, buckets: List[dict]) -> List[dict]:
+        for agg in sub.values():
+            if "bucket_sort" not in agg:
+                continue
+            body = agg["bucket_sort"]
+            for spec in reversed(body.get("sort", [])):
+                if isinstance(spec, str):
+                    spec = {spec: {"order": "asc"}}
+                ((path, order),) = spec.items()
+                if isinstance(order, dict):
+                    order = order.get("order", "asc")
+                buckets.sort(
+                    key=lambda bucket: self._bucket_value(bucket, path),
+                    reverse=order == "desc",
+                )
+            start = body.get("from", 0)
+            size = body.get("size")
+            buckets = buckets[start : start + size if size is not None else None]
+        return buckets
+
+    @staticmethod
+    def _bucket_value(bucket: dict, path: str):
+        if path == "_count":
+            return bucket["doc_count"]
+        if path == "_key":
+            return bucket["key"]
+        name, metric = re.match(r"([^>.]+)[>.]?(.*)", path).groups()
+        value = bucket.get(name, {})
+        return value.get(metric or "doc_count", value.get("value"))
+
+    def _group(self, field: str, bitmap: int) -> Dict[str, int]:
+        if field in self.runtime_mappings:
+            groups = defaultdict(list)
+            column = self.column(field)
+            for doc in _ids(bitmap):
+                for value in set(column.get(doc, [])):
+                    groups[value].append(doc)
+            return {key: _bitmap(docs) for key, docs in groups.items()}
+
+        groups = {}
+        for term, postings in self.index.terms.get(field, {}).items():
+            matched = postings & bitmap
+            if matched:
+                groups[term] = matched
+        return groups
+
+    def _a_filter(self, body: dict, sub: dict, bitmap: int) -> dict:
+        matched = bitmap & self.query(body)
+        return {"doc_count": _count(matched), **self.aggs(sub, matched)}
+
+    def _a_filters(self, body: dict, sub: dict, bitmap: int) -> dict:
+        filters = body["filters"]
+        if isinstance(filters, list):
+            return {
+                "buckets": [
+                    self._filter_bucket(query, sub, bitmap) for query in filters
+                ]
+            }
+        return {
+            "buckets": {
+                name: self._filter_bucket(query, sub, bitmap)
+                for name, query in filters.items()
+            }
+        }
+
+    def _filter_bucket(self, query: dict, sub: dict, bitmap: int) -> dict:
+        matched = bitmap & self.query(query)
+        return {"doc_count": _count(matched), **self.aggs(sub, matched)}
+
+    def _a_missing(self, body: dict, sub: dict, bitmap: int) -> dict:
+        matched = bitmap & ~self._exists(body["field"])
+        return {"doc_count": _count(matched), **self.aggs(sub, matched)}
+
+    def _a_terms(self, body: dict, sub: dict, bitmap: int) -> dict:
+        field = body["field"]
+        size = body.get("size", 10)
+        min_doc_count = body.get("min_doc_count", 1)
+
+        groups = self._group(field, bitmap)
+        if "missing" in body:
+            missing = bitmap & ~self._exists(field)
+            if missing:
+                key = _keyword(body["missing"])
+                groups[key] = groups.get(key, 0) | missing
+
+        counts = [(key, _count(matched)) for key, matched in groups.items()]
+        counts = [(key, count) for key, count in counts if count >= min_doc_count]
+
+        order = body.get("order", [{"_count": "desc"}, {"_key": "asc"}])
+        if isinstance(order, dict):
+            order = [order, {"_key": "asc"}]
+        for spec in reversed(order):
+            ((path, direction),) = spec.items()
+            counts.sort(
+                key=lambda item: item[1] if path == "_count" else item[0],
+                reverse=direction == "desc",
+            )
+
+        buckets = [self._bucket(key, groups[key], sub) for key, _ in counts[:size]]
+        return {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": sum(count for _, count in counts[size:]),
+            "buckets": self._bucket_sort(sub, buckets),
+        }
+
+    def _a_composite(self, body: dict, sub: dict, bitmap: int) -> dict:
+        sources = []
+        for source in body["sources"]:
+            ((name, definition),) = source.items()
+            ((kind, params),) = definition.items()
+            if kind != "terms":
+                raise RequestError(
+                    400, "parsing_exception", {"unsupported_composite_source": kind}
+                )
+            column = (
+                self.column(params["field"])
+                if params["field"] in self.runtime_mappings
+                else self._doc_values(params["field"])
+            )
+            sources.append((name, column, params.get("missing_bucket", False)))
+
+        groups = defaultdict(list)
+        for doc in _ids(bitmap):
+            values = []
+            for _, column, missing_bucket in sources:
+                doc_values = column.get(doc)
+                if not doc_values:
+                    if not missing_bucket:
+                        break
+                    doc_values = [None]
+                values.append(doc_values)
+            else:
+                for key in product(*values):
+                    groups[key].append(doc)
+
+        def sort_key(key):
+            return tuple((value is not None, value) for value in key)
+
+        keys = sorted(groups, key=sort_key)
+        if "after" in body:
+            after = sort_key(tuple(body["after"][name] for name, _, _ in sources))
+            keys = [key for key in keys if sort_key(key) > after]
+        keys = keys[: body.get("size", 10)]
+
+        has_sub_aggs = any("bucket_sort" not in agg for agg in sub.values())
+        buckets = []
+        for key in keys:
+            bucket = {
+                "key": {name: value for (name, _, _), value in zip(sources, key)},
+                "doc_count": len(groups[key]),
+            }
+            if has_sub_aggs:
+                bucket.update(self.aggs(sub, _bitmap(groups[key])))
+            buckets.append(bucket)
+
+        result = {"buckets": self._bucket_sort(sub, buckets)}
+        if keys:
+            result["after_key"] = {
+                name: value for (name, _, _), value in zip(sources, keys[-1])
+            }
+        return result
+
+    # hits
+
+    def hits(
+        self,
+        body: dict,
+        bitmap: int,
+        index_name: str,
+        window: Optional[int] = MAX_RESULT_WINDOW,
+    ) -> dict:
+        total = _count(bitmap)
+        track_total_hits = body.get("track_total_hits", TRACK_TOTAL_HITS)
+        if track_total_hits is True:
+            total_hits = {"value": total, "relation": "eq"}
+        else:
+            limit = int(track_total_hits) if track_total_hits else 0
+            total_hits = {
+                "value": min(total, limit),
+                "relation": "eq" if total <= limit else "gte",
+            }
+
+        start = body.get("from", 0)
+        size = body.get("size", 10)
+        if window is not None and start + size > window:
+            raise RequestError(
+                400,
+                "search_phase_execution_exception",
+                {
+                    "reason": f"Result window too large, from + size > {MAX_RESULT_WINDOW}"
+                },
+            )
+
+        hits = []
+        if size:
+            docs = list(_ids(bitmap))
+            sort = self._sort_specs(body.get("sort", []))
+            for field, order in reversed(sort):
+                docs.sort(
+                    key=lambda doc: self._sort_value(field, order, doc),
+                    reverse=order == "desc",
+                )
+
+            includes = body.get("_source")
+            if isinstance(includes, dict):
+                includes = includes.get("includes", [])
+            elif isinstance(includes, str):
+                includes = [includes]
+
+            for doc in docs[start : start + size]:
+                hit = {
+                    "_index": index_name,
+                    "_type": "_doc",
+                    "_id": self.index.doc_ids[doc],
+                    "_score": None,
+                }
+                if includes is not False:
+                    hit["_source"] = _filter_source(
+                        self.index.sources[doc], includes or []
+                    )
+                if sort:
+                    hit["sort"] = [
+                        self._sort_value(field, order, doc)[1] for field, order in sort
+                    ]
+                hits.append(hit)
+
+        return {"total": total_hits, "max_score": None, "hits": hits}
+
+    @staticmethod
+    def _sort_specs(sort) -> List[Tuple[str, str]]:
+        specs = []
+        for spec in sort if isinstance(sort, list) else [sort]:
+            if isinstance(spec, str):
+                field, order = spec, "asc"
+                if field.startswith("-"):
+                    field, order = field[1:], "desc"
+            else:
+                ((field, order),) = spec.items()
+                if isinstance(order, dict):
+                    order = order.get("order", "asc")
+            if field not in ("_score", "_doc"):
+                specs.append((field, order))
+        return specs
+
+    def _sort_value(self, field: str, order: str, doc: int):
+        values = self.column(field).get(doc)
+        if not values:
+            # missing values sort last in either direction
+            return (order == "asc", None)
+        return (order != "asc", min(values) if order == "asc" else max(values))
+
+
+class MemoryElasticsearch:
+    """
+    Serves searches from a MemoryIndex in place of the elasticsearch client.
+    """
+
+    def __init__(self, index: MemoryIndex, index_name: str = ELASTIC_INDEX):
+        self.index = index
+        self.index_name = index_name
+        # stored script id -> script
+        self.scripts = {}
+        # scroll id -> hits, page size and offset of the next page
+        self.scrolls = {}
+        self._last_scroll_id = 0
+
+    @classmethod
+    def from_bulk(cls, path: Path, **kwargs) -> "MemoryElasticsearch":
+        start = time.perf_counter()
+        index = MemoryIndex.from_bulk(path, **kwargs)
+        logger.info(
+            f"Indexed {index.size} documents from {path} in memory"
+            f" ({time.perf_counter() - start:.1f}s)"
+        )
+        return cls(index)
+
+    def _request(self, body: dict) -> _Request:
+        return _Request(self.index, body.get("runtime_mappings"), scripts=self.scripts)
+
+    def search(self, index=None, body=None, **params) -> dict:
+        start = time.perf_counter()
+        body = body or {}
+        if "size" in params:
+            body = {**body, "size": int(params["size"])}
+
+        request = self._request(body)
+        if body.get("profile"):
+            return self._profile(request, body, start)
+
+        matched = request.query(body.get("query"))
+
+        if params.get("scroll"):
+            # the whole result is kept and handed out page by page
+            hits = request.hits(
+                {**body, "from": 0, "size": _count(matched)},
+                matched,
+                self.index_name,
+                window=None,
+            )
+            self._last_scroll_id += 1
+            scroll_id = str(self._last_scroll_id)
+            self.scrolls[scroll_id] = (hits, body.get("size", 10), 0)
+            return self._scroll_page(scroll_id)
+
+        response = {
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": request.hits(body, matched, self.index_name),
+        }
+
+        aggs = body.get("aggs", body.get("aggregations"))
+        if aggs:
+            response["aggregations"] = request.aggs(aggs, matched)
+
+        response = {"took": int((time.perf_counter() - start) * 1000), **response}
+        if params.get("filter_path"):
+            response = filter_response(response, params["filter_path"])
+        return response
+
+    def _profile(self, request: _Request, body: dict, start: float) -> dict:
+        """
+        Runs the search phase by phase, timing the query, the collection of
+        the hits and every top level agg in the shape of the profile api.
+        """
+
+        def timed(phase, *args):
+            phase_start = time.perf_counter_ns()
+            result = phase(*args)
+            return result, time.perf_counter_ns() - phase_start
+
+        matched, query_time = timed(request.query, body.get("query"))
+        hits, hits_time = timed(request.hits, body, matched, self.index_name)
+
+        aggs = body.get("aggs", body.get("aggregations")) or {}
+        aggregations, aggregation_timings = {}, []
+        for name, agg in aggs.items():
+            result, agg_time = timed(request.aggs, {name: agg}, matched)
+            aggregations.update(result)
+            kind = next(k for k in agg if k not in ("aggs", "aggregations"))
+            aggregation_timings.append(
+                {"type": kind, "description": name, "time_in_nanos": agg_time}
+            )
+
+        search = {
+            "query": [
+                {
+                    "type": "MemoryQuery",
+                    "description": json.dumps(body.get("query"), default=str),
+                    "time_in_nanos": query_time,
+                }
+            ],
+            "rewrite_time": 0,
+            "collector": [
+                {
+                    "name": "MemoryHits",
+                    "reason": "search_top_hits",
+                    "time_in_nanos": hits_time,
+                }
+            ],
+        }
+        shard = {
+            "id": f"[memory][{self.index_name}][0]",
+            "searches": [search],
+            "aggregations": aggregation_timings,
+        }
+
+        response = {
+            "took": int((time.perf_counter() - start) * 1000),
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": hits,
+            "profile": {"shards": [shard]},
+        }
+        if aggregations:
+            response["aggregations"] = aggregations
+        return response
+
+    def _scroll_page(self, scroll_id: str) -> dict:
+        if scroll_id not in self.scrolls:
+            raise NotFoundError(
+                404, "search_context_missing_exception", {"scroll_id": scroll_id}
+            )
+
+        hits, size, offset = self.scrolls[scroll_id]
+        self.scrolls[scroll_id] = (hits, size, offset + size)
+        return {
+            "_scroll_id": scroll_id,
+            "took": 0,
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {**hits, "hits": hits["hits"][offset : offset + size]},
+        }
+
+    def scroll(self, body=None, scroll_id=None, **params) -> dict:
+        return self._scroll_page((body or {}).get("scroll_id", scroll_id))
+
+    def clear_scroll(self, body=None, scroll_id=None, **params) -> dict:
+        scroll_ids = (body or {}).get("scroll_id", scroll_id)
+        if isinstance(scroll_ids, str):
+            scroll_ids = [scroll_ids]
+        for scroll_id in scroll_ids or list(self.scrolls):
+            self.scrolls.pop(scroll_id, None)
+        return {"succeeded": True}
+
+    def put_script(self, id, body, **params) -> dict:
+        self.scripts[id] = body["script"]
+        return {"acknowledged": True}
+
+    def get_script(self, id, **params) -> dict:
+        if id not in self.scripts:
+            raise NotFoundError(404, "resource_not_found_exception", {"id": id})
+        return {"_id": id, "found": True, "script": self.scripts[id]}
+
+    def count(self, index=None, body=None, **params) -> dict:
+        request = self._request(body or {})
+        return {"count": _count(request.query((body or {}).get("query")))}
+
+    def ping(self, **kwargs) -> bool:
+        return True
@@ -0,0 +1,87 @@
+from typing import List
+
+from elasticsearch.exceptions import ElasticsearchException
+from elasticsearch_dsl.connections import get_connection
+
+from app.core.logging import logger
+
+MAX_DESCRIPTION_LENGTH = 200
+
+
+def _ms(nanos: int) -> float:
+    return round(nanos / 1e6, 3)
+
+
+def _timing(node: dict, name_key: str = "type") -> dict:
+    description = node.get("description", node.get("reason", ""))
+    if len(description) > MAX_DESCRIPTION_LENGTH:
+        description = description[:MAX_DESCRIPTION_LENGTH] + "..."
+
+    timing = {
+        "type": node.get(name_key),
+        "description": description,
+        "time_ms": _ms(node.get("time_in_nanos", 0)),
+    }
+    children = [_timing(child, name_key) for child in node.get("children", [])]
+    if children:
+        timing["children"] = children
+    return timing
+
+
+def condense_profile(profile: dict) -> List[dict]:
+    """
+    Boils the profile section of a search response down to the timings per
+    shard, leaving out the low level breakdowns of every query and agg.
+    """
+    shards = []
+    for shard in profile.get("shards", []):
+        searches = shard.get("searches", [])
+        queries = [_timing(q) for s in searches for q in s.get("query", [])]
+        collectors = [
+            _timing(c, name_key="name")
+            for s in searches
+            for c in s.get("collector", [])
+        ]
+        aggregations = [_timing(a) for a in shard.get("aggregations", [])]
+        shards.append(
+            {
+                "shard": shard.get("id"),
+                "query_ms": round(sum(q["time_ms"] for q in queries), 3),
+                "rewrite_ms": _ms(sum(s.get("rewrite_time", 0) for s in searches)),
+                "collector_ms": round(sum(c["time_ms"] for c in collectors), 3),
+                "aggregations_ms": round(sum(a["time_ms"] for a in aggregations), 3),
+                "queries": queries,
+                "collectors": collectors,
+                "aggregations": aggregations,
+            }
+        )
+    return shards
+
+
+def profile_queries(queries: List[dict], using: str = "default") -> List[dict]:
+    """
+    Runs the searches tracked for a request once more with profiling on.
+    Profiled searches skip the shard request cache, so the timings are
+    those of an actual execution.
+    """
+    es = get_connection(using)
+
+    profiles = []
+    for query in queries:
+        try:
+            response = es.search(
+                index=query["index"], body={**query["query"], "profile": True}
+            )
+        except ElasticsearchException as e:
+            logger.warning(f"Failed to profile query: {e}")
+            profiles.append({"error": str(e)})
+            continue
+
+        profiles.append(
+            {
+                "took": response.get("took"),
+                "cached": query["cached"],
+                "shards": condense_profile(response.get("profile", {})),
+            }
+        )
+    return profiles
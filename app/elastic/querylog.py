@@ -0,0 +1,161 @@
+import json
+import statistics
+import threading
+from collections import deque
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from starlette_context import context
+
+from app.core.config import (
+    ELASTIC_QUERY_STATS_WINDOW,
+    ELASTIC_SLOW_QUERY_MS,
+)
+from app.core.logging import logger
+from .utils import fingerprint
+
+# their values name fields or scripts instead of carrying data
+_STRUCTURAL_KEYS = {
+    "_source",
+    "default_operator",
+    "field",
+    "fields",
+    "id",
+    "lang",
+    "operator",
+    "order",
+    "path",
+    "sort",
+    "source",
+    "type",
+}
+
+
+# their keys name the fields, everything below is data
+_LEAF_QUERIES = {
+    "fuzzy",
+    "match",
+    "match_phrase",
+    "prefix",
+    "range",
+    "regexp",
+    "term",
+    "terms",
+    "wildcard",
+}
+
+
+def _values(value):
+    if isinstance(value, dict):
+        return {key: _values(v) for key, v in value.items()}
+    return "?"
+
+
+def query_shape(body):
+    """
+    The body with every value replaced by "?", so searches that only differ
+    in the terms, texts, ids or sizes they send share one shape.
+    """
+    if isinstance(body, dict):
+        shape = {}
+        for key, value in body.items():
+            if key in _STRUCTURAL_KEYS:
+                shape[key] = value
+            elif key in _LEAF_QUERIES and isinstance(value, dict):
+                shape[key] = {field: _values(v) for field, v in value.items()}
+            else:
+                shape[key] = query_shape(value)
+        return shape
+    if isinstance(body, list):
+        if all(isinstance(item, (dict, list)) for item in body):
+            return [query_shape(item) for item in body]
+        return "?"
+    if isinstance(body, bool) or body is None:
+        return body
+    return "?"
+
+
+class QueryMetrics:
+    """Durations of one query shape, over the last `window` searches."""
+
+    def __init__(self, shape: dict, window: int = ELASTIC_QUERY_STATS_WINDOW):
+        self.shape = shape
+        self.count = 0
+        self.slow = 0
+        self.total = 0.0
+        self.durations = deque(maxlen=window)
+        self.routes = set()
+
+    def record(self, duration: float, route: Optional[str]):
+        self.count += 1
+        self.total += duration
+        self.durations.append(duration)
+        self.routes.add(route or "-")
+
+    def to_dict(self) -> dict:
+        durations = sorted(self.durations) or [0.0]
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        return {
+            "count": self.count,
+            "slow": self.slow,
+            "total_ms": self.total * 1000,
+            "median_ms": statistics.median(durations) * 1000,
+            "p95_ms": p95 * 1000,
+            "max_ms": durations[-1] * 1000,
+            "routes": sorted(self.routes),
+            "shape": self.shape,
+        }
+
+
+class QueryLog:
+    """
+    Per worker statistics of the searches sent to elastic, keyed by the
+    fingerprint of their shape. Searches slower than ELASTIC_SLOW_QUERY_MS
+    are logged along with their shape, never with the values sent.
+    """
+
+    def __init__(self, slow_ms: float = ELASTIC_SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self.metrics: Dict[str, QueryMetrics] = {}
+        # searches are recorded from the threadpool
+        self._lock = threading.Lock()
+
+    def record(self, index, body: dict, response: dict, duration: float):
+        shape = query_shape(body)
+        key = fingerprint(index, shape)[:12]
+        route = context.get("route") if context.exists() else None
+
+        with self._lock:
+            metrics = self.metrics.get(key)
+            if metrics is None:
+                metrics = self.metrics[key] = QueryMetrics(shape)
+            metrics.record(duration, route)
+
+            slow = self.slow_ms > 0 and duration * 1000 >= self.slow_ms
+            if slow:
+                metrics.slow += 1
+
+        if slow:
+            logger.warning(
+                f"Slow elastic query {key}: {duration * 1000:.0f}ms"
+                f" (took {response.get('took')}ms), size {body.get('size', 10)},"
+                f" route {route or '-'}, shape {json.dumps(shape, default=str)}"
+            )
+
+    def to_list(self) -> List[dict]:
+        with self._lock:
+            stats = [
+                {"fingerprint": key, **metrics.to_dict()}
+                for key, metrics in self.metrics.items()
+            ]
+        return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self.metrics.clear()
+
+
+query_log = QueryLog()
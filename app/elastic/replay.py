@@ -0,0 +1,75 @@
+import json
+import random
+import time
+from pathlib import Path
+
+from elasticsearch.exceptions import NotFoundError
+
+from app.core.logging import logger
+from .utils import fingerprint
+
+
+def record_response(
+    directory: Path, index, body: dict, params: dict, response: dict
+) -> Path:
+    """
+    Persists a response under the fingerprint of the request that produced it,
+    keeping the request alongside for inspection.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{fingerprint(index, body, params)}.json"
+    path.write_text(
+        json.dumps(
+            {
+                "request": {"index": index, "body": body, "params": params},
+                "response": response,
+            },
+            default=str,
+        )
+    )
+    return path
+
+
+class ReplayElasticsearch:
+    """
+    Serves recorded responses in place of the elasticsearch client.
+
+    Like the real synchronous client, the artificial latency blocks the
+    calling thread, so concurrency behaviour of the app is preserved.
+    """
+
+    def __init__(self, directory: Path, latency_ms: float = 0, jitter_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.recordings = {}
+
+        for path in directory.glob("*.json"):
+            recording = json.loads(path.read_text())
+            self.recordings[path.stem] = json.dumps(recording["response"])
+
+        logger.info(f"Loaded {len(self.recordings)} recorded elastic responses")
+
+    def _sleep(self):
+        latency_ms = self.latency_ms
+        if self.jitter_ms:
+            latency_ms += random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000)
+
+    def search(self, index=None, body=None, **params) -> dict:
+        key = fingerprint(index, body, params)
+        try:
+            raw = self.recordings[key]
+        except KeyError:
+            raise NotFoundError(
+                404, "recording_not_found", {"fingerprint": key, "body": body}
+            )
+
+        self._sleep()
+        return json.loads(raw)
+
+    def put_script(self, id, body, **params) -> dict:
+        return {"acknowledged": True}
+
+    def ping(self, **kwargs) -> bool:
+        return True
@@ -1,15 +1,35 @@
+import time
 from pprint import pformat
+from typing import (
+    Iterator,
+    Union,
+)
 
+from elasticsearch.helpers import scan
 from elasticsearch_dsl import Search as ElasticSearch
+from elasticsearch_dsl.connections import get_connection
+from elasticsearch_dsl.response import Response
+from starlette.concurrency import run_in_threadpool
 from starlette_context import context
 
+from app.cache import get_cache
 from app.core.config import (
     DEBUG,
     ELASTIC_INDEX,
+    ELASTIC_MODE,
+    ELASTIC_OPTIMIZE_QUERIES,
+    ELASTIC_RECORDINGS_DIR,
+    ELASTICSEARCH_REQUEST_CACHE,
 )
 from app.core.logging import logger
+from .dsl import optimize_body
 from .fields import Field
-from .utils import handle_text_field
+from .querylog import query_log
+from .replay import record_response
+from .utils import (
+    fingerprint,
+    handle_text_field,
+)
 
 
 class Search(ElasticSearch):
@@ -27,19 +47,143 @@ class Search(ElasticSearch):
     def sort(self, *keys):
         return super(Search, self).sort(*[handle_text_field(key) for key in keys])
 
+    def request_body(self) -> dict:
+        """
+        The body as sent to elastic, rewritten by optimize_body unless
+        ELASTIC_OPTIMIZE_QUERIES is off. Built once per search sent, the
+        fingerprint is taken from the plain to_dict.
+        """
+        body = self.to_dict()
+        if not ELASTIC_OPTIMIZE_QUERIES:
+            return body
+
+        body, rewrites = optimize_body(body)
+        if DEBUG:
+            for rewrite in rewrites:
+                logger.debug(f"Query rewritten: {rewrite}")
+        return body
+
+    def response_paths(self, *paths: str) -> "Search":
+        """
+        Declares the parts of the response read by the caller, e.g.
+        "aggregations" or "hits.total.value", so elastic leaves out the rest.
+        Shard failures and timeouts are always kept for raw_success.
+        """
+        paths = [*paths, "_shards.failed", "timed_out"]
+        return self.params(filter_path=",".join(paths))
+
+    def fingerprint(self) -> str:
+        return fingerprint(self._index, self.to_dict(), self.request_params())
+
+    def request_params(self) -> dict:
+        params = dict(self._params)
+        # size 0 searches are cached by the shards until their next refresh
+        if ELASTICSEARCH_REQUEST_CACHE and self._extra.get("size") == 0:
+            params.setdefault("request_cache", True)
+        return params
+
     def execute(self, ignore_cache=False):
+        if ignore_cache or not hasattr(self, "_response"):
+            self._response = self._response_class(self, self.execute_raw())
+
+        return self._response
+
+    def execute_raw(self) -> dict:
+        """Like execute, but hands back the response as a plain dict."""
+        body = self.request_body()
         if DEBUG:
-            logger.debug(f"Sending query to elastic:\n{pformat(self.to_dict())}")
+            logger.debug(f"Sending query to elastic:\n{pformat(body)}")
 
-        response = super(Search, self).execute(ignore_cache=ignore_cache)
+        es = get_connection(self._using)
+        start = time.perf_counter()
+        response = es.search(index=self._index, body=body, **self.request_params())
+        query_log.record(self._index, body, response, time.perf_counter() - start)
 
         if DEBUG:
-            logger.debug(
-                f"Response received from elastic:\n{pformat(response.to_dict())}"
+            logger.debug(f"Response received from elastic:\n{pformat(response)}")
+
+        if ELASTIC_MODE == "record":
+            record_response(
+                ELASTIC_RECORDINGS_DIR,
+                index=self._index,
+                body=body,
+                params=self.request_params(),
+                response=response,
             )
 
-        context["elastic_queries"] = context.get("elastic_queries", []) + [
-            {"query": self.to_dict(), "response": response.to_dict()}
-        ]
+        self._track(response, body)
 
         return response
+
+    def scan_raw(self) -> Iterator[dict]:
+        """Like scan, but streams the hits as plain dicts."""
+        body = self.request_body()
+        if DEBUG:
+            logger.debug(f"Scanning elastic:\n{pformat(body)}")
+
+        es = get_connection(self._using)
+        yield from scan(es, query=body, index=self._index, **self._params)
+
+    async def execute_raw_cached(self, ttl: int = None) -> dict:
+        cache = await get_cache()
+        key = f"elastic:{self.fingerprint()}"
+
+        raw = await cache.get(key)
+        if raw is None:
+            raw = await run_in_threadpool(self.execute_raw)
+            await cache.set(key, raw, ttl=ttl)
+            return raw
+
+        if DEBUG:
+            logger.debug(f"Serving query from cache: {key}")
+
+        self._track(raw, cached=True)
+
+        return raw
+
+    async def execute_cached(self, ttl: int = None) -> Response:
+        cache = await get_cache()
+        key = f"elastic:{self.fingerprint()}"
+
+        raw = await cache.get(key)
+        if raw is None:
+            # the client is synchronous, keep the event loop free meanwhile
+            response = await run_in_threadpool(self.execute)
+            await cache.set(key, response.to_dict(), ttl=ttl)
+            return response
+
+        if DEBUG:
+            logger.debug(f"Serving query from cache: {key}")
+
+        self._response = self._response_class(self, raw)
+        self._track(self._response, cached=True)
+
+        return self._response
+
+    def _track(
+        self, response: Union[Response, dict], body: dict = None, cached: bool = False
+    ):
+        if not context.exists():
+            return
+
+        if isinstance(response, Response):
+            response = response.to_dict()
+
+        # appended in place, searches may run concurrently in the threadpool
+        queries = context.get("elastic_queries")
+        if queries is None:
+            queries = context["elastic_queries"] = []
+        queries.append(
+            {
+                "index": self._index,
+                "query": self.request_body() if body is None else body,
+                "response": response,
+                "cached": cached,
+            }
+        )
+
+
+def raw_success(response: dict) -> bool:
+    """Response.success for plain dict responses."""
+    shards = response.get("_shards", {})
+    return not response.get("timed_out") and not shards.get("failed")
@@ -1,32 +1,199 @@
-from typing import Union
+import hashlib
+import json
+import socket
+from fnmatch import fnmatchcase
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    Union,
+)
 
+from elasticsearch import Urllib3HttpConnection
 from elasticsearch_dsl import connections
 from elasticsearch_dsl.response import AggResponse
-from glom import merge
+from glom import glom
+from urllib3.connection import HTTPConnection
 
 from app.core.config import (
-    ELASTICSEARCH_URL,
+    ELASTIC_MEMORY_CORPUS,
+    ELASTIC_MODE,
+    ELASTIC_RECORDINGS_DIR,
+    ELASTIC_REPLAY_LATENCY_JITTER_MS,
+    ELASTIC_REPLAY_LATENCY_MS,
+    ELASTICSEARCH_HTTP_COMPRESS,
+    ELASTICSEARCH_MAX_RETRIES,
+    ELASTICSEARCH_MAXSIZE,
+    ELASTICSEARCH_RETRY_ON_TIMEOUT,
+    ELASTICSEARCH_TCP_KEEPALIVE,
     ELASTICSEARCH_TIMEOUT,
+    ELASTICSEARCH_URL,
 )
 from app.core.logging import logger
 from .fields import (
+    IGNORE_ABOVE,
     Field,
     FieldType,
 )
 
 
+def keepalive_socket_options(idle: int) -> List[Tuple[int, int, int]]:
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # not available on every platform
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, idle))
+    return options
+
+
+class KeepAliveConnection(Urllib3HttpConnection):
+    """
+    Keeps idle pooled connections open through firewalls and load balancers
+    dropping silent connections, e.g. the ingress of docker swarm.
+    """
+
+    def __init__(
+        self, *args, tcp_keepalive: int = ELASTICSEARCH_TCP_KEEPALIVE, **kwargs
+    ):
+        super(KeepAliveConnection, self).__init__(*args, **kwargs)
+
+        if tcp_keepalive:
+            self.pool.conn_kw["socket_options"] = [
+                *HTTPConnection.default_socket_options,
+                *keepalive_socket_options(tcp_keepalive),
+            ]
+
+
+def transport_options(**overrides) -> dict:
+    return {
+        "timeout": ELASTICSEARCH_TIMEOUT,
+        "connection_class": KeepAliveConnection,
+        "maxsize": ELASTICSEARCH_MAXSIZE,
+        "http_compress": ELASTICSEARCH_HTTP_COMPRESS,
+        "max_retries": ELASTICSEARCH_MAX_RETRIES,
+        "retry_on_timeout": ELASTICSEARCH_RETRY_ON_TIMEOUT,
+        **overrides,
+    }
+
+
 async def connect_to_elastic():
+    if ELASTIC_MODE == "memory":
+        from .memory import MemoryElasticsearch
+
+        logger.debug(f"Attempt to load corpus: {ELASTIC_MEMORY_CORPUS}")
+
+        connections.add_connection(
+            "default", MemoryElasticsearch.from_bulk(ELASTIC_MEMORY_CORPUS)
+        )
+        return
+
+    if ELASTIC_MODE == "replay":
+        from .replay import ReplayElasticsearch
+
+        logger.debug(f"Attempt to replay recordings: {ELASTIC_RECORDINGS_DIR}")
+
+        connections.add_connection(
+            "default",
+            ReplayElasticsearch(
+                ELASTIC_RECORDINGS_DIR,
+                latency_ms=ELASTIC_REPLAY_LATENCY_MS,
+                jitter_ms=ELASTIC_REPLAY_LATENCY_JITTER_MS,
+            ),
+        )
+        return
+
     logger.debug(f"Attempt to open connection: {ELASTICSEARCH_URL}")
 
-    connections.create_connection(
-        hosts=[ELASTICSEARCH_URL], timeout=ELASTICSEARCH_TIMEOUT
-    )
+    connections.create_connection(hosts=[ELASTICSEARCH_URL], **transport_options())
 
 
 async def close_elastic_connection():
     pass
 
 
+def put_scripts(scripts: Dict[str, str], using: str = "default"):
+    """Stores painless scripts by id, overwriting any earlier version."""
+    es = connections.get_connection(using)
+    for script_id, source in scripts.items():
+        es.put_script(
+            id=script_id, body={"script": {"lang": "painless", "source": source}}
+        )
+        logger.debug(f"Stored script: {script_id}")
+
+
+def fingerprint(index, body: dict, params: dict = None) -> str:
+    payload = json.dumps(
+        {"index": index, "body": body, "params": params or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+_MISSING = object()
+
+
+def _match_key(key: str, pattern: str) -> bool:
+    if pattern == key or pattern == "*":
+        return True
+    return "*" in pattern and fnmatchcase(key, pattern)
+
+
+def _filter_path(value, paths: List[list]):
+    if any(not path for path in paths):
+        return value
+
+    if isinstance(value, list):
+        items = [_filter_path(item, paths) for item in value]
+        return [item for item in items if item is not _MISSING] or _MISSING
+
+    if not isinstance(value, dict):
+        return _MISSING
+
+    # ** matches any number of keys, including none
+    expanded = []
+    for path in paths:
+        expanded.append(path)
+        while path and path[0] == "**":
+            path = path[1:]
+            expanded.append(path)
+    if any(not path for path in expanded):
+        return value
+
+    filtered = {}
+    for key, item in value.items():
+        rest = [
+            path if path[0] == "**" else path[1:]
+            for path in expanded
+            if path[0] == "**" or _match_key(key, path[0])
+        ]
+        if not rest:
+            continue
+        # a fully matched path keeps the value as a whole
+        if not all(rest):
+            filtered[key] = item
+            continue
+        item = _filter_path(item, rest)
+        if item is not _MISSING:
+            filtered[key] = item
+
+    return filtered or _MISSING
+
+
+def filter_response(response: dict, filter_path: Union[str, List[str]]) -> dict:
+    """
+    Applies filter_path like elasticsearch does, for the stand-in clients:
+    comma separated dotted paths where * matches within a key and ** any
+    number of keys. Exclusions are not supported.
+    """
+    if isinstance(filter_path, str):
+        filter_path = filter_path.split(",")
+
+    filtered = _filter_path(response, [path.split(".") for path in filter_path])
+    return {} if filtered is _MISSING else filtered
+
+
 def handle_text_field(qfield: Union[Field, str]) -> str:
     if isinstance(qfield, Field):
         qfield_key = qfield.path
@@ -37,22 +204,39 @@ def handle_text_field(qfield: Union[Field, str]) -> str:
         return qfield
 
 
+def keyword_values(source: dict, qfield: Field) -> List[str]:
+    """
+    The doc values of handle_text_field(qfield), read from a _source: sorted
+    and unique, without the values the keyword subfield of text leaves out.
+    """
+    values = glom(source, qfield.path, default=None)
+    if values is None:
+        return []
+    if not isinstance(values, list):
+        values = [values]
+
+    values = {_keyword(value) for value in values if value is not None}
+    if qfield.field_type is FieldType.TEXT:
+        values = {value for value in values if len(value) <= IGNORE_ABOVE}
+    return sorted(values)
+
+
+def _keyword(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
 def merge_agg_response(
-    agg: AggResponse, key: str = "key", result_field: str = "doc_count"
+    agg: Union[AggResponse, dict], key: str = "key", result_field: str = "doc_count"
 ) -> dict:
-    def op(carry: dict, bucket: dict):
-        carry[bucket[key]] = bucket[result_field]
-
-    return merge(agg.buckets, op=op)
+    return {bucket[key]: bucket[result_field] for bucket in agg["buckets"]}
 
 
 def merge_composite_agg_response(
-    agg: AggResponse, key: str, result_field: str = "doc_count"
+    agg: Union[AggResponse, dict], key: str, result_field: str = "doc_count"
 ) -> dict:
-    def op(carry: dict, bucket: dict):
-        carry[bucket["key"][key]] = bucket[result_field]
-
-    return merge(agg.buckets, op=op)
+    return {bucket["key"][key]: bucket[result_field] for bucket in agg["buckets"]}
 
 
 # def fold_agg_response(
@@ -1,3 +1,5 @@
+from typing import Dict
+
 from fastapi import (
     Depends,
     FastAPI,
@@ -7,11 +9,24 @@ from fastapi.routing import APIRoute
 from pydantic import BaseModel, Field
 from starlette.exceptions import HTTPException
 from starlette.middleware.cors import CORSMiddleware
-from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
+from starlette.responses import JSONResponse
+from starlette.status import (
+    HTTP_422_UNPROCESSABLE_ENTITY,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
 from starlette_context.middleware import RawContextMiddleware
 
 from app.api import router as api_router
 from app.api.auth import authenticated
+from app.api.profile import (
+    ProfileMiddleware,
+    profiling,
+)
+from app.api.util import track_route
+from app.cache import (
+    close_cache_connection,
+    connect_to_cache,
+)
 from app.core.config import (
     ALLOWED_HOSTS,
     API_VERSION,
@@ -23,6 +38,7 @@ from app.core.errors import (
     http_422_error_handler,
     http_error_handler,
 )
+from app.elastic.querylog import query_log
 from app.elastic.utils import (
     close_elastic_connection,
     connect_to_elastic,
@@ -33,14 +49,26 @@ from app.pg.pg_utils import (
     close_postgres_connection,
 )
 from app.pg.postgres import Postgres
+from app.warmup import (
+    ready,
+    start_warm_up,
+    status as warm_up_status,
+    stop_warm_up,
+)
 
 fastapi_app = FastAPI(title=PROJECT_NAME, debug=DEBUG)
 
+# middleware added later wraps the earlier one, profiling needs the context
+fastapi_app.add_middleware(ProfileMiddleware)
 fastapi_app.add_middleware(RawContextMiddleware)
 
 fastapi_app.add_event_handler("startup", connect_to_elastic)
+fastapi_app.add_event_handler("startup", connect_to_cache)
+fastapi_app.add_event_handler("startup", start_warm_up)
+fastapi_app.add_event_handler("shutdown", stop_warm_up)
 fastapi_app.add_event_handler("shutdown", close_elastic_connection)
 fastapi_app.add_event_handler("shutdown", close_postgres_connection)
+fastapi_app.add_event_handler("shutdown", close_cache_connection)
 fastapi_app.add_event_handler("shutdown", close_client)
 
 fastapi_app.add_exception_handler(HTTPException, http_error_handler)
@@ -63,6 +91,31 @@ async def ping_api():
     return {"status": "ok"}
 
 
+class Ready(BaseModel):
+    status: str = Field(
+        default="not ok", description="Should be 'ok' once the warm-up is done.",
+    )
+    checks: Dict[str, bool] = Field(
+        default={}, description="Warm-up steps and whether they are done."
+    )
+
+
+@fastapi_app.get(
+    "/_ready",
+    description="Readiness probe, fails with 503 until the startup warm-up is done.",
+    response_model=Ready,
+    responses={HTTP_503_SERVICE_UNAVAILABLE: {"model": Ready}},
+    tags=["Healthcheck"],
+)
+async def ready_api():
+    if not ready():
+        return JSONResponse(
+            {"status": "not ok", "checks": warm_up_status},
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return {"status": "ok", "checks": warm_up_status}
+
+
 @fastapi_app.get(
     "/pg-version",
     response_model=dict,
@@ -70,12 +123,43 @@ async def ping_api():
     tags=["Authenticated"],
 )
 async def pg_version(postgres: Postgres = Depends(get_postgres),):
-    async with postgres.pool.acquire() as conn:
+    async with postgres.acquire() as conn:
         version = await conn.fetchval("select version()")
         return {"version": version}
 
 
-fastapi_app.include_router(api_router, prefix=f"/api/{API_VERSION}")
+@fastapi_app.get(
+    "/pg-pool",
+    response_model=dict,
+    dependencies=[Security(authenticated)],
+    tags=["Authenticated"],
+)
+async def pg_pool(postgres: Postgres = Depends(get_postgres),):
+    return postgres.stats()
+
+
+@fastapi_app.get(
+    "/elastic-queries",
+    description=(
+        "Searches sent to elastic by this worker, grouped by their shape and "
+        "ordered by the total time spent on them."
+    ),
+    response_model=list,
+    dependencies=[Security(authenticated)],
+    tags=["Authenticated"],
+)
+async def elastic_queries(reset: bool = False):
+    stats = query_log.to_list()
+    if reset:
+        query_log.clear()
+    return stats
+
+
+fastapi_app.include_router(
+    api_router,
+    prefix=f"/api/{API_VERSION}",
+    dependencies=[Depends(track_route), Depends(profiling)],
+)
 
 for route in fastapi_app.routes:
     if isinstance(route, APIRoute):
@@ -108,6 +108,15 @@ class CollectionMaterialsCount(ResponseModel):
     materials_count: int
 
 
+# TODO: move to api package
+class CollectionScore(ResponseModel):
+    noderef_id: UUID
+    title: str
+    score: int
+    materials_count: int
+    materials: Dict[str, float]
+
+
 # TODO: move to api package
 class PortalTreeNode(BaseModel):
     noderef_id: UUID
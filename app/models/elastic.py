@@ -5,6 +5,7 @@ from typing import (
     Optional,
     Type,
     TypeVar,
+    Union,
 )
 from uuid import UUID
 
@@ -96,12 +97,14 @@ class DescendantCollectionsMaterialsCounts(PydanticBaseModel):
 
     @classmethod
     def parse_elastic_response(
-        cls: Type[_DESCENDANT_COLLECTIONS_MATERIALS_COUNTS], response: Response,
+        cls: Type[_DESCENDANT_COLLECTIONS_MATERIALS_COUNTS],
+        response: Union[Response, dict],
     ) -> _DESCENDANT_COLLECTIONS_MATERIALS_COUNTS:
         results = glom(
             response,
             (
-                "aggregations.grouped_by_collection.buckets",
+                # filter_path drops the aggregations entirely without any bucket
+                Coalesce("aggregations.grouped_by_collection.buckets", default=[]),
                 [{"noderef_id": "key.noderef_id", "materials_count": "doc_count"}],
             ),
         )
@@ -9,10 +9,17 @@ from typing import (
 )
 from uuid import UUID
 
-from pydantic import Field
+from pydantic import (
+    Field,
+    root_validator,
+    validator,
+)
 from pydantic.generics import GenericModel
 
-from .base import ResponseModel
+from .base import (
+    RequestModel,
+    ResponseModel,
+)
 from .oeh_validation import (
     MaterialFieldValidation,
     OehValidationError,
@@ -59,3 +66,58 @@ class ValidationStatsResponse(GenericModel, Generic[ValidationStatsT]):
     noderef_id: UUID
     derived_at: datetime = Field(default_factory=datetime.now)
     validation_stats: ValidationStatsT
+
+
+class RetentionPolicy(ResponseModel):
+    full_resolution_days: int
+    daily_days: int
+    max_age_days: int = 0
+
+
+class RetentionReportEntry(ResponseModel):
+    noderef_id: UUID
+    stat_type: StatType
+    total: int
+    kept: int
+    deleted: int
+
+
+class RetentionReport(ResponseModel):
+    dry_run: bool
+    policy: RetentionPolicy
+    full_resolution_since: datetime
+    daily_since: datetime
+    deleted: int
+    entries: List[RetentionReportEntry]
+    dropped_partitions: List[str] = []
+
+
+class ScoreTimelinePoint(ResponseModel):
+    derived_at: datetime
+    score: int
+    collections: Dict[str, float]
+    materials: Dict[str, float]
+
+
+class ScoreWeightsRequest(RequestModel):
+    collections: Dict[str, float] = {}
+    materials: Dict[str, float] = {}
+
+    @validator("collections", "materials")
+    def non_negative(cls, v):
+        if any(weight < 0 for weight in v.values()):
+            raise ValueError("weights must not be negative")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def any_positive(cls, values):
+        if not any(values["collections"].values()) and not any(
+            values["materials"].values()
+        ):
+            raise ValueError("at least one weight must be positive")
+        return values
+
+    @property
+    def weights(self) -> dict:
+        # the shape of ScoreWeights.weights
+        return {"collections": self.collections, "materials": self.materials}
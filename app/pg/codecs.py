@@ -0,0 +1,68 @@
+"""
+Codecs for the json types of every postgres connection.
+
+jsonb values are decoded into python objects. Casting a column to json
+selects its raw bytes instead, for queries that only pass the document on.
+"""
+import json
+from typing import (
+    Any,
+    Union,
+)
+
+import asyncpg
+import orjson
+
+from app.core.config import PG_JSON_CODEC
+
+# binary jsonb is the json text behind a format version byte
+JSONB_VERSION = b"\x01"
+
+RawJSON = Union[bytes, bytearray, memoryview]
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+def loads(data: Union[str, RawJSON]) -> Any:
+    return orjson.loads(data)
+
+
+def encode_jsonb(value: Any) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return JSONB_VERSION + bytes(value)
+    return JSONB_VERSION + dumps(value)
+
+
+def decode_jsonb(data: bytes) -> Any:
+    return loads(memoryview(data)[1:])
+
+
+def encode_json(value: Any) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return dumps(value)
+
+
+async def set_json_codecs(conn: asyncpg.Connection, codec: str = PG_JSON_CODEC):
+    if codec == "json":
+        await conn.set_type_codec(
+            "jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+    else:
+        await conn.set_type_codec(
+            "jsonb",
+            encoder=encode_jsonb,
+            decoder=decode_jsonb,
+            schema="pg_catalog",
+            format="binary",
+        )
+
+    await conn.set_type_codec(
+        "json",
+        encoder=encode_json,
+        decoder=bytes,
+        schema="pg_catalog",
+        format="binary",
+    )
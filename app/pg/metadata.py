@@ -27,4 +27,5 @@ Stats = Table(
     Column("stats", JSONB),
     Column("derived_at", TIMESTAMP),
     Column("created_at", TIMESTAMP),
+    Column("keyframe_id", Integer),
 )
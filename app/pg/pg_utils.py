@@ -1,6 +1,9 @@
-import json
 from pprint import pformat
-from typing import Tuple
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
 
 import asyncpg
 from sqlalchemy.sql import ClauseElement
@@ -10,9 +13,11 @@ from app.core.config import (
     DATABASE_URL,
     DEBUG,
     MAX_CONNECTIONS_COUNT,
+    MAX_INACTIVE_CONNECTION_LIFETIME,
     MIN_CONNECTIONS_COUNT,
 )
 from app.core.logging import logger
+from .codecs import set_json_codecs
 from .postgres import postgres
 
 dialect = pypostgresql.dialect(paramstyle="pyformat")
@@ -32,14 +37,13 @@ async def get_postgres():
 
 async def connect_to_postgres():
     async def init(conn: asyncpg.Connection):
-        await conn.set_type_codec(
-            "jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
-        )
+        await set_json_codecs(conn)
 
     postgres.pool = await asyncpg.create_pool(
         str(DATABASE_URL),
         min_size=MIN_CONNECTIONS_COUNT,
         max_size=MAX_CONNECTIONS_COUNT,
+        max_inactive_connection_lifetime=MAX_INACTIVE_CONNECTION_LIFETIME,
         init=init,
     )
 
@@ -68,3 +72,50 @@ def compile_query(query: ClauseElement) -> Tuple[str, list, tuple]:
         )
 
     return compiled_query, params, compiled._result_columns
+
+
+class PreparedQuery:
+    """
+    Query compiled once at import. Its SQL stays the same for every call, so
+    asyncpg prepares it once per connection and keeps the statement in the
+    statement cache of the connection, across pool acquisitions.
+
+    Bind parameters are passed by name to fetch and fetchrow; parameters left
+    out fall back to the values compiled into the query, e.g. of a limit.
+    """
+
+    def __init__(self, name: str, query: ClauseElement):
+        compiled = query.compile(dialect=dialect)
+
+        self.name = name
+        self.keys: List[str] = sorted(compiled.params.keys())
+        self.sql = compiled.string % {
+            key: "$" + str(i) for i, key in enumerate(self.keys, start=1)
+        }
+        self.defaults = compiled.params
+        self.processors = {
+            key: processor
+            for key, processor in compiled._bind_processors.items()
+            if key in self.defaults
+        }
+
+    def args(self, **params) -> list:
+        values = {**self.defaults, **params}
+        return [
+            self.processors[key](values[key]) if key in self.processors else values[key]
+            for key in self.keys
+        ]
+
+    async def fetch(self, conn: asyncpg.Connection, **params) -> List[asyncpg.Record]:
+        return await conn.fetch(self.sql, *self.args(**params))
+
+    async def fetchrow(self, conn: asyncpg.Connection, **params) -> asyncpg.Record:
+        return await conn.fetchrow(self.sql, *self.args(**params))
+
+
+prepared_queries: Dict[str, PreparedQuery] = {}
+
+
+def register_query(name: str, query: ClauseElement) -> PreparedQuery:
+    prepared_query = prepared_queries[name] = PreparedQuery(name, query)
+    return prepared_query
@@ -1,8 +1,87 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
 from asyncpg.pool import Pool
+from fastapi import HTTPException
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+from app.core.config import (
+    POOL_ACQUIRE_TIMEOUT,
+    POOL_RETRY_AFTER,
+)
+
+
+class PoolTimeoutException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No database connection available",
+            headers={"Retry-After": str(POOL_RETRY_AFTER)},
+        )
+
+
+class PoolMetrics:
+    """Time spent waiting for a connection, over the last `window` acquisitions."""
+
+    def __init__(self, window: int = 1000):
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.waits = deque(maxlen=window)
+
+    def record(self, wait: float):
+        self.acquired += 1
+        self.wait_total += wait
+        self.waits.append(wait)
+
+    def to_dict(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "wait_total_ms": self.wait_total * 1000,
+            "wait_median_ms": statistics.median(waits) * 1000 if waits else 0.0,
+            "wait_p95_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000
+            if waits
+            else 0.0,
+            "wait_max_ms": waits[-1] * 1000 if waits else 0.0,
+        }
 
 
 class Postgres:
     pool: Pool = None
 
+    def __init__(self):
+        self.metrics = PoolMetrics()
+
+    @asynccontextmanager
+    async def acquire(self, timeout: float = POOL_ACQUIRE_TIMEOUT):
+        start = time.perf_counter()
+        try:
+            conn = await self.pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            raise PoolTimeoutException
+        self.metrics.record(time.perf_counter() - start)
+
+        try:
+            yield conn
+        finally:
+            await self.pool.release(conn)
+
+    def stats(self) -> dict:
+        pool = {}
+        if self.pool:
+            pool = {
+                "size": self.pool.get_size(),
+                "idle": self.pool.get_idle_size(),
+                "min_size": self.pool.get_min_size(),
+                "max_size": self.pool.get_max_size(),
+            }
+        return {**pool, **self.metrics.to_dict()}
+
 
 postgres = Postgres()
@@ -1,5 +1,8 @@
 from datetime import datetime
-from typing import Union
+from typing import (
+    List,
+    Union,
+)
 from uuid import UUID
 
 from asyncpg import (
@@ -7,52 +10,101 @@ from asyncpg import (
     Record,
 )
 from sqlalchemy import (
+    JSON,
+    bindparam,
+    cast,
     select,
     text,
 )
 
 from app.models.stats import StatType
 from .metadata import Stats
-from .pg_utils import compile_query
+from .pg_utils import register_query
 
 
-async def stats_clear(conn: Connection) -> Record:
-    compiled_query, params, _ = compile_query(Stats.delete().where(text("1 = 1")))
-    return await conn.fetchrow(compiled_query, *params)
+Keyframes = Stats.alias("keyframes")
 
 
-async def stats_latest(
-    conn: Connection, stat_type: StatType, noderef_id: UUID, at: datetime = None
-) -> Record:
+def _select_stats_with_keyframe(raw: bool = False):
+    stats, keyframe_stats = Stats.c.stats, Keyframes.c.stats
+    if raw:
+        # json is handed over as bytes, see app.pg.codecs
+        stats, keyframe_stats = cast(stats, JSON), cast(keyframe_stats, JSON)
+
+    return select(
+        *[stats.label("stats") if c is Stats.c.stats else c for c in Stats.c],
+        keyframe_stats.label("keyframe_stats"),
+    ).select_from(Stats.outerjoin(Keyframes, Keyframes.c.id == Stats.c.keyframe_id))
+
+
+_stats_clear = register_query("stats_clear", Stats.delete().where(text("1 = 1")))
+
+
+def _register_stats_latest(at: bool, raw: bool):
     query = (
-        Stats.select()
-        .where(Stats.c.noderef_id == noderef_id)
-        .where(Stats.c.stat_type == stat_type.value)
+        _select_stats_with_keyframe(raw=raw)
+        .where(Stats.c.noderef_id == bindparam("noderef_id"))
+        .where(Stats.c.stat_type == bindparam("stat_type"))
     )
 
     if at:
-        query = query.where(Stats.c.derived_at <= at)
+        query = query.where(Stats.c.derived_at <= bindparam("at"))
 
     query = query.order_by(Stats.c.derived_at.desc()).limit(1)
 
-    compiled_query, params, _ = compile_query(query)
-    return await conn.fetchrow(compiled_query, *params)
+    name = "stats_latest" + ("_at" if at else "") + ("_raw" if raw else "")
+    return register_query(name, query)
+
+
+_stats_latest = {
+    (at, raw): _register_stats_latest(at=at, raw=raw)
+    for at in (False, True)
+    for raw in (False, True)
+}
+
+_stats_earliest = register_query(
+    "stats_earliest",
+    _select_stats_with_keyframe()
+    .where(Stats.c.noderef_id == bindparam("noderef_id"))
+    .where(Stats.c.stat_type == bindparam("stat_type"))
+    .order_by(Stats.c.derived_at.asc())
+    .limit(1),
+)
+
+_stats_timeline = register_query(
+    "stats_timeline",
+    select(Stats.c.derived_at)
+    .where(Stats.c.noderef_id == bindparam("noderef_id"))
+    .order_by(Stats.c.derived_at.desc()),
+)
+
+
+async def stats_clear(conn: Connection) -> Record:
+    return await _stats_clear.fetchrow(conn)
+
+
+async def stats_latest(
+    conn: Connection,
+    stat_type: StatType,
+    noderef_id: UUID,
+    at: datetime = None,
+    raw: bool = False,
+) -> Record:
+    """With raw, stats and keyframe_stats are returned as undecoded json bytes."""
+    params = {"noderef_id": noderef_id, "stat_type": stat_type.value}
+    if at:
+        params["at"] = at
+
+    return await _stats_latest[(bool(at), raw)].fetchrow(conn, **params)
 
 
 async def stats_earliest(
     conn: Connection, stat_type: StatType, noderef_id: UUID
 ) -> Record:
-    query = (
-        Stats.select()
-        .where(Stats.c.noderef_id == noderef_id)
-        .where(Stats.c.stat_type == stat_type.value)
-        .order_by(Stats.c.derived_at.asc())
-        .limit(1)
+    return await _stats_earliest.fetchrow(
+        conn, noderef_id=noderef_id, stat_type=stat_type.value
     )
 
-    compiled_query, params, _ = compile_query(query)
-    return await conn.fetchrow(compiled_query, *params)
-
 
 async def stats_insert(
     conn: Connection,
@@ -60,6 +112,7 @@ async def stats_insert(
     stat_type: StatType,
     stats: Union[list, dict],
     derived_at: datetime,
+    keyframe_id: int = None,
 ) -> Record:
     # query = (
     #     Stats.insert()
@@ -78,43 +131,221 @@ async def stats_insert(
         insert into stats (noderef_id,
                            stat_type,
                            stats,
-                           derived_at)
-        values ($1, $2, $3, $4)
+                           derived_at,
+                           keyframe_id)
+        values ($1, $2, $3, $4, $5)
         returning *
         """,
         noderef_id,
         stat_type.value,
         stats,
         derived_at,
+        keyframe_id,
     )
 
 
-async def stats_duplicate_backwards(conn: Connection, noderef_id: UUID,) -> str:
+async def stats_keyframe(
+    conn: Connection, noderef_id: UUID, stat_type: StatType
+) -> Record:
+    return await conn.fetchrow(
+        """
+        select keyframes.id,
+               keyframes.stats,
+               (select count(*)
+                from stats deltas
+                where deltas.keyframe_id = keyframes.id) as delta_count
+        from stats keyframes
+        where keyframes.noderef_id = $1
+          and keyframes.stat_type = $2
+          and keyframes.keyframe_id is null
+        order by keyframes.derived_at desc
+        limit 1
+        """,
+        noderef_id,
+        stat_type.value,
+    )
+
+
+async def stats_generate_history(
+    conn: Connection, days: int, jitter: float = 0.0, noderef_ids: List[UUID] = None,
+) -> str:
+    """
+    Generates `days` daily snapshots before the earliest stored run of every
+    portal in one statement, copying its earliest full snapshot per stat type
+    and optionally scaling every count by a random factor of 1 +/- jitter,
+    see jsonb_jitter. Counts never exceed the total next to them.
+    The earliest run counts delta rows as well, see stats_anchor_range.
+    """
     return await conn.execute(
         """
         insert into stats (noderef_id,
                            stat_type,
                            stats,
                            derived_at)
-        select distinct on (stat_type) noderef_id,
-                                       stat_type,
-                                       stats,
-                                       derived_at - interval '1 day'
+        select sources.noderef_id,
+               sources.stat_type,
+               case
+                   when $2::double precision > 0
+                       then jsonb_jitter(sources.stats, $2::double precision)
+                   else sources.stats
+                   end,
+               anchors.anchor - make_interval(days => day)
+        from (
+                 select distinct on (noderef_id, stat_type) noderef_id,
+                                                            stat_type,
+                                                            stats
+                 from stats
+                 where keyframe_id is null
+                   and ($3::uuid[] is null or noderef_id = any ($3::uuid[]))
+                 order by noderef_id, stat_type, derived_at asc
+             ) sources
+                 join (
+                 select noderef_id, min(derived_at) as anchor
+                 from stats
+                 where $3::uuid[] is null
+                    or noderef_id = any ($3::uuid[])
+                 group by noderef_id
+             ) anchors on anchors.noderef_id = sources.noderef_id,
+             generate_series(1, $1::integer) day
+        """,
+        days,
+        jitter,
+        noderef_ids,
+    )
+
+
+async def stats_anchor_range(
+    conn: Connection, noderef_ids: List[UUID] = None
+) -> Record:
+    """
+    The earliest and the latest of the portals' earliest stored runs, the
+    history generated by stats_generate_history ends right before them.
+    """
+    return await conn.fetchrow(
+        """
+        select min(anchor) as earliest, max(anchor) as latest
+        from (
+                 select min(derived_at) as anchor
+                 from stats
+                 where $1::uuid[] is null
+                    or noderef_id = any ($1::uuid[])
+                 group by noderef_id
+             ) anchors
+        """,
+        noderef_ids,
+    )
+
+
+async def stats_history(
+    conn: Connection, stat_types: List[StatType], noderef_ids: List[UUID] = None
+) -> List[Record]:
+    return await conn.fetch(
+        """
+        select stats.noderef_id,
+               stats.stat_type,
+               stats.stats,
+               stats.derived_at,
+               stats.keyframe_id,
+               keyframes.stats as keyframe_stats
         from stats
-        where noderef_id = $1
-        order by stat_type, derived_at asc
+                 left outer join stats keyframes on keyframes.id = stats.keyframe_id
+        where stats.stat_type = any ($1::stat_type[])
+          and ($2::uuid[] is null or stats.noderef_id = any ($2::uuid[]))
+        order by stats.noderef_id, stats.derived_at desc
         """,
-        noderef_id,
+        [stat_type.value for stat_type in stat_types],
+        noderef_ids,
     )
 
 
 # TODO: specify return type
 async def stats_timeline(conn: Connection, noderef_id: UUID):
-    query = (
-        select(Stats.c.derived_at)
-        .where(Stats.c.noderef_id == noderef_id)
-        .order_by(Stats.c.derived_at.desc())
+    return await _stats_timeline.fetch(conn, noderef_id=noderef_id)
+
+
+# rows of the same portal and stat type fall into one retention bucket per run
+# (newer than $1), per day (newer than $2) or per week (older); only the latest
+# row of each bucket is kept, plus keyframes still referenced by kept deltas
+_stats_retention_ranked = """
+    with ranked as (
+        select id,
+               noderef_id,
+               stat_type,
+               keyframe_id,
+               row_number() over (
+                   partition by noderef_id,
+                                stat_type,
+                                case
+                                    when derived_at >= $1 then derived_at
+                                    when derived_at >= $2 then date_trunc('day', derived_at)
+                                    else date_trunc('week', derived_at)
+                                end
+                   order by derived_at desc, id desc
+               ) as rank
+        from stats
+    ),
+    doomed as (
+        select id
+        from ranked
+        where rank > 1
+        except
+        select keyframe_id
+        from ranked
+        where rank = 1
+          and keyframe_id is not null
     )
+"""
+
 
-    compiled_query, params, _ = compile_query(query)
-    return await conn.fetch(compiled_query, *params)
+async def stats_retention_report(
+    conn: Connection, full_resolution_since: datetime, daily_since: datetime
+) -> List[Record]:
+    return await conn.fetch(
+        f"""
+        {_stats_retention_ranked}
+        select ranked.noderef_id,
+               ranked.stat_type,
+               count(*)                           as total,
+               count(*) - count(doomed.id)        as kept,
+               count(doomed.id)                   as deleted
+        from ranked
+                 left join doomed on doomed.id = ranked.id
+        group by ranked.noderef_id, ranked.stat_type
+        order by ranked.noderef_id, ranked.stat_type
+        """,
+        full_resolution_since,
+        daily_since,
+    )
+
+
+async def stats_compact(
+    conn: Connection, full_resolution_since: datetime, daily_since: datetime
+) -> str:
+    return await conn.execute(
+        f"""
+        {_stats_retention_ranked}
+        delete
+        from stats
+        where id in (select id from doomed)
+        """,
+        full_resolution_since,
+        daily_since,
+    )
+
+
+async def stats_ensure_partitions(
+    conn: Connection, since: datetime, until: datetime
+) -> List[str]:
+    rows = await conn.fetch(
+        "select stats_ensure_partitions($1, $2) as partition_name", since, until,
+    )
+    return [row["partition_name"] for row in rows]
+
+
+async def stats_drop_partitions(
+    conn: Connection, before: datetime, dry_run: bool = True
+) -> List[str]:
+    rows = await conn.fetch(
+        "select stats_drop_partitions($1, $2) as partition_name", before, dry_run,
+    )
+    return [row["partition_name"] for row in rows]
@@ -1,5 +1,12 @@
 import math
 from enum import Enum
+from typing import (
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
 
 
 class ScoreModulator(str, Enum):
@@ -16,6 +23,13 @@ class ScoreModulator(str, Enum):
             return math.pow(v, 1.0 / 3)
         return v
 
+    def vectorized(self, v: np.ndarray) -> np.ndarray:
+        if self is self.SQUARE:
+            return np.sqrt(v)
+        elif self is self.CUBE:
+            return np.power(v, 1.0 / 3)
+        return v
+
 
 class ScoreWeights(str, Enum):
     UNIFORM = (
@@ -50,7 +64,7 @@ def calc_scores(stats: dict, score_modulator: ScoreModulator) -> dict:
     return {
         k: 1 - score_modulator(v / stats["total"])
         for k, v in stats.items()
-        if k is not "total"
+        if k != "total"
     }
 
 
@@ -72,3 +86,72 @@ def calc_weighted_score(
     )
 
     return int((100 * score_) / sum_weights)
+
+
+def calc_scores_vectorized(
+    counts: np.ndarray, totals: np.ndarray, score_modulator: ScoreModulator
+) -> np.ndarray:
+    """
+    calc_scores for many stats at once: one row of missing counts per stats
+    dict, one column per key, with the matching totals.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = 1 - score_modulator.vectorized(counts / totals[:, np.newaxis])
+    scores[totals == 0] = 0
+    return scores
+
+
+def calc_weighted_score_vectorized(
+    scores: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    # summed column by column, in the order of calc_weighted_score, so both
+    # round to the same integers
+    score_ = np.zeros(len(scores))
+    for i, weight in enumerate(weights):
+        score_ += weight * scores[:, i]
+
+    return (100 * score_ / weights.sum()).astype(int)
+
+
+def calc_score_timeline(
+    collection_counts: np.ndarray,
+    collection_totals: np.ndarray,
+    material_counts: np.ndarray,
+    material_totals: np.ndarray,
+    collection_keys: List[str],
+    material_keys: List[str],
+    score_modulator: ScoreModulator,
+    score_weights: ScoreWeights,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    calc_scores and calc_weighted_score for every point of a timeline at once:
+    one row of counts per point, one column per key. Returns the weighted
+    scores along with the collection and material scores.
+    """
+    collection_scores = calc_scores_vectorized(
+        collection_counts, collection_totals, score_modulator=score_modulator
+    )
+    material_scores = calc_scores_vectorized(
+        material_counts, material_totals, score_modulator=score_modulator
+    )
+
+    weights = np.array(
+        [score_weights.weights["collections"].get(k, 0) for k in collection_keys]
+        + [score_weights.weights["materials"].get(k, 0) for k in material_keys]
+    )
+    weighted_scores = calc_weighted_score_vectorized(
+        np.hstack([collection_scores, material_scores]), weights
+    )
+
+    return weighted_scores, collection_scores, material_scores
+
+
+def rank_scores(
+    scores: np.ndarray, limit: Optional[int] = None, descending: bool = False
+) -> np.ndarray:
+    """Indices of the `limit` lowest (or highest) scores, in order."""
+    keys = -scores if descending else scores
+    if limit is not None and limit < len(keys):
+        candidates = np.argpartition(keys, limit - 1)[:limit]
+        return candidates[np.argsort(keys[candidates], kind="stable")]
+    return np.argsort(keys, kind="stable")
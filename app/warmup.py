@@ -0,0 +1,136 @@
+"""
+Startup warm-up run in the background of every worker.
+
+Opens the postgres pool, checks elasticsearch, stores the painless scripts
+and fills the caches read by the dashboard, retrying each step until it
+succeeds. /_ping only tells that the worker is alive, /_ready passes once
+all steps are done.
+"""
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+)
+
+from elasticsearch_dsl import connections
+from starlette.concurrency import run_in_threadpool
+
+import app.crud.collection as crud_collection
+import app.crud.stats as crud_stats
+from app.core.config import (
+    COLLECTION_VALIDATION_MODE,
+    WARMUP_RETRY_INTERVAL,
+)
+from app.core.logging import logger
+from app.crud.elastic import (
+    collection_validation_script_ids,
+    collection_validation_scripts,
+)
+from app.elastic.utils import put_scripts
+from app.models.stats import StatType
+from app.pg.pg_utils import get_postgres
+
+# stat types read by the dashboard, see the read-stats endpoints
+WARMUP_STAT_TYPES = [
+    StatType.PORTAL_TREE,
+    StatType.MATERIAL_TYPES,
+    StatType.VALIDATION_COLLECTIONS,
+    StatType.VALIDATION_MATERIALS,
+]
+
+# step name -> done, in the order the steps are run
+status: Dict[str, bool] = {
+    "postgres": False,
+    "elastic": False,
+    "scripts": False,
+    "portals": False,
+    "collections": False,
+    "stats": False,
+}
+
+_task: Optional[asyncio.Task] = None
+
+
+def ready() -> bool:
+    return all(status.values())
+
+
+async def check_postgres():
+    postgres = await get_postgres()
+    async with postgres.acquire() as conn:
+        await conn.fetchval("select 1")
+
+
+async def check_elastic():
+    if not await run_in_threadpool(connections.get_connection().ping):
+        raise ConnectionError("elasticsearch did not answer the ping")
+
+
+async def store_scripts():
+    if COLLECTION_VALIDATION_MODE != "stored":
+        return
+
+    scripts = {
+        collection_validation_script_ids[name]: source
+        for name, source in collection_validation_scripts.items()
+    }
+    await run_in_threadpool(put_scripts, scripts)
+
+
+async def preload_portals():
+    await crud_collection.get_portals()
+
+
+async def preload_collections():
+    portals = await crud_collection.get_portals()
+    for noderef_id in portals.keys():
+        await crud_collection.get_many_sorted(root_noderef_id=noderef_id)
+
+
+async def preload_stats():
+    postgres = await get_postgres()
+    portals = await crud_collection.get_portals()
+    for noderef_id in portals.keys():
+        for stat_type in WARMUP_STAT_TYPES:
+            await crud_stats.read_stats_cached(
+                postgres, stat_type=stat_type, noderef_id=noderef_id
+            )
+        await crud_stats.read_stats_timeline_cached(postgres, noderef_id=noderef_id)
+
+
+steps: Dict[str, Callable[[], Awaitable]] = {
+    "postgres": check_postgres,
+    "elastic": check_elastic,
+    "scripts": store_scripts,
+    "portals": preload_portals,
+    "collections": preload_collections,
+    "stats": preload_stats,
+}
+
+
+async def warm_up():
+    for name, step in steps.items():
+        while not status[name]:
+            try:
+                await step()
+                status[name] = True
+            except Exception as e:
+                logger.warning(
+                    f"Warm-up step {name} failed, retrying in "
+                    f"{WARMUP_RETRY_INTERVAL}s: {e!r}"
+                )
+                await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+
+    logger.info("Warm-up done")
+
+
+async def start_warm_up():
+    global _task
+    _task = asyncio.ensure_future(warm_up())
+
+
+async def stop_warm_up():
+    if _task and not _task.done():
+        _task.cancel()
@@ -0,0 +1,127 @@
+"""
+Offline benchmarks for parsing, scoring and the endpoint stack.
+
+    python -m benchmarks --sizes 1000,10000,100000 --repeat 10
+    python -m benchmarks --suites endpoints,postgres --json results.json
+    python -m benchmarks --suites queries --sizes 1 --repeat 1000
+    python -m benchmarks --suites transport --sizes 10000,100000
+    python -m benchmarks --suites request-cache --sizes 1 --repeat 100
+    python -m benchmarks --suites scripts --sizes 1
+    python -m benchmarks --suites optimizer --sizes 1
+
+Elasticsearch is replaced by recorded-style responses (see fixtures.py);
+the postgres suite needs a migrated database reachable via DATABASE_URL
+or the POSTGRES_* variables, the request-cache and scripts suites a
+cluster at ELASTICSEARCH_URL and the optimizer suite the corpus of the
+memory backend at ELASTIC_MEMORY_CORPUS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("API_VERSION", "v1")
+os.environ.setdefault("PROJECT_NAME", "MetaQS API")
+os.environ.setdefault("LOG_LEVEL", "warning")
+
+SUITES = (
+    "parsing",
+    "endpoints",
+    "queries",
+    "codecs",
+    "transport",
+    "postgres",
+    "request-cache",
+    "scripts",
+    "optimizer",
+)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "--sizes",
+        default="1000,10000",
+        help="comma separated numbers of collections (buckets/hits) per response",
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--suites", default="parsing,endpoints", help=f"any of {', '.join(SUITES)}",
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=None,
+        help="directory with recorded responses, missing ones are generated there",
+    )
+    parser.add_argument("--json", type=Path, default=None, help="write results here")
+    return parser.parse_args(argv)
+
+
+async def main(argv) -> int:
+    args = parse_args(argv)
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+
+    from elasticsearch_dsl import connections
+
+    from app.cache import close_cache_connection
+    from app.pg.pg_utils import close_postgres_connection
+    from . import (
+        codecs,
+        endpoints,
+        optimizer,
+        parsing,
+        queries,
+        request_cache,
+        scripts,
+        transport,
+    )
+    from .fixtures import (
+        FixtureElasticsearch,
+        load_fixtures,
+    )
+    from .runner import format_report
+
+    async def run_postgres(size, fixtures, repeat):
+        return [
+            *await endpoints.run_postgres(size, fixtures, repeat),
+            *await queries.run_postgres(size, fixtures, repeat),
+            *await codecs.run_postgres(size, fixtures, repeat),
+        ]
+
+    runners = {
+        "parsing": parsing.run,
+        "endpoints": endpoints.run,
+        "queries": queries.run,
+        "codecs": codecs.run,
+        "transport": transport.run,
+        "postgres": run_postgres,
+        "request-cache": request_cache.run,
+        "scripts": scripts.run,
+        "optimizer": optimizer.run,
+    }
+
+    results = []
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            fixtures = load_fixtures(size, directory=args.fixtures)
+            connections.add_connection("default", FixtureElasticsearch(fixtures))
+
+            for suite in suites:
+                results.extend(await runners[suite](size, fixtures, args.repeat))
+                await close_cache_connection()
+    finally:
+        await close_postgres_connection()
+
+    print(format_report(results))
+
+    if args.json:
+        args.json.write_text(json.dumps([r.to_dict() for r in results], indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
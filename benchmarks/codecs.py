@@ -0,0 +1,112 @@
+import json
+from typing import (
+    Dict,
+    List,
+)
+
+import asyncpg
+
+from app.core.config import DATABASE_URL
+from app.crud.elastic import (
+    parse_agg_collection_validation_response,
+    parse_agg_material_validation_response,
+)
+from app.pg.codecs import (
+    decode_jsonb,
+    dumps,
+    encode_jsonb,
+    loads,
+    set_json_codecs,
+)
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "codecs"
+
+
+def snapshots(fixtures: Dict[str, bytes]) -> Dict[str, list]:
+    """Validation stats as stored by run_stats for the fixture portal."""
+
+    def buckets(name: str) -> dict:
+        return json.loads(fixtures[name])["aggregations"]["grouped_by_collection"]
+
+    return {
+        "validation-collections": json.loads(
+            json.dumps(
+                parse_agg_collection_validation_response(
+                    buckets("collection_validation")
+                )
+            )
+        ),
+        "validation-materials": parse_agg_material_validation_response(
+            buckets("material_validation")
+        ),
+    }
+
+
+def read_decoded(binary: bytes):
+    """read_stats_cached on a miss with decoded stats, up to the endpoint."""
+    stats = decode_jsonb(binary)
+    json.dumps({"stats": stats})
+    return stats
+
+
+def read_raw(raw: bytes):
+    """read_stats_cached on a miss with raw stats, up to the endpoint."""
+    text = raw.decode()
+    json.dumps({"stats": text})
+    return loads(text)
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    """Encoding and decoding of snapshots by both codecs, no database."""
+    results = []
+    for stat_type, stats in snapshots(fixtures).items():
+        text = json.dumps(stats)
+        binary = encode_jsonb(stats)
+        raw = dumps(stats)
+
+        for name, fn in [
+            (f"{stat_type} json.dumps", lambda: json.dumps(stats)),
+            (f"{stat_type} encode_jsonb", lambda: encode_jsonb(stats)),
+            (f"{stat_type} json.loads", lambda: json.loads(text)),
+            (f"{stat_type} decode_jsonb", lambda: decode_jsonb(binary)),
+            (f"{stat_type} cached read decoded", lambda: read_decoded(binary)),
+            (f"{stat_type} cached read raw", lambda: read_raw(raw)),
+        ]:
+            results.append(await measure(SUITE, name, size, fn, repeat=repeat))
+
+    return results
+
+
+async def run_postgres(
+    size: int, fixtures: Dict[str, bytes], repeat: int
+) -> List[Result]:
+    """Round trips of snapshots through postgres with either codec."""
+    conn = await asyncpg.connect(str(DATABASE_URL))
+
+    results = []
+    try:
+        for codec in ("json", "orjson"):
+            await set_json_codecs(conn, codec=codec)
+
+            for stat_type, stats in snapshots(fixtures).items():
+                for name, query in [
+                    (f"{stat_type} {codec} round trip", "select $1::jsonb"),
+                    (f"{stat_type} {codec} raw round trip", "select $1::jsonb::json"),
+                ]:
+                    results.append(
+                        await measure(
+                            SUITE,
+                            name,
+                            size,
+                            lambda: conn.fetchval(query, stats),
+                            repeat=repeat,
+                        )
+                    )
+    finally:
+        await conn.close()
+
+    return results
@@ -0,0 +1,558 @@
+"""
+Synthetic corpora shaped like the edu-sharing `workspace` index.
+
+Collections (`ccm:map`) form a tree of `portals` subtrees below the portal
+root, `depth` levels deep with `fan_out` children each. Materials (`ccm:io`)
+are attached to one to three random collections. Every optional property is
+dropped with its missing rate, so the validation and score aggregations have
+something to find.
+
+    python -m benchmarks.corpus --portals 26 --depth 4 --fan-out 6 \\
+        --materials 1000000 --out /tmp/corpus
+
+writes `workspace.ndjson` (bulk API format) and the aggregation responses the
+app would receive for that corpus to `fixtures/<collections>/`. The benchmark
+suite reads that layout directly:
+
+    python -m benchmarks --fixtures /tmp/corpus/fixtures --sizes <collections>
+
+Aggregations are computed over the whole corpus, i.e. as if the portal root
+was queried.
+"""
+import argparse
+import json
+import random
+import sys
+import uuid
+from collections import (
+    Counter,
+    defaultdict,
+)
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from app.core.config import (
+    ELASTIC_INDEX,
+    PORTAL_ROOT_PATH,
+)
+from app.crud.elastic import (
+    MATERIAL_TYPES_MAP_EN_DE,
+    aggs_collection_validation,
+    aggs_material_validation,
+)
+from .fixtures import envelope
+
+WORDS = (
+    "Bruch Gleichung Funktion Zelle Energie Atom Sprache Grammatik Gedicht Epoche "
+    "Klima Karte Algorithmus Daten Netzwerk Musik Rhythmus Farbe Form Kraft Welle "
+    "Evolution Genetik Religion Ethik Markt Demokratie Europa Wasser Licht"
+).split()
+
+LICENSES = [
+    "CC_BY",
+    "CC_BY_SA",
+    "CC_0",
+    "PDM",
+    "COPYRIGHT_FREE",
+    "NONE",
+    "UNTERRICHTS_UND_LEHRMEDIEN",
+]
+
+EDUCONTEXTS = {
+    "Primarstufe": "http://w3id.org/openeduhub/vocabs/educationalContext/grundschule",
+    "Sekundarstufe I": "http://w3id.org/openeduhub/vocabs/educationalContext/sekundarstufe_1",
+    "Sekundarstufe II": "http://w3id.org/openeduhub/vocabs/educationalContext/sekundarstufe_2",
+    "Hochschule": "http://w3id.org/openeduhub/vocabs/educationalContext/hochschule",
+}
+
+OBJECT_TYPES = ["MATERIAL", "SOURCE", "TOOL"]
+
+ENDUSER_ROLES = ["Lehrer/in", "Lerner/in", "Eltern"]
+
+MISSING_KEYS = (
+    "title",
+    "keywords",
+    "description",
+    "subjects",
+    "license",
+    "educontext",
+    "ads_qualifier",
+    "material_type",
+    "object_type",
+)
+
+
+class CorpusSpec(NamedTuple):
+    portals: int = 4
+    depth: int = 3
+    fan_out: int = 5
+    materials: int = 10000
+    missing_rate: float = 0.2
+    missing_rates: Dict[str, float] = {}
+    seed: int = 0
+
+    def missing(self, key: str) -> float:
+        return self.missing_rates.get(key, self.missing_rate)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _words(rng: random.Random, low: int, high: int) -> List[str]:
+    return rng.sample(WORDS, rng.randint(low, high))
+
+
+def _base_source(noderef_id: str, type_: str) -> dict:
+    return {
+        "nodeRef": {"id": noderef_id, "storeRef": {"protocol": "workspace"}},
+        "type": type_,
+        "permissions": {"Read": ["GROUP_EVERYONE"]},
+        "properties": {"cm:edu_metadataset": "mds_oeh"},
+        "i18n": {"de_DE": {}},
+    }
+
+
+def _collection(
+    spec: CorpusSpec, rng: random.Random, noderef_id: str, path: List[str], i: int
+) -> dict:
+    source = _base_source(noderef_id, "ccm:map")
+    source["path"] = path
+    source["fullpath"] = "/".join([*path, noderef_id])
+    source["parentRef"] = {"id": path[-1]}
+
+    properties = source["properties"]
+    properties["cm:name"] = f"sammlung-{i}"
+    # the portal tree requires a title, so collections always have one
+    properties["cm:title"] = " ".join(_words(rng, 1, 3))
+    if rng.random() >= spec.missing("keywords"):
+        properties["cclom:general_keyword"] = _words(rng, 1, 6)
+    if rng.random() >= spec.missing("description"):
+        properties["cm:description"] = " ".join(_words(rng, 1, 12))
+    if rng.random() >= spec.missing("educontext"):
+        contexts = rng.sample(list(EDUCONTEXTS), rng.randint(1, 2))
+        properties["ccm:educationalcontext"] = [EDUCONTEXTS[c] for c in contexts]
+        source["i18n"]["de_DE"]["ccm:educationalcontext"] = contexts
+
+    return {"_id": noderef_id, "_source": source}
+
+
+def generate_collections(spec: CorpusSpec, rng: random.Random) -> List[dict]:
+    """Collections below the portal root, portals first, breadth-first."""
+    root_path = PORTAL_ROOT_PATH.split("/")
+    collections = []
+
+    level = [(root_path, spec.portals)]
+    for _ in range(spec.depth + 1):
+        next_level = []
+        for path, children in level:
+            for _ in range(children):
+                noderef_id = _uuid(rng)
+                collections.append(
+                    _collection(spec, rng, noderef_id, path, len(collections))
+                )
+                next_level.append(([*path, noderef_id], spec.fan_out))
+        level = next_level
+
+    return collections
+
+
+def _material(
+    spec: CorpusSpec, rng: random.Random, collections: List[dict], i: int
+) -> dict:
+    noderef_id = _uuid(rng)
+    source = _base_source(noderef_id, "ccm:io")
+    source["collections"] = [
+        {"nodeRef": {"id": collection["_id"]}, "path": collection["_source"]["path"],}
+        for collection in rng.sample(collections, rng.randint(1, 3))
+    ]
+
+    properties = source["properties"]
+    i18n = source["i18n"]["de_DE"]
+    properties["cm:name"] = f"material-{i}"
+    if rng.random() >= spec.missing("title"):
+        properties["cclom:title"] = " ".join(_words(rng, 1, 5))
+    if rng.random() >= spec.missing("keywords"):
+        properties["cclom:general_keyword"] = _words(rng, 1, 8)
+    if rng.random() >= spec.missing("description"):
+        properties["cclom:general_description"] = [" ".join(_words(rng, 3, 20))]
+    if rng.random() >= spec.missing("subjects"):
+        subjects = _words(rng, 1, 2)
+        properties["ccm:taxonid"] = subjects
+        i18n["ccm:taxonid"] = subjects
+    if rng.random() >= spec.missing("license"):
+        properties["ccm:commonlicense_key"] = [rng.choice(LICENSES)]
+    if rng.random() >= spec.missing("educontext"):
+        contexts = rng.sample(list(EDUCONTEXTS), rng.randint(1, 2))
+        properties["ccm:educationalcontext"] = [EDUCONTEXTS[c] for c in contexts]
+        i18n["ccm:educationalcontext"] = contexts
+    if rng.random() >= spec.missing("ads_qualifier"):
+        properties["ccm:containsAdvertisement"] = [rng.choice(["no", "yes"])]
+    if rng.random() >= spec.missing("material_type"):
+        material_type = rng.choice(list(MATERIAL_TYPES_MAP_EN_DE))
+        properties["ccm:educationallearningresourcetype"] = [material_type]
+        i18n["ccm:educationallearningresourcetype"] = [
+            MATERIAL_TYPES_MAP_EN_DE[material_type]
+        ]
+    if rng.random() >= spec.missing("object_type"):
+        properties["ccm:objecttype"] = [rng.choice(OBJECT_TYPES)]
+    i18n["ccm:educationalintendedenduserrole"] = rng.sample(ENDUSER_ROLES, 1)
+
+    return {"_id": noderef_id, "_source": source}
+
+
+def generate_materials(
+    spec: CorpusSpec, rng: random.Random, collections: List[dict]
+) -> Iterator[dict]:
+    for i in range(spec.materials):
+        yield _material(spec, rng, collections, i)
+
+
+def _present(value) -> bool:
+    return value not in (None, "", [])
+
+
+def collection_flags(source: dict) -> Dict[str, bool]:
+    """Which of the collection validation aggregations a collection falls into."""
+    properties = source["properties"]
+    title = properties.get("cm:title")
+    keywords = properties.get("cclom:general_keyword")
+    description = properties.get("cm:description")
+
+    return {
+        "missing_title": not _present(title),
+        "short_title": _present(title) and 0 < len(title) < 5,
+        "missing_keywords": not _present(keywords),
+        "few_keywords": _present(keywords) and 0 < len(keywords) < 3,
+        "missing_description": not _present(description),
+        "short_description": _present(description) and 0 < len(description) < 30,
+        "missing_educontext": not _present(properties.get("ccm:educationalcontext")),
+    }
+
+
+def material_flags(source: dict) -> Dict[str, bool]:
+    """Which of the material validation aggregations a material falls into."""
+    properties = source["properties"]
+    licenses = properties.get("ccm:commonlicense_key")
+
+    return {
+        "missing_title": not _present(properties.get("cclom:title")),
+        "missing_keywords": not _present(properties.get("cclom:general_keyword")),
+        "missing_subjects": not _present(properties.get("ccm:taxonid")),
+        "missing_description": not _present(
+            properties.get("cclom:general_description")
+        ),
+        "missing_license": not _present(licenses)
+        or any(
+            license in ("UNTERRICHTS_UND_LEHRMEDIEN", "NONE", "")
+            for license in licenses
+        ),
+        "missing_educontext": not _present(properties.get("ccm:educationalcontext")),
+        "missing_ads_qualifier": not _present(
+            properties.get("ccm:containsAdvertisement")
+        ),
+        "missing_material_type": not _present(
+            properties.get("ccm:educationallearningresourcetype")
+        ),
+        "missing_object_type": not _present(properties.get("ccm:objecttype")),
+    }
+
+
+class FixtureAggregator:
+    """
+    Computes the responses for the app's queries incrementally, so materials
+    can be streamed to disk without being held in memory.
+    """
+
+    def __init__(self, collections: List[dict]):
+        self.collections = collections
+        self.materials = 0
+        self.material_missing = Counter()
+        self.by_collection = defaultdict(Counter)
+        self.by_type_and_collection = Counter()
+        self.by_type = Counter()
+
+    def add_material(self, material: dict):
+        source = material["_source"]
+        flags = material_flags(source)
+        material_types = source["properties"].get(
+            "ccm:educationallearningresourcetype"
+        ) or [None]
+
+        self.materials += 1
+        self.material_missing.update(name for name, flag in flags.items() if flag)
+        for material_type in material_types:
+            self.by_type[material_type or "N/A"] += 1
+
+        for collection in source["collections"]:
+            noderef_id = collection["nodeRef"]["id"]
+            counts = self.by_collection[noderef_id]
+            counts["doc_count"] += 1
+            counts.update(name for name, flag in flags.items() if flag)
+            for material_type in material_types:
+                self.by_type_and_collection[(material_type, noderef_id)] += 1
+
+    def _collection_hits(self) -> List[dict]:
+        return [
+            {
+                "_index": ELASTIC_INDEX,
+                "_type": "_doc",
+                "_id": collection["_id"],
+                "_score": None,
+                "_source": collection["_source"],
+                "sort": [collection["_source"]["fullpath"]],
+            }
+            for collection in sorted(
+                self.collections, key=lambda c: c["_source"]["fullpath"]
+            )
+        ]
+
+    def _collection_validation(self) -> dict:
+        buckets = []
+        missing = Counter()
+        for collection in self.collections:
+            flags = collection_flags(collection["_source"])
+            missing.update(name for name, flag in flags.items() if flag)
+            buckets.append(
+                {
+                    "key": collection["_id"],
+                    "doc_count": 1,
+                    **{
+                        name: {"doc_count": int(flags[name])}
+                        for name in aggs_collection_validation
+                    },
+                }
+            )
+
+        validation = {
+            "grouped_by_collection": {
+                "doc_count_error_upper_bound": 0,
+                "sum_other_doc_count": 0,
+                "buckets": buckets,
+            }
+        }
+        score = {
+            name: {"doc_count": missing[name]} for name in aggs_collection_validation
+        }
+        return validation, score
+
+    def _material_validation(self) -> dict:
+        buckets = [
+            {
+                "key": noderef_id,
+                "doc_count": counts["doc_count"],
+                **{
+                    name: {"doc_count": counts[name]}
+                    for name in aggs_material_validation
+                },
+            }
+            for noderef_id, counts in sorted(
+                self.by_collection.items(), key=lambda item: -item[1]["doc_count"]
+            )
+        ]
+        return {
+            "grouped_by_collection": {
+                "doc_count_error_upper_bound": 0,
+                "sum_other_doc_count": 0,
+                "buckets": buckets,
+            }
+        }
+
+    def _material_counts_by_type(self) -> dict:
+        type_buckets = [
+            {
+                "key": {"material_type": material_type, "noderef_id": noderef_id},
+                "doc_count": doc_count,
+            }
+            for (material_type, noderef_id), doc_count in sorted(
+                self.by_type_and_collection.items(),
+                key=lambda item: (item[0][0] is not None, item[0]),
+            )
+        ]
+        total_buckets = [
+            {"key": {"noderef_id": noderef_id}, "doc_count": counts["doc_count"]}
+            for noderef_id, counts in sorted(self.by_collection.items())
+        ]
+        return {
+            "material_types": {
+                "after_key": type_buckets[-1]["key"] if type_buckets else None,
+                "buckets": type_buckets,
+            },
+            "totals": {
+                "after_key": total_buckets[-1]["key"] if total_buckets else None,
+                "buckets": total_buckets,
+            },
+        }
+
+    def _materials_by_collection(self) -> dict:
+        buckets = [
+            {"key": {"noderef_id": noderef_id}, "doc_count": counts["doc_count"]}
+            for noderef_id, counts in sorted(self.by_collection.items())
+        ]
+        after_key = buckets[-1]["key"] if buckets else None
+        buckets.sort(key=lambda bucket: bucket["doc_count"])
+        return {"grouped_by_collection": {"after_key": after_key, "buckets": buckets}}
+
+    def _material_types(self) -> dict:
+        return {
+            "material_types": {
+                "doc_count_error_upper_bound": 0,
+                "sum_other_doc_count": 0,
+                "buckets": [
+                    {"key": material_type, "doc_count": doc_count}
+                    for material_type, doc_count in self.by_type.most_common()
+                ],
+            }
+        }
+
+    def fixtures(self) -> Dict[str, dict]:
+        collections = len(self.collections)
+        collection_validation, collection_score = self._collection_validation()
+
+        return {
+            "collections": envelope(total=collections, hits=self._collection_hits()),
+            "collection_validation": envelope(
+                total=collections, aggregations=collection_validation
+            ),
+            "material_validation": envelope(
+                total=self.materials, aggregations=self._material_validation()
+            ),
+            "material_counts_by_type": envelope(
+                total=self.materials, aggregations=self._material_counts_by_type()
+            ),
+            "materials_by_collection": envelope(
+                total=self.materials, aggregations=self._materials_by_collection()
+            ),
+            "material_types": envelope(
+                total=self.materials, aggregations=self._material_types()
+            ),
+            "collection_score": envelope(
+                total=collections, aggregations=collection_score
+            ),
+            "material_score": envelope(
+                total=self.materials,
+                aggregations={
+                    name: {"doc_count": self.material_missing[name]}
+                    for name in aggs_material_validation
+                },
+            ),
+        }
+
+
+def write_bulk(docs: Iterable[dict], fp: TextIO, index: str = ELASTIC_INDEX) -> int:
+    count = 0
+    for doc in docs:
+        fp.write(json.dumps({"index": {"_index": index, "_id": doc["_id"]}}))
+        fp.write("\n")
+        fp.write(json.dumps(doc["_source"]))
+        fp.write("\n")
+        count += 1
+    return count
+
+
+def generate(
+    spec: CorpusSpec, bulk: Optional[TextIO] = None
+) -> Tuple[List[dict], List[dict], Dict[str, dict]]:
+    """
+    Generates a corpus and the matching aggregation responses.
+
+    With `bulk` given, documents are streamed there and no materials are
+    returned; otherwise all of them are kept in memory.
+    """
+    rng = random.Random(spec.seed)
+    collections = generate_collections(spec, rng)
+    aggregator = FixtureAggregator(collections)
+
+    def materials():
+        for material in generate_materials(spec, rng, collections):
+            aggregator.add_material(material)
+            yield material
+
+    if bulk:
+        write_bulk(collections, bulk)
+        write_bulk(materials(), bulk)
+        return collections, [], aggregator.fixtures()
+
+    return collections, list(materials()), aggregator.fixtures()
+
+
+def write_fixtures(fixtures: Dict[str, dict], directory: Path, size: int) -> Path:
+    fixtures_dir = directory / str(size)
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    for name, response in fixtures.items():
+        (fixtures_dir / f"{name}.json").write_text(json.dumps(response))
+    return fixtures_dir
+
+
+def parse_args(argv):
+    defaults = CorpusSpec._field_defaults
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.corpus")
+    parser.add_argument("--portals", type=int, default=defaults["portals"])
+    parser.add_argument(
+        "--depth", type=int, default=defaults["depth"], help="levels below portals"
+    )
+    parser.add_argument("--fan-out", type=int, default=defaults["fan_out"])
+    parser.add_argument("--materials", type=int, default=defaults["materials"])
+    parser.add_argument(
+        "--missing-rate",
+        type=float,
+        default=defaults["missing_rate"],
+        help="probability of any optional property being absent",
+    )
+    parser.add_argument(
+        "--missing",
+        action="append",
+        default=[],
+        metavar="KEY=RATE",
+        help=f"per property override, KEY one of {', '.join(MISSING_KEYS)}",
+    )
+    parser.add_argument("--seed", type=int, default=defaults["seed"])
+    parser.add_argument("--out", type=Path, required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv) -> int:
+    args = parse_args(argv)
+
+    missing_rates = {}
+    for override in args.missing:
+        key, _, rate = override.partition("=")
+        if key not in MISSING_KEYS:
+            print(f"unknown missing key: {key}", file=sys.stderr)
+            return 2
+        missing_rates[key] = float(rate)
+
+    spec = CorpusSpec(
+        portals=args.portals,
+        depth=args.depth,
+        fan_out=args.fan_out,
+        materials=args.materials,
+        missing_rate=args.missing_rate,
+        missing_rates=missing_rates,
+        seed=args.seed,
+    )
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    with open(args.out / f"{ELASTIC_INDEX}.ndjson", "w") as bulk:
+        collections, _, fixtures = generate(spec, bulk=bulk)
+
+    fixtures_dir = write_fixtures(fixtures, args.out / "fixtures", len(collections))
+    print(
+        f"{len(collections)} collections, {spec.materials} materials\n"
+        f"bulk: {args.out / f'{ELASTIC_INDEX}.ndjson'}\n"
+        f"fixtures: {fixtures_dir}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
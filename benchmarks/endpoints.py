@@ -0,0 +1,178 @@
+import json
+from datetime import datetime
+from typing import (
+    Dict,
+    List,
+)
+from uuid import UUID
+
+from httpx import (
+    ASGITransport,
+    AsyncClient,
+)
+
+import app.crud.stats as crud_stats
+from app.cache import get_cache
+from app.core.config import (
+    API_VERSION,
+    PORTAL_ROOT_ID,
+)
+from app.crud.elastic import (
+    parse_agg_collection_validation_response,
+    parse_agg_material_validation_response,
+)
+from app.main import fastapi_app
+from app.models.stats import StatType
+from app.pg.pg_utils import get_postgres
+from app.pg.queries import stats_ensure_partitions
+from .fixtures import first_portal_id
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "endpoints"
+
+BENCHMARK_NODEREF_ID = UUID("00000000-0000-4000-8000-00000000be4c")
+
+
+async def _clear_cache():
+    cache = await get_cache()
+    await cache.delete_prefix("")
+
+
+def _get(client: AsyncClient, url: str, cold: bool):
+    async def request():
+        if cold:
+            await _clear_cache()
+        response = await client.get(url)
+        response.raise_for_status()
+        return response
+
+    return request
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    portal_id = first_portal_id(fixtures)
+    prefix = f"/api/{API_VERSION}"
+
+    urls = [
+        ("collection tree", f"{prefix}/collections/{PORTAL_ROOT_ID}/tree"),
+        ("score", f"{prefix}/collections/{portal_id}/stats/score"),
+        ("material counts by type", f"{prefix}/stats/{portal_id}/material-type"),
+        (
+            "descendant materials counts",
+            f"{prefix}/collections/{portal_id}/stats/descendant-collections-materials-counts",
+        ),
+        ("material types", f"{prefix}/stats/material-types"),
+    ]
+
+    results = []
+    async with AsyncClient(
+        transport=ASGITransport(app=fastapi_app), base_url="http://benchmark"
+    ) as client:
+        for name, url in urls:
+            for cold in (True, False):
+                results.append(
+                    await measure(
+                        SUITE,
+                        f"{name} ({'cold' if cold else 'warm'} cache)",
+                        size,
+                        _get(client, url, cold=cold),
+                        repeat=repeat,
+                    )
+                )
+
+    results.append(
+        await measure(
+            SUITE,
+            "run_stats_validation_collections",
+            size,
+            lambda: crud_stats.run_stats_validation_collections(portal_id),
+            repeat=repeat,
+        )
+    )
+    results.append(
+        await measure(
+            SUITE,
+            "run_stats_validation_materials",
+            size,
+            lambda: crud_stats.run_stats_validation_materials(portal_id),
+            repeat=repeat,
+        )
+    )
+
+    return results
+
+
+async def seed_postgres(fixtures: Dict[str, bytes]):
+    def buckets(name: str) -> dict:
+        return json.loads(fixtures[name])["aggregations"]["grouped_by_collection"]
+
+    postgres = await get_postgres()
+    derived_at = datetime.now()
+
+    async with postgres.acquire() as conn:
+        await stats_ensure_partitions(conn, since=derived_at, until=derived_at)
+        for stat_type, stats in [
+            (
+                StatType.VALIDATION_COLLECTIONS,
+                parse_agg_collection_validation_response(
+                    buckets("collection_validation")
+                ),
+            ),
+            (
+                StatType.VALIDATION_MATERIALS,
+                parse_agg_material_validation_response(buckets("material_validation")),
+            ),
+        ]:
+            await crud_stats.insert_stats(
+                conn,
+                noderef_id=BENCHMARK_NODEREF_ID,
+                stat_type=stat_type,
+                stats=json.loads(json.dumps(stats)),
+                derived_at=derived_at,
+            )
+
+
+async def clear_postgres():
+    postgres = await get_postgres()
+    async with postgres.acquire() as conn:
+        await conn.execute(
+            "delete from stats where noderef_id = $1", BENCHMARK_NODEREF_ID
+        )
+    await crud_stats.invalidate_stats_cache(noderef_id=BENCHMARK_NODEREF_ID)
+
+
+async def run_postgres(
+    size: int, fixtures: Dict[str, bytes], repeat: int
+) -> List[Result]:
+    prefix = f"/api/{API_VERSION}/read-stats/{BENCHMARK_NODEREF_ID}"
+    urls = [
+        ("read-stats validation", f"{prefix}/validation"),
+        ("read-stats validation collections", f"{prefix}/validation/collections"),
+        ("read-stats timeline", f"{prefix}/timeline"),
+    ]
+
+    await seed_postgres(fixtures)
+
+    results = []
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=fastapi_app), base_url="http://benchmark"
+        ) as client:
+            for name, url in urls:
+                for cold in (True, False):
+                    results.append(
+                        await measure(
+                            SUITE,
+                            f"{name} ({'cold' if cold else 'warm'} cache)",
+                            size,
+                            _get(client, url, cold=cold),
+                            repeat=repeat,
+                        )
+                    )
+    finally:
+        await clear_postgres()
+
+    return results
@@ -0,0 +1,303 @@
+"""
+Recorded-style elasticsearch responses for the queries issued by the app.
+
+Responses are generated deterministically for a given size (number of
+collections, i.e. buckets/hits) or loaded from a directory of JSON files
+named after the fixture, so real recordings can be dropped in.
+"""
+import json
+import random
+import uuid
+from pathlib import Path
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from app.core.config import (
+    ELASTIC_INDEX,
+    PORTAL_ROOT_ID,
+    PORTAL_ROOT_PATH,
+)
+from app.crud.elastic import (
+    MATERIAL_TYPES_MAP_EN_DE,
+    aggs_collection_validation,
+    aggs_material_validation,
+)
+from app.elastic.utils import filter_response
+
+FIXTURE_NAMES = [
+    "collections",
+    "collection_validation",
+    "material_validation",
+    "material_counts_by_type",
+    "materials_by_collection",
+    "material_types",
+    "collection_score",
+    "material_score",
+]
+
+MISSING_RATE = 0.2
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def envelope(
+    total: int = 0, hits: List[dict] = None, aggregations: dict = None
+) -> dict:
+    response = {
+        "took": 1,
+        "timed_out": False,
+        "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+        "hits": {
+            "total": {"value": total, "relation": "eq"},
+            "max_score": None,
+            "hits": hits or [],
+        },
+    }
+    if aggregations is not None:
+        response["aggregations"] = aggregations
+    return response
+
+
+def collection_hits(size: int, rng: random.Random, fan_out: int = 8) -> List[dict]:
+    """Collections below the portal root in breadth-first order."""
+    root_path = PORTAL_ROOT_PATH.split("/")
+    nodes = []
+
+    for i in range(size):
+        if i < fan_out:
+            path = root_path
+        else:
+            parent = nodes[i // fan_out - 1]["_source"]
+            path = [*parent["path"], parent["nodeRef"]["id"]]
+
+        noderef_id = _uuid(rng)
+        nodes.append(
+            {
+                "_index": ELASTIC_INDEX,
+                "_type": "_doc",
+                "_id": noderef_id,
+                "_score": None,
+                "_source": {
+                    "nodeRef": {"id": noderef_id},
+                    "type": "ccm:map",
+                    "properties": {"cm:title": f"Sammlung {i}"},
+                    "path": path,
+                    "parentRef": {"id": path[-1]},
+                },
+            }
+        )
+
+    return nodes
+
+
+def _missing(rng: random.Random, doc_count: int = 1) -> dict:
+    return {"doc_count": doc_count if rng.random() < MISSING_RATE else 0}
+
+
+def collection_validation(ids: List[str], rng: random.Random) -> dict:
+    return {
+        "grouped_by_collection": {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": 0,
+            "buckets": [
+                {
+                    "key": noderef_id,
+                    "doc_count": 1,
+                    **{name: _missing(rng) for name in aggs_collection_validation},
+                }
+                for noderef_id in ids
+            ],
+        }
+    }
+
+
+def material_validation(ids: List[str], rng: random.Random) -> dict:
+    buckets = []
+    for noderef_id in ids:
+        doc_count = rng.randint(1, 200)
+        buckets.append(
+            {
+                "key": noderef_id,
+                "doc_count": doc_count,
+                **{
+                    name: {"doc_count": rng.randint(0, doc_count)}
+                    for name in aggs_material_validation
+                },
+            }
+        )
+
+    return {
+        "grouped_by_collection": {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": 0,
+            "buckets": buckets,
+        }
+    }
+
+
+def material_counts_by_type(ids: List[str], rng: random.Random) -> dict:
+    material_types = [*MATERIAL_TYPES_MAP_EN_DE.keys(), None]
+
+    type_buckets, total_buckets = [], []
+    for noderef_id in ids:
+        total = 0
+        for material_type in rng.sample(material_types, 3):
+            doc_count = rng.randint(1, 50)
+            total += doc_count
+            type_buckets.append(
+                {
+                    "key": {"material_type": material_type, "noderef_id": noderef_id},
+                    "doc_count": doc_count,
+                }
+            )
+        total_buckets.append({"key": {"noderef_id": noderef_id}, "doc_count": total})
+
+    return {
+        "material_types": {
+            "after_key": type_buckets[-1]["key"],
+            "buckets": type_buckets,
+        },
+        "totals": {"after_key": total_buckets[-1]["key"], "buckets": total_buckets},
+    }
+
+
+def materials_by_collection(ids: List[str], rng: random.Random) -> dict:
+    buckets = [
+        {"key": {"noderef_id": noderef_id}, "doc_count": rng.randint(1, 200)}
+        for noderef_id in ids
+    ]
+    buckets.sort(key=lambda bucket: bucket["doc_count"])
+    return {
+        "grouped_by_collection": {"after_key": buckets[-1]["key"], "buckets": buckets}
+    }
+
+
+def material_types() -> dict:
+    return {
+        "material_types": {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": 0,
+            "buckets": [
+                {"key": material_type, "doc_count": 100}
+                for material_type in [*MATERIAL_TYPES_MAP_EN_DE.keys(), "N/A"]
+            ],
+        }
+    }
+
+
+def score(aggs: dict, total: int, rng: random.Random) -> dict:
+    return {name: {"doc_count": rng.randint(0, total)} for name in aggs}
+
+
+def build_fixtures(size: int, seed: int = 0) -> Dict[str, dict]:
+    rng = random.Random(seed)
+
+    hits = collection_hits(size, rng)
+    ids = [hit["_id"] for hit in hits]
+    material_total = size * 100
+
+    return {
+        "collections": envelope(total=size, hits=hits),
+        "collection_validation": envelope(
+            total=size, aggregations=collection_validation(ids, rng)
+        ),
+        "material_validation": envelope(
+            total=material_total, aggregations=material_validation(ids, rng)
+        ),
+        "material_counts_by_type": envelope(
+            total=material_total, aggregations=material_counts_by_type(ids, rng)
+        ),
+        "materials_by_collection": envelope(
+            total=material_total, aggregations=materials_by_collection(ids, rng)
+        ),
+        "material_types": envelope(total=material_total, aggregations=material_types()),
+        "collection_score": envelope(
+            total=size, aggregations=score(aggs_collection_validation, size, rng)
+        ),
+        "material_score": envelope(
+            total=material_total,
+            aggregations=score(aggs_material_validation, material_total, rng),
+        ),
+    }
+
+
+def load_fixtures(
+    size: int, directory: Optional[Path] = None, seed: int = 0
+) -> Dict[str, bytes]:
+    """
+    Serialized fixtures for `size`, read from `directory / str(size)` when
+    present; freshly generated fixtures are written there for reuse.
+    """
+    fixtures_dir = directory / str(size) if directory else None
+
+    if fixtures_dir and all(
+        (fixtures_dir / f"{name}.json").exists() for name in FIXTURE_NAMES
+    ):
+        return {
+            name: (fixtures_dir / f"{name}.json").read_bytes() for name in FIXTURE_NAMES
+        }
+
+    fixtures = {
+        name: json.dumps(response).encode()
+        for name, response in build_fixtures(size, seed=seed).items()
+    }
+
+    if fixtures_dir:
+        fixtures_dir.mkdir(parents=True, exist_ok=True)
+        for name, raw in fixtures.items():
+            (fixtures_dir / f"{name}.json").write_bytes(raw)
+
+    return fixtures
+
+
+def fixture_name(body: dict) -> str:
+    aggs = body.get("aggs", {})
+
+    if not aggs:
+        return "collections"
+    if "totals" in aggs:
+        return "material_counts_by_type"
+    if "material_types" in aggs:
+        return "material_types"
+    if "grouped_by_collection" in aggs:
+        agg = aggs["grouped_by_collection"]
+        if "composite" in agg:
+            return "materials_by_collection"
+        if "missing_license" in agg.get("aggs", {}):
+            return "material_validation"
+        return "collection_validation"
+    if "missing_license" in aggs:
+        return "material_score"
+    return "collection_score"
+
+
+class FixtureElasticsearch:
+    """
+    Stands in for the elasticsearch client behind elasticsearch_dsl.
+
+    Responses are decoded on every call, like the real transport does.
+    """
+
+    def __init__(self, fixtures: Dict[str, bytes]):
+        self.fixtures = fixtures
+        self.calls = 0
+
+    def search(self, index=None, body=None, **params) -> dict:
+        self.calls += 1
+        response = json.loads(self.fixtures[fixture_name(body or {})])
+        if params.get("filter_path"):
+            response = filter_response(response, params["filter_path"])
+        return response
+
+    def ping(self, **kwargs) -> bool:
+        return True
+
+
+def first_portal_id(fixtures: Dict[str, bytes]) -> str:
+    hits = json.loads(fixtures["collections"])["hits"]["hits"]
+    return hits[0]["_id"] if hits else PORTAL_ROOT_ID
@@ -0,0 +1,169 @@
+"""
+Closed-loop load generator against a running API.
+
+Record the elastic responses once against a real cluster, then replay them
+with a fixed latency so runs are repeatable and comparable across worker
+and concurrency settings:
+
+    ELASTIC_MODE=record ...   # exercise the endpoints once
+    ELASTIC_MODE=replay ELASTIC_REPLAY_LATENCY_MS=20 ...
+    python -m benchmarks.loadtest --url http://localhost:8080 \\
+        --portal-id <noderef-id> --concurrency 8,32,128 --duration 30
+
+Only responses recorded for the exact same query can be replayed, so use the
+same portal ids and parameters in both phases.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import (
+    List,
+    NamedTuple,
+)
+
+from httpx import AsyncClient
+
+
+class LoadResult(NamedTuple):
+    concurrency: int
+    duration: float
+    timings: List[float]
+    statuses: Counter
+
+    @property
+    def requests(self) -> int:
+        return len(self.timings)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.duration
+
+    def percentile_ms(self, p: float) -> float:
+        if not self.timings:
+            return 0.0
+        timings = sorted(self.timings)
+        return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "duration": self.duration,
+            "requests": self.requests,
+            "throughput": self.throughput,
+            "median_ms": statistics.median(self.timings) * 1000
+            if self.timings
+            else 0.0,
+            "p95_ms": self.percentile_ms(0.95),
+            "p99_ms": self.percentile_ms(0.99),
+            "statuses": dict(self.statuses),
+        }
+
+
+def default_paths(api_version: str, portal_id: str) -> List[str]:
+    prefix = f"/api/{api_version}"
+    return [
+        f"{prefix}/collections/{portal_id}/stats/score",
+        f"{prefix}/stats/{portal_id}/material-type",
+        f"{prefix}/collections/{portal_id}/stats/descendant-collections-materials-counts",
+        f"{prefix}/stats/material-types",
+    ]
+
+
+async def run_load(
+    url: str, paths: List[str], concurrency: int, duration: float
+) -> LoadResult:
+    timings = []
+    statuses = Counter()
+    cycle = itertools.cycle(paths)
+    deadline = time.perf_counter() + duration
+
+    async def worker(client: AsyncClient):
+        while time.perf_counter() < deadline:
+            path = next(cycle)
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            timings.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    async with AsyncClient(base_url=url, timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    return LoadResult(concurrency, elapsed, timings, statuses)
+
+
+def format_report(results: List[LoadResult]) -> str:
+    header = (
+        f"{'concurrency':>11}  {'requests':>8}  {'req/s':>8}  "
+        f"{'median ms':>9}  {'p95 ms':>8}  {'p99 ms':>8}  statuses"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        data = result.to_dict()
+        statuses = ", ".join(f"{k}: {v}" for k, v in sorted(data["statuses"].items()))
+        lines.append(
+            f"{data['concurrency']:>11}  {data['requests']:>8}  "
+            f"{data['throughput']:>8.1f}  {data['median_ms']:>9.2f}  "
+            f"{data['p95_ms']:>8.2f}  {data['p99_ms']:>8.2f}  {statuses}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--api-version", default="v1")
+    parser.add_argument(
+        "--portal-id", help="collection used for the default set of paths"
+    )
+    parser.add_argument(
+        "--path",
+        action="append",
+        default=[],
+        help="path to request, may be given multiple times (overrides defaults)",
+    )
+    parser.add_argument(
+        "--concurrency", default="1,8,32", help="comma separated numbers of clients"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="seconds per concurrency level"
+    )
+    parser.add_argument("--json", type=Path, default=None, help="write results here")
+    return parser.parse_args(argv)
+
+
+async def main(argv) -> int:
+    args = parse_args(argv)
+
+    paths = args.path
+    if not paths:
+        if not args.portal_id:
+            print("either --portal-id or --path is required", file=sys.stderr)
+            return 2
+        paths = default_paths(args.api_version, args.portal_id)
+
+    results = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        results.append(await run_load(args.url, paths, concurrency, args.duration))
+
+    print(format_report(results))
+
+    if args.json:
+        args.json.write_text(json.dumps([r.to_dict() for r in results], indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
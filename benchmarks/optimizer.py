@@ -0,0 +1,109 @@
+"""
+The queries of the dashboard as built and as rewritten by optimize_body,
+evaluated by the memory backend over ELASTIC_MEMORY_CORPUS. Every pair has
+to return the same response, the timings only tell the memory backend apart.
+"""
+from typing import (
+    Dict,
+    List,
+)
+
+from app.core.config import (
+    ELASTIC_INDEX,
+    ELASTIC_MEMORY_CORPUS,
+    PORTAL_ROOT_ID,
+)
+from app.crud.collection import (
+    MissingAttributeFilter,
+    MissingCollectionField,
+)
+from app.crud.elastic import (
+    ResourceType,
+    agg_material_types,
+    aggs_material_validation,
+    base_filter,
+    get_many_base_query,
+    query_materials,
+    search_materials,
+)
+from app.crud.learning_material import (
+    MissingAttributeFilter as MissingMaterialAttributeFilter,
+    MissingMaterialField,
+)
+from app.elastic import (
+    Search,
+    qbool,
+    qmatch,
+)
+from app.elastic.dsl import optimize_body
+from app.elastic.memory import MemoryElasticsearch
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "optimizer"
+
+
+def searches() -> Dict[str, Search]:
+    searches = {}
+
+    for attr in MissingCollectionField:
+        query_dict = MissingAttributeFilter(attr=attr)(
+            get_many_base_query(ResourceType.COLLECTION, ancestor_id=PORTAL_ROOT_ID)
+        )
+        searches[f"collections missing {attr.path}"] = Search().query(
+            qbool(**query_dict)
+        )
+
+    for attr in MissingMaterialField:
+        query_dict = MissingMaterialAttributeFilter(attr=attr)(
+            get_many_base_query(ResourceType.MATERIAL, ancestor_id=PORTAL_ROOT_ID)
+        )
+        searches[f"materials missing {attr.path}"] = Search().query(qbool(**query_dict))
+
+    score = Search().query(query_materials(ancestor_id=PORTAL_ROOT_ID))
+    for name, agg in aggs_material_validation.items():
+        score.aggs.bucket(name, agg)
+    searches["material score"] = score[:0]
+
+    material_types = (
+        Search().query(query_materials()).query(search_materials("Mathematik"))
+    )
+    material_types.aggs.bucket("material_types", agg_material_types())
+    searches["material types search"] = material_types[:0]
+
+    searches["match on keyword, duplicate filters"] = Search().query(
+        qbool(must=[qmatch(path=PORTAL_ROOT_ID)], filter=[*base_filter, *base_filter],)
+    )[:0]
+
+    return searches
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    es = MemoryElasticsearch.from_bulk(ELASTIC_MEMORY_CORPUS)
+
+    def search(body: dict) -> dict:
+        response = es.search(index=ELASTIC_INDEX, body=body)
+        response.pop("took")
+        return response
+
+    results = []
+    for name, s in searches().items():
+        original = s.to_dict()
+        optimized, rewrites = optimize_body(original)
+        if search(optimized) != search(original):
+            raise AssertionError(f"{name}: rewritten query differs ({rewrites})")
+
+        for label, body in [("as built", original), ("optimized", optimized)]:
+            results.append(
+                await measure(
+                    SUITE,
+                    f"{name} ({label})",
+                    size,
+                    lambda: search(body),
+                    repeat=repeat,
+                )
+            )
+
+    return results
@@ -0,0 +1,228 @@
+import json
+from typing import (
+    Dict,
+    List,
+)
+
+import numpy as np
+from elasticsearch_dsl.response import (
+    AggResponse,
+    Response,
+)
+
+from app.core.config import PORTAL_ROOT_ID
+from app.crud.elastic import (
+    agg_collection_validation,
+    agg_material_validation,
+    parse_agg_collection_validation_response,
+    parse_agg_material_validation_response,
+)
+from app.crud.util import build_portal_tree
+from app.elastic import Search
+from app.models.collection import Collection
+from app.models.oeh_validation import OehValidationError
+from app.score import (
+    ScoreModulator,
+    ScoreWeights,
+    calc_scores,
+    calc_scores_vectorized,
+    calc_weighted_score,
+    calc_weighted_score_vectorized,
+)
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "parsing"
+
+
+def _response(raw: bytes, aggs: dict = None) -> Response:
+    s = Search()
+    for name, agg in (aggs or {}).items():
+        s.aggs.bucket(name, agg)
+    return Response(s, json.loads(raw))
+
+
+def grouped_by_collection(raw: dict, agg) -> AggResponse:
+    """The grouped_by_collection aggregation of a decoded search response."""
+    s = Search()
+    s.aggs.bucket("grouped_by_collection", agg)
+    return Response(s, raw).aggregations.grouped_by_collection
+
+
+def _reference_collection_validation(agg_response) -> List[dict]:
+    """The former parser, see tests/test_parsing.py."""
+    return [
+        {
+            "noderef_id": bucket["key"],
+            "title": list(
+                filter(
+                    None,
+                    [
+                        OehValidationError.MISSING
+                        if bucket["missing_title"]["doc_count"]
+                        else None,
+                        OehValidationError.TOO_SHORT
+                        if bucket["short_title"]["doc_count"]
+                        else None,
+                    ],
+                )
+            ),
+            "keywords": list(
+                filter(
+                    None,
+                    [
+                        OehValidationError.MISSING
+                        if bucket["missing_keywords"]["doc_count"]
+                        else None,
+                        OehValidationError.TOO_FEW
+                        if bucket["few_keywords"]["doc_count"]
+                        else None,
+                    ],
+                )
+            ),
+            "description": list(
+                filter(
+                    None,
+                    [
+                        OehValidationError.MISSING
+                        if bucket["missing_description"]["doc_count"]
+                        else None,
+                        OehValidationError.TOO_SHORT
+                        if bucket["short_description"]["doc_count"]
+                        else None,
+                    ],
+                )
+            ),
+            "educontext": [OehValidationError.MISSING]
+            if bucket["missing_educontext"]["doc_count"]
+            else [],
+        }
+        for bucket in agg_response.to_dict()["buckets"]
+    ]
+
+
+def _reference_material_validation(agg_response) -> List[dict]:
+    """The former parser, which left out the total, see tests/test_parsing.py."""
+    return [
+        {
+            "noderef_id": bucket["key"],
+            **{
+                k: v["doc_count"]
+                for k, v in bucket.items()
+                if k not in ("key", "doc_count")
+            },
+        }
+        for bucket in agg_response.to_dict()["buckets"]
+    ]
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    results = []
+
+    def parse_collections():
+        return [
+            Collection.parse_elastic_hit(hit)
+            for hit in _response(fixtures["collections"])
+        ]
+
+    portals = parse_collections()
+
+    async def portal_tree():
+        return await build_portal_tree(portals=portals, root_noderef_id=PORTAL_ROOT_ID)
+
+    # decoded once, parsing is measured apart from json decoding
+    raw = {
+        name: json.loads(fixtures[name])
+        for name in ("collection_validation", "material_validation")
+    }
+
+    def collection_validation_reference():
+        return _reference_collection_validation(
+            grouped_by_collection(
+                raw["collection_validation"], agg_collection_validation()
+            )
+        )
+
+    def material_validation_reference():
+        return _reference_material_validation(
+            grouped_by_collection(raw["material_validation"], agg_material_validation())
+        )
+
+    def collection_validation():
+        return parse_agg_collection_validation_response(
+            grouped_by_collection(
+                raw["collection_validation"], agg_collection_validation()
+            )
+        )
+
+    def material_validation():
+        return parse_agg_material_validation_response(
+            grouped_by_collection(raw["material_validation"], agg_material_validation())
+        )
+
+    def collection_validation_raw():
+        return parse_agg_collection_validation_response(
+            raw["collection_validation"]["aggregations"]["grouped_by_collection"]
+        )
+
+    def material_validation_raw():
+        return parse_agg_material_validation_response(
+            raw["material_validation"]["aggregations"]["grouped_by_collection"]
+        )
+
+    buckets = raw["material_validation"]["aggregations"]["grouped_by_collection"][
+        "buckets"
+    ]
+    bucket_stats = [
+        {
+            "total": bucket["doc_count"],
+            **{
+                k: v["doc_count"]
+                for k, v in bucket.items()
+                if k not in ("key", "doc_count")
+            },
+        }
+        for bucket in buckets
+    ]
+
+    def scores():
+        return [
+            calc_weighted_score(
+                collection_scores={},
+                material_scores=calc_scores(stats, ScoreModulator.LINEAR),
+                score_weights=ScoreWeights.UNIFORM,
+            )
+            for stats in bucket_stats
+        ]
+
+    keys = [k for k in bucket_stats[0] if k != "total"] if bucket_stats else []
+    weights = np.array(
+        [ScoreWeights.UNIFORM.weights["materials"].get(k, 0) for k in keys]
+    )
+
+    def scores_vectorized():
+        totals = np.array([stats["total"] for stats in bucket_stats], dtype=float)
+        counts = np.array(
+            [[stats[k] for k in keys] for stats in bucket_stats], dtype=float
+        ).reshape(len(bucket_stats), len(keys))
+        return calc_weighted_score_vectorized(
+            calc_scores_vectorized(counts, totals, ScoreModulator.LINEAR), weights
+        )
+
+    for name, fn in [
+        ("parse collection hits", parse_collections),
+        ("build_portal_tree", portal_tree),
+        ("collection validation, former parser", collection_validation_reference),
+        ("parse_agg_collection_validation_response", collection_validation),
+        ("parse_agg_collection_validation_response raw", collection_validation_raw),
+        ("material validation, former parser", material_validation_reference),
+        ("parse_agg_material_validation_response", material_validation),
+        ("parse_agg_material_validation_response raw", material_validation_raw),
+        ("calc_scores + calc_weighted_score per bucket", scores),
+        ("calc_scores + calc_weighted_score vectorized", scores_vectorized),
+    ]:
+        results.append(await measure(SUITE, name, size, fn, repeat=repeat))
+
+    return results
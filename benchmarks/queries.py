@@ -0,0 +1,118 @@
+from typing import (
+    Dict,
+    List,
+)
+
+from sqlalchemy import select
+
+from app.models.stats import StatType
+from app.pg.metadata import Stats
+from app.pg.pg_utils import (
+    compile_query,
+    get_postgres,
+)
+from app.pg.queries import (
+    _select_stats_with_keyframe,
+    _stats_latest,
+    _stats_timeline,
+)
+from .endpoints import (
+    BENCHMARK_NODEREF_ID,
+    clear_postgres,
+    seed_postgres,
+)
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "queries"
+
+
+def _latest_query():
+    return (
+        _select_stats_with_keyframe()
+        .where(Stats.c.noderef_id == BENCHMARK_NODEREF_ID)
+        .where(Stats.c.stat_type == StatType.VALIDATION_MATERIALS.value)
+        .order_by(Stats.c.derived_at.desc())
+        .limit(1)
+    )
+
+
+def _timeline_query():
+    return (
+        select(Stats.c.derived_at)
+        .where(Stats.c.noderef_id == BENCHMARK_NODEREF_ID)
+        .order_by(Stats.c.derived_at.desc())
+    )
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    """
+    Per call work before a query is sent, no database. compile_query builds
+    the SQL and the arguments on every call, a registered query compiled its
+    SQL at import and only builds the arguments.
+    """
+    latest_params = {
+        "noderef_id": BENCHMARK_NODEREF_ID,
+        "stat_type": StatType.VALIDATION_MATERIALS.value,
+    }
+
+    results = []
+    for name, fn in [
+        (
+            "stats_latest compile_query, sql and args",
+            lambda: compile_query(_latest_query()),
+        ),
+        (
+            "stats_latest registered, args only",
+            lambda: _stats_latest[(False, False)].args(**latest_params),
+        ),
+        (
+            "stats_timeline compile_query, sql and args",
+            lambda: compile_query(_timeline_query()),
+        ),
+        (
+            "stats_timeline registered, args only",
+            lambda: _stats_timeline.args(noderef_id=BENCHMARK_NODEREF_ID),
+        ),
+    ]:
+        results.append(await measure(SUITE, name, size, fn, repeat=repeat))
+
+    return results
+
+
+async def run_postgres(
+    size: int, fixtures: Dict[str, bytes], repeat: int
+) -> List[Result]:
+    """Round trips of the same query as compiled text and as prepared statement."""
+    latest_params = {
+        "noderef_id": BENCHMARK_NODEREF_ID,
+        "stat_type": StatType.VALIDATION_MATERIALS.value,
+    }
+
+    await seed_postgres(fixtures)
+
+    results = []
+    try:
+        postgres = await get_postgres()
+        async with postgres.acquire() as conn:
+
+            async def compiled():
+                compiled_query, params, _ = compile_query(_latest_query())
+                return await conn.fetchrow(compiled_query, *params)
+
+            async def prepared():
+                return await _stats_latest[(False, False)].fetchrow(
+                    conn, **latest_params
+                )
+
+            for name, fn in [
+                ("stats_latest compile_query + fetchrow", compiled),
+                ("stats_latest prepared fetchrow", prepared),
+            ]:
+                results.append(await measure(SUITE, name, size, fn, repeat=repeat))
+    finally:
+        await clear_postgres()
+
+    return results
@@ -0,0 +1,79 @@
+"""
+Repeated dashboard aggregations against the cluster at ELASTICSEARCH_URL,
+with and without the shard request cache. The size is only a label here,
+the searches run over whatever the cluster holds below PORTAL_ROOT_ID.
+"""
+from typing import (
+    Dict,
+    List,
+)
+
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import connections
+
+from app.core.config import (
+    ELASTIC_INDEX,
+    ELASTICSEARCH_URL,
+    PORTAL_ROOT_ID,
+)
+from app.crud.elastic import (
+    agg_material_types,
+    agg_material_types_by_collection,
+    agg_materials_by_collection,
+    aggs_material_validation,
+    query_materials,
+)
+from app.elastic import Search
+from app.elastic.utils import transport_options
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "request-cache"
+
+USING = "benchmark-request-cache"
+
+
+def searches() -> Dict[str, Search]:
+    material_counts = Search().query(query_materials(ancestor_id=PORTAL_ROOT_ID))
+    material_counts.aggs.bucket("material_types", agg_material_types_by_collection())
+    material_counts.aggs.bucket("totals", agg_materials_by_collection())
+
+    score = Search().query(query_materials(ancestor_id=PORTAL_ROOT_ID))
+    for name, agg in aggs_material_validation.items():
+        score.aggs.bucket(name, agg)
+
+    material_types = Search().query(query_materials())
+    material_types.aggs.bucket("material_types", agg_material_types())
+
+    return {
+        "material counts by type": material_counts[:0],
+        "material score": score[:0],
+        "material types": material_types[:0],
+    }
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    client = Elasticsearch(hosts=[ELASTICSEARCH_URL], **transport_options())
+    connections.add_connection(USING, client)
+
+    results = []
+    try:
+        for name, s in searches().items():
+            for request_cache in (False, True):
+                client.indices.clear_cache(index=ELASTIC_INDEX, request=True)
+                search = s.using(USING).params(request_cache=request_cache)
+                results.append(
+                    await measure(
+                        SUITE,
+                        f"{name} (request_cache={request_cache})",
+                        size,
+                        search.execute_raw,
+                        repeat=repeat,
+                    )
+                )
+    finally:
+        connections.remove_connection(USING)
+
+    return results
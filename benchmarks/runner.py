@@ -0,0 +1,104 @@
+import asyncio
+import statistics
+import time
+import tracemalloc
+from typing import (
+    Awaitable,
+    Callable,
+    List,
+    NamedTuple,
+    Union,
+)
+
+
+class Result(NamedTuple):
+    suite: str
+    name: str
+    size: int
+    timings: List[float]
+    peak_memory: int
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.timings) * 1000
+
+    @property
+    def p95_ms(self) -> float:
+        timings = sorted(self.timings)
+        return timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+
+    @property
+    def min_ms(self) -> float:
+        return min(self.timings) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "suite": self.suite,
+            "name": self.name,
+            "size": self.size,
+            "min_ms": self.min_ms,
+            "median_ms": self.median_ms,
+            "p95_ms": self.p95_ms,
+            "peak_memory_kib": self.peak_memory / 1024,
+            "runs": len(self.timings),
+        }
+
+
+Benchmarked = Union[Callable[[], object], Callable[[], Awaitable]]
+
+
+async def _call(fn: Benchmarked):
+    result = fn()
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+async def measure(
+    suite: str, name: str, size: int, fn: Benchmarked, repeat: int = 10
+) -> Result:
+    """
+    Runs `fn` once for warm-up, `repeat` times for timing and once more
+    under tracemalloc, so memory tracing does not distort the timings.
+    """
+    await _call(fn)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await _call(fn)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        await _call(fn)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(suite, name, size, timings, peak_memory)
+
+
+def format_report(results: List[Result]) -> str:
+    header = ("suite", "name", "size", "min ms", "median ms", "p95 ms", "peak KiB")
+    rows = [
+        (
+            r.suite,
+            r.name,
+            str(r.size),
+            f"{r.min_ms:.2f}",
+            f"{r.median_ms:.2f}",
+            f"{r.p95_ms:.2f}",
+            f"{r.peak_memory / 1024:.0f}",
+        )
+        for r in results
+    ]
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+
+    def line(row):
+        return "  ".join(
+            cell.ljust(width) if i < 2 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        )
+
+    return "\n".join([line(header), line(["-" * w for w in widths]), *map(line, rows)])
@@ -0,0 +1,77 @@
+"""
+The collection validation below PORTAL_ROOT_ID in every
+COLLECTION_VALIDATION_MODE against the cluster at ELASTICSEARCH_URL. The
+size is only a label here, the stored scripts are put before measuring.
+"""
+from typing import (
+    Dict,
+    List,
+)
+
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import connections
+
+import app.crud.stats as crud_stats
+from app.core.config import (
+    ELASTICSEARCH_URL,
+    PORTAL_ROOT_ID,
+)
+from app.crud.elastic import (
+    collection_validation_script_ids,
+    collection_validation_scripts,
+)
+from app.elastic.utils import (
+    put_scripts,
+    transport_options,
+)
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "scripts"
+
+MODES = ("inline", "stored", "client")
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    # the crud functions search on the default connection
+    fixture_client = connections.get_connection()
+    connections.add_connection(
+        "default", Elasticsearch(hosts=[ELASTICSEARCH_URL], **transport_options())
+    )
+
+    results = []
+    try:
+        put_scripts(
+            {
+                collection_validation_script_ids[name]: source
+                for name, source in collection_validation_scripts.items()
+            }
+        )
+
+        expected = None
+        for mode in MODES:
+            stats = await crud_stats.run_stats_validation_collections(
+                PORTAL_ROOT_ID, mode=mode
+            )
+            if expected is None:
+                expected = stats
+            elif stats != expected:
+                raise AssertionError(f"{mode} differs from {MODES[0]}")
+
+            results.append(
+                await measure(
+                    SUITE,
+                    f"run_stats_validation_collections ({mode})",
+                    size,
+                    lambda: crud_stats.run_stats_validation_collections(
+                        PORTAL_ROOT_ID, mode=mode
+                    ),
+                    repeat=repeat,
+                )
+            )
+    finally:
+        connections.add_connection("default", fixture_client)
+
+    return results
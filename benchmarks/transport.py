@@ -0,0 +1,144 @@
+"""
+Elasticsearch client transport against a local HTTP server replaying the
+material_counts_by_type fixture.
+
+The server limits every connection to BENCHMARK_BANDWIDTH_MBPS (default
+100 Mbit/s) so compression pays off as it would over the network.
+"""
+import gzip
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from typing import (
+    Dict,
+    List,
+)
+
+from elasticsearch import Elasticsearch
+
+from app.core.config import ELASTIC_INDEX
+from app.elastic.utils import transport_options
+from .runner import (
+    Result,
+    measure,
+)
+
+SUITE = "transport"
+
+BANDWIDTH_MBPS = float(os.getenv("BENCHMARK_BANDWIDTH_MBPS", 100))
+CONCURRENCY = 32
+CHUNK_SIZE = 64 * 1024
+
+ROOT_INFO = (
+    b'{"version": {"number": "7.14.0", "build_flavor": "default"},'
+    b' "tagline": "You Know, for Search"}'
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super(_Handler, self).setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self, body: bytes, gzipped: bytes = None):
+        if gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzipped
+            encoding = "gzip"
+        else:
+            encoding = None
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+
+        delay = CHUNK_SIZE * 8 / (BANDWIDTH_MBPS * 1e6)
+        for i in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[i : i + CHUNK_SIZE])
+            time.sleep(delay)
+
+    def do_GET(self):
+        self._reply(ROOT_INFO)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(self.server.payload, self.server.payload_gzip)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(payload: bytes) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.payload = payload
+    server.payload_gzip = gzip.compress(payload)
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run(size: int, fixtures: Dict[str, bytes], repeat: int) -> List[Result]:
+    server = serve(fixtures["material_counts_by_type"])
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    kib = len(server.payload) // 1024
+    gzip_kib = len(server.payload_gzip) // 1024
+
+    def search(client: Elasticsearch):
+        return client.search(index=ELASTIC_INDEX, body={"size": 0})
+
+    def concurrent_searches(client: Elasticsearch, executor: ThreadPoolExecutor):
+        return list(executor.map(lambda _: search(client), range(CONCURRENCY)))
+
+    results = []
+    try:
+        for http_compress in (False, True):
+            client = Elasticsearch(
+                hosts=[url], **transport_options(http_compress=http_compress)
+            )
+            transferred = gzip_kib if http_compress else kib
+            results.append(
+                await measure(
+                    SUITE,
+                    f"material_counts_by_type {transferred} KiB"
+                    f" (http_compress={http_compress})",
+                    size,
+                    lambda: search(client),
+                    repeat=repeat,
+                )
+            )
+
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+            for maxsize in (1, 10, CONCURRENCY):
+                client = Elasticsearch(
+                    hosts=[url], **transport_options(maxsize=maxsize)
+                )
+                connections = server.connections
+                result = await measure(
+                    SUITE,
+                    f"{CONCURRENCY} concurrent searches (maxsize={maxsize})",
+                    size,
+                    lambda: concurrent_searches(client, executor),
+                    repeat=repeat,
+                )
+                # connections beyond maxsize are opened and closed per request
+                opened = server.connections - connections
+                name = f"{result.name} {opened} connections opened"
+                results.append(result._replace(name=name))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return results
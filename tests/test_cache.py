@@ -0,0 +1,85 @@
+"""
+Invalidation of the score counts across workers. Every worker holds its own
+backend instance, which share their entries only with redis, here FakeRedis.
+One worker invalidates the counts as after a stats run, another reads them.
+
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+from unittest import mock
+from uuid import UUID
+
+import app.crud.stats as crud_stats
+from app.cache import (
+    FakeRedis,
+    LRUCache,
+    RedisCache,
+)
+from app.core.config import CACHE_TTL
+
+PORTAL_ID = UUID(int=1)
+
+
+class ScoreCountsCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.run = 1
+        self.now = 1000.0
+
+        async def run_stats_score(noderef_id, resource_type):
+            return {"total": self.run}
+
+        clock = mock.patch("app.cache.backends.time")
+        clock.start().monotonic.side_effect = lambda: self.now
+        self.addCleanup(clock.stop)
+
+        origin = mock.patch.object(crud_stats, "run_stats_score", run_stats_score)
+        origin.start()
+        self.addCleanup(origin.stop)
+
+    async def on(self, worker, fn, *args):
+        with mock.patch.object(
+            crud_stats, "get_cache", mock.AsyncMock(return_value=worker)
+        ):
+            return await fn(*args)
+
+    async def read(self, worker) -> int:
+        counts = await self.on(worker, crud_stats.read_score_counts_cached, PORTAL_ID)
+        return counts["materials"]["total"]
+
+    async def stats_run(self, worker):
+        self.run += 1
+        await self.on(worker, crud_stats.invalidate_stats_cache, PORTAL_ID)
+
+    async def test_shared_cache_serves_the_latest_run(self):
+        redis = FakeRedis()
+        worker, other = RedisCache(redis), RedisCache(redis)
+
+        with mock.patch.object(crud_stats, "SCORE_COUNTS_TTL", 0):
+            self.assertEqual(await self.read(other), 1)
+            await self.stats_run(worker)
+            self.assertEqual(await self.read(other), 2)
+
+    async def test_local_cache_expires_counts(self):
+        worker, other = LRUCache(), LRUCache()
+
+        with mock.patch.object(crud_stats, "SCORE_COUNTS_TTL", 0):
+            self.assertEqual(await self.read(other), 1)
+            await self.stats_run(worker)
+            self.assertEqual(await self.read(worker), 2)
+            # the run was not seen by the other worker
+            self.assertEqual(await self.read(other), 1)
+
+            self.now += CACHE_TTL + 1
+            self.assertEqual(await self.read(other), 2)
+
+    def test_counts_never_expire_only_when_shared(self):
+        with mock.patch.object(crud_stats, "SCORE_COUNTS_TTL", 0):
+            self.assertEqual(crud_stats._score_counts_ttl(RedisCache(FakeRedis())), 0)
+            self.assertEqual(crud_stats._score_counts_ttl(LRUCache()), CACHE_TTL)
+
+        with mock.patch.object(crud_stats, "SCORE_COUNTS_TTL", 60):
+            self.assertEqual(crud_stats._score_counts_ttl(LRUCache()), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+The rewrites of optimize_body must not change the result of a search. They
+are checked against the memory backend over a small synthetic corpus, in
+which some titles and descriptions are empty strings, i.e. present but
+without any token.
+
+    python -m unittest discover -s tests -t .
+"""
+import random
+import unittest
+
+from app.core.config import ELASTIC_INDEX
+from app.elastic.dsl import optimize_body
+from app.elastic.memory import (
+    MemoryElasticsearch,
+    MemoryIndex,
+)
+from benchmarks.corpus import (
+    CorpusSpec,
+    generate_collections,
+    generate_materials,
+)
+from benchmarks.optimizer import searches
+
+TOKENLESS = ("cm:title", "cm:description", "cclom:title")
+
+
+def corpus_client() -> MemoryElasticsearch:
+    spec = CorpusSpec(portals=2, depth=2, fan_out=3, materials=300)
+    rng = random.Random(spec.seed)
+    collections = generate_collections(spec, rng)
+    docs = [*collections, *generate_materials(spec, rng, collections)]
+
+    for doc in docs[::5]:
+        properties = doc["_source"]["properties"]
+        for key in TOKENLESS:
+            if key in properties:
+                properties[key] = ""
+
+    return MemoryElasticsearch(
+        MemoryIndex.from_docs((doc["_id"], doc["_source"]) for doc in docs)
+    )
+
+
+class OptimizeBodyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.es = corpus_client()
+
+    def search(self, body: dict) -> dict:
+        response = self.es.search(index=ELASTIC_INDEX, body=body)
+        response.pop("took")
+        return response
+
+    def test_searches_keep_their_results(self):
+        for name, s in searches().items():
+            original = s.to_dict()
+            optimized, rewrites = optimize_body(original)
+            with self.subTest(name, rewrites=rewrites):
+                self.assertEqual(self.search(optimized), self.search(original))
+
+    def test_wildcard_on_text_field_is_kept(self):
+        wildcard = {"wildcard": {"properties.cm:title": {"value": "*"}}}
+        body = {"query": {"bool": {"must_not": [wildcard]}}, "size": 0}
+
+        optimized, rewrites = optimize_body(body)
+
+        self.assertEqual(optimized["query"]["bool"]["must_not"], [wildcard])
+        self.assertEqual(rewrites, [])
+        # empty titles count as missing
+        exists = {"exists": {"field": "properties.cm:title"}}
+        with_exists = {"query": {"bool": {"must_not": [exists]}}, "size": 0}
+        self.assertGreater(
+            self.search(body)["hits"]["total"]["value"],
+            self.search(with_exists)["hits"]["total"]["value"],
+        )
+
+    def test_wildcard_on_keyword_field_to_exists(self):
+        body = {
+            "query": {"bool": {"must_not": [{"wildcard": {"type": {"value": "*"}}}]}}
+        }
+
+        optimized, rewrites = optimize_body(body)
+
+        self.assertEqual(
+            optimized["query"]["bool"]["must_not"], [{"exists": {"field": "type"}}]
+        )
+        self.assertEqual(len(rewrites), 1)
+        self.assertEqual(self.search(optimized), self.search(body))
+
+    def test_match_on_keyword_field_to_term(self):
+        body = {"query": {"match": {"type": "ccm:map"}}, "size": 0}
+
+        optimized, rewrites = optimize_body(body)
+
+        self.assertEqual(
+            optimized["query"], {"bool": {"filter": [{"term": {"type": "ccm:map"}}]}}
+        )
+        self.assertEqual(self.search(optimized), self.search(body))
+
+
+if __name__ == "__main__":
+    unittest.main()
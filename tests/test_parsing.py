@@ -0,0 +1,66 @@
+"""
+The validation parsers must return what the former parsers returned, kept
+in benchmarks/parsing.py, from an AggResponse as well as from the raw dict.
+The material parser adds the total, which the former one left out.
+
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+
+from app.crud.elastic import (
+    agg_collection_validation,
+    agg_material_validation,
+    parse_agg_collection_validation_response,
+    parse_agg_material_validation_response,
+)
+from benchmarks.fixtures import build_fixtures
+from benchmarks.parsing import (
+    _reference_collection_validation,
+    _reference_material_validation,
+    grouped_by_collection,
+)
+
+SIZE = 50
+
+
+class ValidationParserTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fixtures = build_fixtures(SIZE)
+
+    def raw(self, name: str) -> dict:
+        return self.fixtures[name]["aggregations"]["grouped_by_collection"]
+
+    def test_collection_validation_matches_former_parser(self):
+        response = grouped_by_collection(
+            self.fixtures["collection_validation"], agg_collection_validation()
+        )
+        expected = _reference_collection_validation(response)
+        self.assertEqual(len(expected), SIZE)
+        self.assertTrue(any(entry["title"] for entry in expected))
+
+        for agg_response in (response, self.raw("collection_validation")):
+            with self.subTest(type(agg_response).__name__):
+                self.assertEqual(
+                    parse_agg_collection_validation_response(agg_response), expected
+                )
+
+    def test_material_validation_matches_former_parser(self):
+        response = grouped_by_collection(
+            self.fixtures["material_validation"], agg_material_validation()
+        )
+        expected = _reference_material_validation(response)
+        totals = [
+            bucket["doc_count"] for bucket in self.raw("material_validation")["buckets"]
+        ]
+        self.assertEqual(len(expected), SIZE)
+
+        for agg_response in (response, self.raw("material_validation")):
+            with self.subTest(type(agg_response).__name__):
+                parsed = parse_agg_material_validation_response(agg_response)
+                self.assertEqual([entry.pop("total") for entry in parsed], totals)
+                self.assertEqual(parsed, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
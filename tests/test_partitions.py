@@ -0,0 +1,91 @@
+"""
+A dry run of stats_drop_partitions must name exactly the partitions the real
+run drops. Needs the migrated database in DATABASE_URL, every run is rolled
+back.
+
+    DATABASE_URL=postgresql://... python -m unittest discover -s tests -t .
+"""
+import os
+import unittest
+from datetime import datetime
+from uuid import uuid4
+
+import asyncpg
+
+from app.models.stats import StatType
+from app.pg.codecs import set_json_codecs
+from app.pg.queries import (
+    stats_drop_partitions,
+    stats_ensure_partitions,
+    stats_insert,
+)
+
+
+@unittest.skipUnless(os.getenv("DATABASE_URL"), "needs DATABASE_URL")
+class DropPartitionsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
+        await set_json_codecs(self.conn)
+        self.fixture = self.conn.transaction()
+        await self.fixture.start()
+
+        await stats_ensure_partitions(
+            self.conn, since=datetime(2001, 1, 1), until=datetime(2001, 5, 1)
+        )
+        # the keyframe of january is only referenced from february, which is
+        # dropped as well, the one of march from may, which is kept
+        for keyframe_at, delta_at in (
+            (datetime(2001, 1, 15), datetime(2001, 2, 15)),
+            (datetime(2001, 3, 15), datetime(2001, 5, 15)),
+        ):
+            await self.insert(keyframe_at, delta_at)
+
+    async def asyncTearDown(self):
+        await self.fixture.rollback()
+        await self.conn.close()
+
+    async def insert(self, keyframe_at: datetime, delta_at: datetime):
+        noderef_id = uuid4()
+        keyframe = await stats_insert(
+            self.conn, noderef_id, StatType.SEARCH, {"total": 1}, keyframe_at
+        )
+        await stats_insert(
+            self.conn,
+            noderef_id,
+            StatType.SEARCH,
+            {"total": 2},
+            delta_at,
+            keyframe_id=keyframe["id"],
+        )
+
+    async def partitions(self) -> set:
+        rows = await self.conn.fetch(
+            "select tablename from pg_tables where tablename like 'stats_2001_%'"
+        )
+        return {row["tablename"] for row in rows}
+
+    async def drop(self, dry_run: bool):
+        run = self.conn.transaction()
+        await run.start()
+        try:
+            dropped = await stats_drop_partitions(
+                self.conn, before=datetime(2001, 5, 1), dry_run=dry_run
+            )
+            return set(dropped), await self.partitions()
+        finally:
+            await run.rollback()
+
+    async def test_dry_run_reports_what_is_dropped(self):
+        partitions = await self.partitions()
+
+        reported, untouched = await self.drop(dry_run=True)
+        dropped, remaining = await self.drop(dry_run=False)
+
+        self.assertEqual(reported, dropped)
+        self.assertEqual(dropped, {"stats_2001_01", "stats_2001_02", "stats_2001_04"})
+        self.assertEqual(untouched, partitions)
+        self.assertEqual(remaining, partitions - dropped)
+
+
+if __name__ == "__main__":
+    unittest.main()